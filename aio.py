@@ -0,0 +1,50 @@
+import asyncio, contextvars, functools
+from concurrent.futures import ThreadPoolExecutor
+import profiling
+
+# ---------- Async I/O ----------
+# The booking flow's I/O-heavy views (dashboard, seating, payment, tickets,
+# download_ticket) are async. Served by asgi.py they run on the server's
+# event loop; under a WSGI server Flask gives each of them a thread and an
+# event loop of its own, which works but gains nothing.
+#
+# boto3 and SQLAlchemy only block, so awaited calls run on one bounded pool
+# of I/O threads shared by all requests (ASYNC_IO_THREADS), and PDF work goes
+# there too. Calls run in a copy of the request's context, so current_app
+# and the storage backend work inside them as in a route, their storage time
+# counts for the request in metrics.py, and a profiled request samples the
+# thread.
+#
+# AsyncStore runs in-memory calls inline. Its concurrent flag says whether
+# one request's calls may overlap: only on DynamoDB. Flask-SQLAlchemy's
+# session belongs to the app context, so a request's SQLite calls run on
+# the pool one after the other.
+
+class AsyncIO:
+    def __init__(self, store, threads=16):
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='movie-magic-io')
+        self.store = AsyncStore(store, self)
+
+    # Runs fn(*args, **kwargs) on the I/O pool and waits for it
+    async def run(self, fn, *args, **kwargs):
+        call = functools.partial(contextvars.copy_context().run, profiling.run_attached, fn, *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, call)
+
+
+# Every method of the wrapped store, as a coroutine:
+#   user, page = await asyncio.gather(aio.store.get_user(email), aio.store.list_user_bookings(email))
+class AsyncStore:
+    def __init__(self, store, aio):
+        self.sync = store
+        self.aio = aio
+        self.concurrent = store.name == 'dynamodb'
+        self.inline = store.name == 'memory'
+
+    def __getattr__(self, name):
+        method = getattr(self.sync, name)
+
+        async def call(*args, **kwargs):
+            if self.inline:
+                return method(*args, **kwargs)
+            return await self.aio.run(method, *args, **kwargs)
+        return call
@@ -0,0 +1,113 @@
+import csv, io, threading, time
+from storage import tally_sales
+
+# ---------- Sales Analytics ----------
+# Tickets, revenue and occupancy per show, movie, theater or day, for theater
+# staff. Reports never read bookings: every backend keeps running totals per
+# show (storage.show_sales()) that each booking write and history delete
+# updates along with the bookings, and the report groups those few rows. A
+# process keeps the last read for ANALYTICS_CACHE_TTL seconds.
+#
+# Occupancy is tickets sold over seats, counted only for shows in the
+# current schedule; older shows and bookings stored with day 'N/A' have no
+# known screen, so their capacity and occupancy are None.
+#
+# rebuild() recomputes all totals from the bookings, page by page, and swaps
+# them in at the end: once after upgrading an existing DynamoDB deployment,
+# or whenever the totals look off. Bookings made or cleared while it runs may
+# be missed by it, so run it when the site is quiet.
+GROUPS = {
+    'show': ('movie', 'theater', 'day', 'time'),
+    'movie': ('movie',),
+    'theater': ('theater',),
+    'day': ('day',),
+}
+COLUMNS = ('shows', 'bookings', 'tickets', 'revenue', 'capacity', 'occupancy')
+
+
+def _group(rows, fields):
+    groups = {}
+    for row in rows:
+        key = tuple(row[f] for f in fields)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = dict(zip(fields, key), shows=0, bookings=0, tickets=0, revenue=0, capacity=0, sold=0)
+        group['shows'] += 1
+        group['bookings'] += row['bookings']
+        group['tickets'] += row['tickets']
+        group['revenue'] += row['revenue']
+        if row['capacity']:
+            group['capacity'] += row['capacity']
+            group['sold'] += row['tickets']
+
+    result = []
+    for key in sorted(groups):
+        group = groups[key]
+        sold = group.pop('sold')
+        group['occupancy'] = round(sold / group['capacity'], 4) if group['capacity'] else None
+        group['capacity'] = group['capacity'] or None
+        result.append(group)
+    return result
+
+
+class SalesReport:
+    def __init__(self, store, scheduler, ttl=10):
+        self.store = store
+        self.scheduler = scheduler
+        self.ttl = ttl
+        self._cached = None  # (read at, rows)
+        self._lock = threading.Lock()
+
+    # One row per show with its capacity, at most ttl seconds old
+    def shows(self):
+        cached = self._cached
+        if cached and time.monotonic() - cached[0] < self.ttl:
+            return cached[1]
+        with self._lock:
+            cached = self._cached
+            if cached and time.monotonic() - cached[0] < self.ttl:
+                return cached[1]
+            read_at = time.monotonic()
+            rows = self.store.show_sales()
+            schedule = self.scheduler.current()
+            for row in rows:
+                show = schedule.show((row['movie'], row['theater'], row['day'], row['time']))
+                row['capacity'] = show.screen.capacity if show else None
+            self._cached = (read_at, rows)
+            return rows
+
+    def invalidate(self):
+        self._cached = None
+
+    # {'by', 'filters', 'rows', 'totals'}; filters match show fields exactly,
+    # e.g. {'theater': 'PVR Nexus', 'day': '2024-06-01'}
+    def report(self, by='show', filters=None):
+        filters = filters or {}
+        rows = [row for row in self.shows() if all(row[f] == v for f, v in filters.items())]
+        totals = _group(rows, ())
+        return {'by': by, 'filters': filters, 'rows': _group(rows, GROUPS[by]),
+                'totals': totals[0] if totals else dict(dict.fromkeys(COLUMNS, 0), capacity=None, occupancy=None)}
+
+    @staticmethod
+    def csv(report):
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(GROUPS[report['by']] + COLUMNS)
+        for row in report['rows']:
+            writer.writerow([row[c] if row[c] is not None else '' for c in GROUPS[report['by']] + COLUMNS])
+        return out.getvalue()
+
+    # Recomputes every show's totals from the bookings; progress (a job's
+    # progress dict) counts the bookings read
+    def rebuild(self, page_size=500, progress=None):
+        progress = {} if progress is None else progress
+        progress.update(bookings=0, shows=0)
+        totals = {}
+        for page in self.store.iter_all_bookings(page_size):
+            tally_sales(page, totals)
+            progress['bookings'] += len(page)
+        totals = {slot: row for slot, row in totals.items() if row[0] > 0}
+        self.store.replace_show_sales(totals)
+        progress['shows'] = len(totals)
+        self.invalidate()
+        return totals
@@ -0,0 +1,198 @@
+import asyncio, contextvars, functools, inspect, sys
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+from flask import request, request_started
+from werkzeug.exceptions import HTTPException
+import profiling
+
+# ---------- ASGI Serving ----------
+# The production serving mode. app.py and aws_app.py export an ASGI app next
+# to the Flask one:
+#
+#   uvicorn app:asgi --workers 1          (aws_app:asgi for DynamoDB)
+#
+# Requests for async views (dashboard, seating, payment, tickets and
+# download_ticket in routes.py) run as tasks on the server's event loop. A
+# checkout waiting on storage holds no thread: its calls run on aio.py's
+# fixed pool of ASYNC_IO_THREADS. Requests for every other view go through
+# app.wsgi_app on a pool of AWS_WORKER_THREADS request threads, as under a
+# threaded WSGI server, and their streamed bodies (e.g. a seat event stream)
+# are read there in the same context. The process's thread count does not
+# grow with the number of checkouts in flight.
+#
+# Flask on its own serves an async view through asgiref, with a new thread
+# and event loop per request. dispatch() below is Flask's wsgi_app() and
+# full_dispatch_request() with the view awaited instead. Request hooks,
+# sessions and templates run on the loop as they are; they only do quick
+# in-memory work.
+
+class ASGIApp:
+    def __init__(self, app, threads=8):
+        self.app = app
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='movie-magic-request')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        elif scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, receive, send):
+        with SpooledTemporaryFile(max_size=1024 * 1024) as body:
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+                body.write(message.get('body', b''))
+                if not message.get('more_body'):
+                    break
+            body.seek(0)
+
+            environ = wsgi_environ(scope, body)
+            sync = SyncCalls(self.executor)
+            if self.is_async(environ):
+                app_iter, status, headers, in_memory = await self.dispatch(environ)
+            else:
+                (app_iter, status, headers), in_memory = await sync(call_wsgi, self.app.wsgi_app, environ), False
+            await send({'type': 'http.response.start', 'status': int(status.split(' ', 1)[0]),
+                        'headers': [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers]})
+            if in_memory:
+                await send({'type': 'http.response.body', 'body': b''.join(app_iter)})
+                app_iter.close()
+            else:
+                # Files and generators may block, so they are read on the pool
+                await sync(send_body, app_iter, send, asyncio.get_running_loop())
+
+    def is_async(self, environ):
+        app = self.app
+        try:
+            rule, _ = app.create_url_adapter(app.request_class(environ)).match(return_rule=True)
+        except HTTPException:
+            return False
+        return inspect.iscoroutinefunction(app.view_functions.get(rule.endpoint))
+
+    # (app_iter, status, headers, whether the body is already in memory)
+    async def dispatch(self, environ):
+        app = self.app
+        ctx = app.request_context(environ)
+        error = None
+        try:
+            try:
+                ctx.push()
+                response = await self.full_dispatch_request()
+            except Exception as e:
+                error = e
+                response = app.handle_exception(e)
+            except:  # noqa: E722
+                error = sys.exc_info()[1]
+                raise
+            return (*response.get_wsgi_response(environ), response.is_sequence)
+        finally:
+            if error is not None and app.should_ignore_error(error):
+                error = None
+            ctx.pop(error)
+
+    async def full_dispatch_request(self):
+        app = self.app
+        try:
+            request_started.send(app, _async_wrapper=app.ensure_sync)
+            rv = app.preprocess_request()
+            if rv is None:
+                rv = await self.dispatch_request()
+        except Exception as e:
+            rv = app.handle_user_exception(e)
+        return app.finalize_request(rv)
+
+    async def dispatch_request(self):
+        app = self.app
+        if request.routing_exception is not None:
+            app.raise_routing_exception(request)
+        rule = request.url_rule
+        if getattr(rule, 'provide_automatic_options', False) and request.method == 'OPTIONS':
+            return app.make_default_options_response()
+        return await app.view_functions[rule.endpoint](**request.view_args)
+
+
+# Runs one request's blocking calls on the request threads, one after the
+# other, all in the same copy of its context: a body made with
+# stream_with_context() pops the request context where the view pushed it
+class SyncCalls:
+    def __init__(self, executor):
+        self.executor = executor
+        self.context = None
+
+    async def __call__(self, fn, *args, **kwargs):
+        if self.context is None:
+            self.context = contextvars.copy_context()
+        call = functools.partial(self.context.run, profiling.run_attached, fn, *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, call)
+
+
+def call_wsgi(wsgi_app, environ):
+    started = []
+
+    def start_response(status, headers, exc_info=None):
+        started[:] = [status, headers]
+    app_iter = wsgi_app(environ, start_response)
+    return app_iter, *started
+
+
+def send_body(app_iter, send, loop):
+    def send_now(message):
+        asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+    try:
+        for chunk in app_iter:
+            if chunk:
+                send_now({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        send_now({'type': 'http.response.body', 'body': b''})
+    finally:
+        if hasattr(app_iter, 'close'):
+            app_iter.close()
+
+
+def wsgi_environ(scope, body):
+    script_name = scope.get('root_path', '').encode('utf8').decode('latin1')
+    path_info = scope['path'].encode('utf8').decode('latin1')
+    if script_name and path_info.startswith(script_name):
+        path_info = path_info[len(script_name):]
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': script_name,
+        'PATH_INFO': path_info,
+        'QUERY_STRING': scope['query_string'].decode('ascii'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        'asgi.scope': scope,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin1')
+        key = name.upper().replace('-', '_')
+        if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = f'HTTP_{key}'
+        value = value.decode('latin1')
+        if key in environ:
+            value = environ[key] + ('; ' if key == 'HTTP_COOKIE' else ',') + value
+        environ[key] = value
+    return environ
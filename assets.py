@@ -0,0 +1,271 @@
+import argparse, gzip, hashlib, io, json, mimetypes, os, re, shutil, sys, time
+from flask import current_app, request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # .br variants are skipped without it
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:  # images are only fingerprinted without Pillow
+    Image = None
+
+# ---------- Static Asset Pipeline ----------
+# A build step copies static/ into static/dist/ with the content hash in every
+# file name (style.css -> dist/style.3f9c1a0b2e.css), so a file's URL changes
+# whenever its bytes do and browsers may cache it for a year without
+# revalidating. Alongside the copies it writes:
+#
+#   style.css.gz / .br    pre-compressed text files (.br needs `brotli`)
+#   rrr-240w.<hash>.jpg   resized images in their own format and as WebP
+#   rrr-240w.<hash>.webp  (needs Pillow); backgrounds (*_bg) at BACKGROUND_WIDTHS,
+#                         everything else (posters) at POSTER_WIDTHS
+#
+# and dist/manifest.json mapping each source name to its built files. In the
+# CSS, url("/static/x_bg.jpg") is rewritten to the largest resized copy.
+#
+#   python assets.py                 build static/dist/
+#   python assets.py --clean         remove it again
+#
+# At runtime init_app() hooks url_for('static', filename=...) to return the
+# fingerprinted name; width=N picks the smallest resized copy at least N
+# pixels wide and format='webp' the WebP copy. Without a build (or after
+# --clean) url_for returns the plain source files as before. Rebuild after
+# changing anything in static/.
+
+BUILD_DIR = 'dist'
+MANIFEST = 'manifest.json'
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt', '.html'}
+IMAGES = {'.jpg', '.jpeg', '.png'}
+BACKGROUND_WIDTHS = (960, 1920)
+POSTER_WIDTHS = (240, 480)
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+MAX_AGE = 365 * 24 * 3600
+CSS_URL = re.compile(r'''url\((['"]?)/static/([^'")?#]+)\1\)''')
+
+
+def content_name(name, data, suffix=''):
+    stem, ext = os.path.splitext(name)
+    return f"{stem}{suffix}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+
+
+class AssetBuilder:
+    def __init__(self, static_dir):
+        self.static_dir = static_dir
+        self.out_dir = os.path.join(static_dir, BUILD_DIR)
+        self.assets = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def sources(self):
+        for root, dirs, files in os.walk(self.static_dir):
+            if os.path.abspath(root) == os.path.abspath(self.static_dir):
+                dirs[:] = [d for d in dirs if d != BUILD_DIR]
+            for f in sorted(files):
+                yield os.path.relpath(os.path.join(root, f), self.static_dir).replace(os.sep, '/')
+
+    def emit(self, name, data, suffix=''):
+        path = f"{BUILD_DIR}/{content_name(name, data, suffix)}"
+        target = os.path.join(self.static_dir, *path.split('/'))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+        encodings = []
+        if os.path.splitext(name)[1].lower() in COMPRESSIBLE:
+            with open(target + '.gz', 'wb') as f:
+                f.write(gzip.compress(data, 9, mtime=0))
+            encodings.append('gzip')
+            if brotli:
+                with open(target + '.br', 'wb') as f:
+                    f.write(brotli.compress(data))
+                encodings.append('br')
+        self.bytes_out += len(data)
+        return path, encodings
+
+    def build(self):
+        if os.path.isdir(self.out_dir):
+            shutil.rmtree(self.out_dir)
+        names = list(self.sources())
+        # Stylesheets last, so the images they point at already have built names
+        for name in sorted(names, key=lambda n: n.endswith('.css')):
+            with open(os.path.join(self.static_dir, *name.split('/')), 'rb') as f:
+                data = f.read()
+            self.bytes_in += len(data)
+            ext = os.path.splitext(name)[1].lower()
+            if ext == '.css':
+                data = CSS_URL.sub(self.css_url, data.decode('utf-8')).encode('utf-8')
+            path, encodings = self.emit(name, data)
+            entry = {'file': path}
+            if encodings:
+                entry['encodings'] = encodings
+            if ext in IMAGES and Image:
+                entry.update(self.resize(name, data))
+            self.assets[name] = entry
+
+        with open(os.path.join(self.out_dir, MANIFEST), 'w') as f:
+            json.dump({'built_at': time.time(), 'assets': self.assets}, f, indent=1, sort_keys=True)
+        return self.assets
+
+    def resize(self, name, data):
+        image = Image.open(io.BytesIO(data))
+        # Some *.jpg files here are PNGs; anything without real transparency
+        # becomes a JPEG
+        opaque = image.mode not in ('RGBA', 'LA', 'P') or image.convert('RGBA').getchannel('A').getextrema()[0] == 255
+        fmt = 'jpeg' if opaque else 'png'
+        image = image.convert('RGB' if opaque else 'RGBA')
+        stem = os.path.splitext(name)[0]
+        widths = BACKGROUND_WIDTHS if stem.endswith('_bg') else POSTER_WIDTHS
+        variants = []
+        # Never upscale: widths past the original collapse into one full-size copy
+        for width in sorted({min(w, image.width) for w in widths}):
+            resized = image if width == image.width else image.resize(
+                (width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+            for variant_fmt in (fmt, 'webp'):
+                out = io.BytesIO()
+                if variant_fmt == 'jpeg':
+                    resized.save(out, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+                elif variant_fmt == 'png':
+                    resized.save(out, 'PNG', optimize=True)
+                else:
+                    resized.save(out, 'WEBP', quality=WEBP_QUALITY, method=6)
+                ext = {'jpeg': '.jpg', 'png': '.png', 'webp': '.webp'}[variant_fmt]
+                path, _ = self.emit(stem + ext, out.getvalue(), f"-{width}w")
+                variants.append({'file': path, 'width': width, 'format': variant_fmt})
+        return {'format': fmt, 'variants': variants}
+
+    def css_url(self, match):
+        entry = self.assets.get(match.group(2))
+        if not entry:
+            return match.group(0)
+        fallback = [v for v in entry.get('variants', []) if v['format'] == entry['format']]
+        path = fallback[-1]['file'] if fallback else entry['file']
+        return f"url({match.group(1)}/static/{path}{match.group(1)})"
+
+
+# The build's manifest, loaded once per app
+class AssetManifest:
+    def __init__(self, static_dir, data):
+        self.static_dir = static_dir
+        self.assets = data['assets']
+        # built path -> encodings it has pre-compressed copies for
+        self.built = {}
+        for entry in self.assets.values():
+            self.built[entry['file']] = entry.get('encodings', [])
+            for variant in entry.get('variants', []):
+                self.built[variant['file']] = []
+        stale = [name for name in self.assets if self._changed(name, data['built_at'])]
+        if stale:
+            print(f"Static files changed since the asset build ({', '.join(stale[:5])}); run python assets.py")
+
+    def _changed(self, name, built_at):
+        try:
+            return os.path.getmtime(os.path.join(self.static_dir, *name.split('/'))) > built_at
+        except OSError:
+            return True
+
+    @classmethod
+    def load(cls, static_dir, path=None):
+        try:
+            with open(path or os.path.join(static_dir, BUILD_DIR, MANIFEST)) as f:
+                return cls(static_dir, json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable asset manifest: {e}")
+            return None
+
+    def resolve(self, filename, width=None, fmt=None):
+        entry = self.assets.get(filename)
+        if not entry:
+            return filename
+        if width is None and fmt is None:
+            return entry['file']
+        variants = [v for v in entry.get('variants', []) if v['format'] == (fmt or entry['format'])]
+        if not variants:
+            return entry['file']
+        if width is None:
+            return variants[-1]['file']
+        return next((v['file'] for v in variants if v['width'] >= width), variants[-1]['file'])
+
+    # Widths of the resized copies in `fmt` (the source's own format by
+    # default), smallest first
+    def widths(self, filename, fmt=None):
+        entry = self.assets.get(filename)
+        if not entry:
+            return []
+        return [v['width'] for v in entry.get('variants', []) if v['format'] == (fmt or entry['format'])]
+
+
+# url_defaults hook: swaps the static filename for its built one and drops the
+# width/format arguments, which are only hints for picking a variant
+def static_url_defaults(endpoint, values):
+    if endpoint != 'static':
+        return
+    width, fmt = values.pop('width', None), values.pop('format', None)
+    manifest = current_app.extensions.get('assets')
+    if manifest and 'filename' in values:
+        values['filename'] = manifest.resolve(values['filename'], width, fmt)
+
+
+# Template global: the widths url_for('static', ...) can pick from, so
+# templates only offer WebP and 2x copies the build actually made
+def image_widths(filename, fmt=None):
+    manifest = current_app.extensions.get('assets')
+    return manifest.widths(filename, fmt) if manifest else []
+
+
+# Replaces Flask's static view: built files are served with a one year
+# immutable Cache-Control and, where the client accepts it, pre-compressed;
+# everything else goes to the stock view
+def static_file(filename):
+    manifest = current_app.extensions.get('assets')
+    if not manifest or filename not in manifest.built:
+        return current_app.send_static_file(filename)
+    encodings = manifest.built[filename]
+    served, encoding = filename, None
+    for enc, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if enc in encodings and request.accept_encodings[enc] > 0:
+            served, encoding = filename + suffix, enc
+            break
+    response = send_from_directory(current_app.static_folder, served, mimetype=mimetypes.guess_type(filename)[0],
+                                   max_age=MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if encodings:
+        response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    app.extensions['assets'] = AssetManifest.load(app.static_folder, app.config.get('ASSET_MANIFEST'))
+    app.url_defaults(static_url_defaults)
+    app.add_template_global(image_widths)
+    app.view_functions['static'] = static_file
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build fingerprinted, compressed and resized static assets")
+    parser.add_argument('--static', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
+    parser.add_argument('--clean', action='store_true', help="remove the build instead")
+    args = parser.parse_args(argv)
+
+    if args.clean:
+        shutil.rmtree(os.path.join(args.static, BUILD_DIR), ignore_errors=True)
+        return 0
+    if not Image:
+        print("Pillow is not installed: images are fingerprinted but not resized")
+    if not brotli:
+        print("brotli is not installed: only gzip variants are written")
+    builder = AssetBuilder(args.static)
+    assets = builder.build()
+    print(f"{len(assets)} assets, {builder.bytes_in / 1024:.0f} KB in, "
+          f"{builder.bytes_out / 1024:.0f} KB written to {builder.out_dir}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
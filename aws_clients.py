@@ -0,0 +1,189 @@
+import os, threading, time
+from botocore.config import Config
+
+# ---------- AWS Clients ----------
+# The one place boto3 clients and resources are made. Each is created on
+# first use and shared by every thread of the process (the DynamoDB store
+# only calls table actions, which go straight to the thread-safe client);
+# a forked worker notices the new pid and builds its own, so gunicorn
+# workers never share the parent's sockets.
+#
+# Every client gets:
+#   - a connection pool sized to the threads that use it: for DynamoDB the
+#     AWS_WORKER_THREADS request threads, the ASYNC_IO_THREADS I/O pool the
+#     async dashboard runs its calls on and the JOB_WORKERS background jobs;
+#     the notifier's workers for SNS (AWS_MAX_POOL_CONNECTIONS overrides both)
+#   - AWS_RETRY_MODE retries ('adaptive' also rate-limits the client when
+#     DynamoDB throttles) up to AWS_MAX_ATTEMPTS
+#   - connect/read timeouts and TCP keepalive
+#
+# stats() reports calls, attempts (so retries), errors, in-flight and peak
+# requests, and the connection pool's size, use and connections opened.
+# With AWS_LOCAL the local_aws.py stand-ins are handed out instead.
+
+
+class ClientStats:
+    def __init__(self):
+        self.calls = 0
+        self.attempts = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.attempt_seconds = 0.0
+        self._lock = threading.Lock()
+        self._started = threading.local()
+
+    # Hooks botocore's per-call and per-attempt events. Handlers return None
+    # so they never change what botocore does.
+    def attach(self, events, service):
+        events.register(f'before-call.{service}', self._call)
+        events.register(f'before-send.{service}', self._send)
+        events.register(f'needs-retry.{service}', self._attempt_done)
+        events.register(f'after-call-error.{service}', self._error)
+
+    def _call(self, **kwargs):
+        with self._lock:
+            self.calls += 1
+
+    def _send(self, **kwargs):
+        self._started.at = time.perf_counter()
+        with self._lock:
+            self.attempts += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def _attempt_done(self, **kwargs):
+        elapsed = time.perf_counter() - getattr(self._started, 'at', time.perf_counter())
+        with self._lock:
+            self.in_flight -= 1
+            self.attempt_seconds += elapsed
+
+    def _error(self, **kwargs):
+        with self._lock:
+            self.errors += 1
+
+    def to_dict(self):
+        with self._lock:
+            return {'calls': self.calls, 'attempts': self.attempts, 'retries': max(0, self.attempts - self.calls),
+                    'errors': self.errors, 'in_flight': self.in_flight, 'peak_in_flight': self.peak_in_flight,
+                    'avg_attempt_ms': round(1000 * self.attempt_seconds / self.attempts, 2) if self.attempts else None}
+
+
+# Reads the urllib3 pools behind a botocore client. These are private
+# attributes, so anything unexpected just leaves the pool figures out.
+def pool_usage(client):
+    try:
+        http = client._endpoint.http_session
+        with http._manager.pools.lock:
+            pools = list(http._manager.pools._container.values())
+        return {'max_per_host': http._max_pool_connections,
+                'hosts': len(pools),
+                'in_use': sum(p.pool.maxsize - p.pool.qsize() for p in pools if p.pool is not None),
+                'connections_opened': sum(p.num_connections for p in pools)}
+    except (AttributeError, TypeError):
+        return None
+
+
+class AWSClients:
+    def __init__(self, region, pool_sizes, connect_timeout=2.0, read_timeout=5.0, retry_mode='adaptive',
+                 max_attempts=5, local=False, local_latency=0.0):
+        self.region = region
+        self.pool_sizes = pool_sizes  # service -> max connections
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retry_mode = retry_mode
+        self.max_attempts = max_attempts
+        self.local = local
+        self.local_latency = local_latency
+        self._lock = threading.Lock()
+        self._pid = None
+        self._session = None
+        self._clients = {}
+        self._resources = {}
+        self._tables = {}
+        self._stats = {}
+
+    def config(self, service):
+        return Config(region_name=self.region, max_pool_connections=self.pool_sizes.get(service, 10),
+                      connect_timeout=self.connect_timeout, read_timeout=self.read_timeout,
+                      retries={'mode': self.retry_mode, 'max_attempts': self.max_attempts}, tcp_keepalive=True)
+
+    # Called with the lock held. The local stand-ins keep their data across a
+    # fork; real clients are dropped (not closed: the parent still uses them).
+    def _check_pid(self):
+        if self._pid != os.getpid() and not self.local:
+            self._session = None
+            self._clients, self._resources, self._tables, self._stats = {}, {}, {}, {}
+        self._pid = os.getpid()
+
+    def _boto3_session(self):
+        if self._session is None:
+            import boto3
+            self._session = boto3.session.Session()
+        return self._session
+
+    def client(self, service):
+        client = self._clients.get(service)
+        if client is not None and self._pid == os.getpid():
+            return client
+        with self._lock:
+            self._check_pid()
+            if service not in self._clients:
+                if self.local:
+                    import local_aws
+                    self._clients[service] = local_aws.LocalSNS(latency=self.local_latency)
+                else:
+                    client = self._boto3_session().client(service, config=self.config(service))
+                    self._stats[service] = ClientStats()
+                    self._stats[service].attach(client.meta.events, service)
+                    self._clients[service] = client
+            return self._clients[service]
+
+    def resource(self, service):
+        resource = self._resources.get(service)
+        if resource is not None and self._pid == os.getpid():
+            return resource
+        with self._lock:
+            self._check_pid()
+            if service not in self._resources:
+                if self.local:
+                    import local_aws
+                    self._resources[service] = local_aws.LocalDynamoDB(latency=self.local_latency)
+                else:
+                    resource = self._boto3_session().resource(service, config=self.config(service))
+                    self._stats[service] = ClientStats()
+                    self._stats[service].attach(resource.meta.client.meta.events, service)
+                    self._resources[service] = resource
+            return self._resources[service]
+
+    def table(self, name):
+        table = self._tables.get(name)
+        if table is not None and self._pid == os.getpid():
+            return table
+        resource = self.resource('dynamodb')
+        with self._lock:
+            return self._tables.setdefault(name, resource.Table(name))
+
+    def stats(self):
+        with self._lock:
+            clients = dict(self._clients)
+            clients.update({service: r.meta.client for service, r in self._resources.items() if not self.local})
+            stats = dict(self._stats)
+        report = {'local': self.local, 'retry_mode': self.retry_mode, 'services': {}}
+        for service, stat in stats.items():
+            report['services'][service] = dict(stat.to_dict(), pool=pool_usage(clients.get(service)))
+        return report
+
+
+def make_aws_clients(app):
+    pool_sizes = {
+        # request threads, the async I/O pool and the JobRunner workers
+        # (clear_history, sales backfill) can all be in a call at once
+        'dynamodb': app.config['AWS_MAX_POOL_CONNECTIONS']
+                    or app.config['AWS_WORKER_THREADS'] + app.config['ASYNC_IO_THREADS'] + app.config['JOB_WORKERS'],
+        'sns': app.config['AWS_MAX_POOL_CONNECTIONS'] or max(1, app.config['NOTIFY_WORKERS']),
+    }
+    return AWSClients(app.config['AWS_REGION'], pool_sizes,
+                      connect_timeout=app.config['AWS_CONNECT_TIMEOUT'], read_timeout=app.config['AWS_READ_TIMEOUT'],
+                      retry_mode=app.config['AWS_RETRY_MODE'], max_attempts=app.config['AWS_MAX_ATTEMPTS'],
+                      local=app.config.get('AWS_LOCAL'), local_latency=app.config.get('AWS_LOCAL_LATENCY', 0.0))
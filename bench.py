@@ -0,0 +1,189 @@
+import argparse, datetime, json, os, random, re, sys, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from factory import create_app
+
+# ---------- Booking Flow Benchmark ----------
+# Drives the full booking flow through the Flask test client:
+#
+#   register -> login -> booking -> seating (GET, POST) -> payment (GET, POST)
+#            -> tickets -> dashboard
+#
+# with N virtual users running in parallel, then prints p50/p95/p99 latency
+# and requests per second for every route, and the whole run's requests per
+# second. Runs fully offline: the DynamoDB
+# backend uses the local stand-in, SQLite uses a throwaway database file.
+#
+#   python bench.py --backend dynamodb --users 50 --concurrency 8 --bookings 3
+#   python bench.py --backend sqlite --json before.json
+#   python bench.py --backend sqlite --json after.json --compare before.json
+#
+# --compare adds each route's p95 and req/s change against the earlier run.
+#
+# With --waiting-room RATE every title gets a waiting room; users wait in line
+# (polling every QUEUE_POLL seconds) and the waiting pages count as 'queued'.
+
+
+OCCUPIED = re.compile(rb'BigInt\("(\d+)"\)')
+SEAT = re.compile(rb'data-i="(\d+)">([A-Z]+\d+)</button>')
+QUEUE_POLL = 0.2
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self.lock = threading.Lock()
+
+    def timed(self, route, fn, ok=(200, 302)):
+        start = time.perf_counter()
+        response = fn()
+        elapsed = time.perf_counter() - start
+        if 'X-Queue-Position' in response.headers:
+            route = 'queued'
+        with self.lock:
+            self.samples.setdefault(route, []).append(elapsed)
+            if response.status_code not in ok:
+                self.errors[route] = self.errors.get(route, 0) + 1
+        return response
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+
+
+# Picks `count` free seats from the occupancy bitmap the seating page sends
+def pick_free_seats(page, count):
+    occupied = int(OCCUPIED.search(page).group(1))
+    free = [label.decode() for i, label in SEAT.findall(page) if not occupied >> int(i) & 1]
+    return random.sample(free, min(count, len(free)))
+
+
+def run_user(app, rec, user_no, bookings, stats):
+    client = app.test_client()
+    email = f"bench{user_no}-{time.time_ns()}@example.com"
+    rec.timed('POST /register', lambda: client.post('/register', data={'name': f'Bench {user_no}', 'email': email, 'password': 'secret'}))
+    rec.timed('POST /login', lambda: client.post('/login', data={'email': email, 'password': 'secret'}))
+
+    schedule, now = app.extensions['schedule'].current(), datetime.datetime.now()
+    upcoming = [show for day in schedule.listed_dates for movie in app.extensions['catalog'].movies()
+                for theater, shows in schedule.by_theater(movie['title'], day.isoformat(), after=now) for show in shows]
+    for n in range(bookings):
+        show = random.choice(upcoming)
+        title = show.movie
+        form = {'show_time': f"{show.theater}|{show.time}", 'date': show.day}
+        queued_at = time.perf_counter()
+        while 'X-Queue-Position' in rec.timed('POST /booking', lambda: client.post(f'/booking/{title}', data=form)).headers:
+            time.sleep(QUEUE_POLL)
+        with rec.lock:
+            stats['queue_seconds'] += time.perf_counter() - queued_at
+        page = rec.timed('GET /seating', lambda: client.get(f'/seating/{title}')).data
+        seats = pick_free_seats(page, random.randint(1, 4))
+        response = rec.timed('POST /seating', lambda: client.post(f'/seating/{title}', data={'seats': ','.join(seats)}))
+        if '/payment/' not in (response.location or ''):
+            # Someone else took the seats between GET and POST
+            with rec.lock:
+                stats['conflicts'] += 1
+            continue
+        booking_id = response.location.rsplit('/', 1)[1]
+        rec.timed('GET /payment', lambda: client.get(f'/payment/{booking_id}'))
+        rec.timed('POST /payment', lambda: client.post(f'/payment/{booking_id}'))
+        rec.timed('GET /tickets', lambda: client.get(f'/tickets?booking_id={booking_id}'))
+        rec.timed('GET /dashboard', lambda: client.get('/dashboard'))
+        with rec.lock:
+            stats['bookings'] += 1
+
+
+def make_bench_app(args, workdir):
+    config = {'SECRET_KEY': 'bench', 'STORAGE_BACKEND': args.backend, 'TESTING': True}
+    if args.backend == 'sqlite':
+        config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        config['SQLITE_PROFILE'] = args.sqlite_profile
+        config['SQLITE_GROUP_COMMIT'] = args.group_commit
+    if args.password_hash:
+        config['PASSWORD_HASH_METHOD'] = args.password_hash
+    if args.waiting_room:
+        config['WAITING_ROOM_RATES'] = {'*': args.waiting_room}
+    if args.backend == 'dynamodb':
+        config['AWS_LOCAL'] = True
+        config['AWS_LOCAL_LATENCY'] = args.aws_latency / 1000
+    return create_app(config)
+
+
+def run(args):
+    os.environ.pop('MOVIE_MAGIC_STORAGE', None)
+    with tempfile.TemporaryDirectory() as workdir:
+        app = make_bench_app(args, workdir)
+        rec = Recorder()
+        stats = {'bookings': 0, 'conflicts': 0, 'queue_seconds': 0.0}
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            futures = [pool.submit(run_user, app, rec, u, args.bookings, stats) for u in range(args.users)]
+            for f in futures:
+                f.result()
+        wall = time.perf_counter() - start
+
+    report = {'backend': args.backend, 'users': args.users, 'concurrency': args.concurrency,
+              'wall_seconds': wall, 'rps': sum(map(len, rec.samples.values())) / wall, 'routes': {}, **stats}
+    for route, values in rec.samples.items():
+        report['routes'][route] = {
+            'count': len(values),
+            'errors': rec.errors.get(route, 0),
+            'p50_ms': percentile(values, 50) * 1000,
+            'p95_ms': percentile(values, 95) * 1000,
+            'p99_ms': percentile(values, 99) * 1000,
+            'rps': len(values) / wall,
+        }
+    return report
+
+
+def print_report(report, baseline=None):
+    print(f"backend={report['backend']} users={report['users']} concurrency={report['concurrency']} "
+          f"wall={report['wall_seconds']:.2f}s bookings={report['bookings']} seat_conflicts={report['conflicts']}"
+          f" avg_queue_wait={report.get('queue_seconds', 0) / max(1, report['bookings']):.2f}s")
+    line = f"total req/s={report['rps']:.1f}"
+    if baseline and baseline.get('rps'):
+        line += f" ({(report['rps'] / baseline['rps'] - 1) * 100:+.1f}% vs base)"
+    print(line)
+    print(f"{'route':<16}{'count':>7}{'err':>5}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}"
+          + (f"{'p95 vs base':>13}{'req/s vs base':>15}" if baseline else ''))
+    for route, r in sorted(report['routes'].items()):
+        line = (f"{route:<16}{r['count']:>7}{r['errors']:>5}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}"
+                f"{r['p99_ms']:>9.2f}{r['rps']:>9.1f}")
+        base = (baseline or {}).get('routes', {}).get(route)
+        if base:
+            line += (f"{(r['p95_ms'] / base['p95_ms'] - 1) * 100:>+12.1f}%"
+                     f"{(r['rps'] / base['rps'] - 1) * 100:>+14.1f}%")
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Movie Magic booking flow")
+    parser.add_argument('--backend', choices=['sqlite', 'dynamodb', 'memory'], default='dynamodb')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--bookings', type=int, default=3, help="bookings per user")
+    parser.add_argument('--aws-latency', type=float, default=0.0, help="ms added per local DynamoDB call")
+    parser.add_argument('--sqlite-profile', choices=['default', 'production'], default='default')
+    parser.add_argument('--group-commit', action='store_true', help="SQLite: commit concurrent bookings together")
+    parser.add_argument('--waiting-room', type=float, help="users let into booking per second, for every title")
+    parser.add_argument('--password-hash', help="e.g. pbkdf2:sha256:1000, so hashing does not dominate the run")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help="write the report to this file")
+    parser.add_argument('--compare', help="earlier --json report to compare p95 and req/s against")
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    report = run(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
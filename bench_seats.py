@@ -0,0 +1,83 @@
+import argparse, json, random, time
+from seat_inventory import SeatLayout
+
+# ---------- Best Available Micro-Benchmark ----------
+# Times BlockTable.best() (seat_inventory.py) against a plain scan that checks
+# every preferred block seat by seat, for several hall sizes, party sizes and
+# occupancy levels. Occupied seats are scattered at random, so near-full
+# halls often have no block left at all, the case a scan pays most for.
+#
+#   python bench_seats.py
+#   python bench_seats.py --halls 10x12,30x40 --parties 2,6 --occupancy 0,0.9,0.99 --json seats.json
+
+ROWS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def make_layout(spec):
+    rows, per_row = (int(x) for x in spec.split('x'))
+    labels = [ROWS[i % 26] * (i // 26 + 1) for i in range(rows)]
+    return SeatLayout(labels, per_row)
+
+
+def random_occupancy(layout, share, rng):
+    occupied = 0
+    for i in range(layout.capacity):
+        if rng.random() < share:
+            occupied |= 1 << i
+    return occupied
+
+
+def naive_best(table, occupied):
+    for start in table.order:
+        if all(not occupied >> (start + k) & 1 for k in range(table.n)):
+            return start
+    return None
+
+
+def timed(fn, bitmaps, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for occupied in bitmaps:
+            fn(occupied)
+    return (time.perf_counter() - start) / (rounds * len(bitmaps))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Best-available seat allocation micro-benchmark")
+    parser.add_argument('--halls', default='10x12,20x25,30x40', help="rows x seats per row, comma separated")
+    parser.add_argument('--parties', default='2,4,8')
+    parser.add_argument('--occupancy', default='0,0.5,0.8,0.95,0.99')
+    parser.add_argument('--samples', type=int, default=50, help="random seat maps per case")
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help="write the results here")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    results = []
+    print(f"{'hall':>7} {'seats':>6} {'party':>5} {'occupied':>8} {'found':>6} {'best us':>9} {'scan us':>9} {'speedup':>8}")
+    for spec in args.halls.split(','):
+        layout = make_layout(spec)
+        for party in (int(p) for p in args.parties.split(',')):
+            if party > layout.seats_per_row:
+                continue
+            table = layout.blocks(party)
+            for share in (float(o) for o in args.occupancy.split(',')):
+                bitmaps = [random_occupancy(layout, share, rng) for _ in range(args.samples)]
+                found = sum(table.best(b) is not None for b in bitmaps) / len(bitmaps)
+                assert all(table.best(b) == naive_best(table, b) for b in bitmaps)
+                best = timed(table.best, bitmaps, args.rounds)
+                scan = timed(lambda b: naive_best(table, b), bitmaps, args.rounds)
+                row = {'hall': spec, 'capacity': layout.capacity, 'party': party, 'occupancy': share,
+                       'found': round(found, 2), 'best_us': round(best * 1e6, 2), 'scan_us': round(scan * 1e6, 2)}
+                results.append(row)
+                print(f"{spec:>7} {layout.capacity:>6} {party:>5} {share:>8.2f} {found:>6.0%} "
+                      f"{row['best_us']:>9.2f} {row['scan_us']:>9.2f} {scan / best:>7.1f}x")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+import datetime, hashlib, json, os, re, threading, time
+
+# ---------- Movie Catalog ----------
+# Movies, theaters, screens and the weekly show plan live in data/catalog.json
+# instead of code:
+#
+#   {"days_ahead": 7,
+#    "theaters": [{"name", "screens": [{"name", "rows", "seats_per_row"}]}],
+#    "movies": [{"title", "price", "image", "runtime" (minutes),
+#                "shows": [{"theater", "screen", "times": ["4:00 PM", ...],
+#                           "days": ["Sat", "Sun"]}]}]}    days optional
+#
+# Each load builds an immutable CatalogSnapshot with every lookup precomputed
+# (case-folded title and slug -> movie), so a lookup is one dict access however
+# large the catalog gets. schedule.py turns the show plan into dated shows. Catalog swaps in
+# a new snapshot when the file changes on disk, without a restart, and bumps
+# `version`; on_reload() callbacks let caches drop what they built from the
+# old one. A file that fails to load leaves the current snapshot in place.
+
+WEEKDAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+
+def slugify(title):
+    return re.sub(r'[^a-z0-9]+', '-', title.casefold()).strip('-')
+
+
+class CatalogError(ValueError):
+    pass
+
+
+class CatalogSnapshot:
+    def __init__(self, data, version):
+        self.version = version
+        self.digest = hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()[:16]
+        self.days_ahead = int(data.get('days_ahead', 7))
+        self.theaters = [t['name'] for t in data.get('theaters', [])]
+        # theater -> screen name -> {'rows', 'seats_per_row'}
+        self.screens = {t['name']: {s['name']: {'rows': s['rows'], 'seats_per_row': int(s['seats_per_row'])}
+                                    for s in t.get('screens', [])}
+                        for t in data.get('theaters', [])}
+
+        self.movies = []
+        self._by_key = {}
+        # title -> [{'theater', 'screen', 'times', 'weekdays'}]
+        self.show_plan = {}
+        for raw in data.get('movies', []):
+            if not raw.get('title') or 'price' not in raw:
+                raise CatalogError(f"Movie entry needs a title and a price: {raw!r}")
+            movie = {'title': raw['title'], 'slug': raw.get('slug') or slugify(raw['title']),
+                     'price': int(raw['price']), 'image': raw.get('image', ''),
+                     'runtime': int(raw.get('runtime', 150))}
+            for key in (movie['title'].casefold(), movie['slug']):
+                if self._by_key.get(key, movie) is not movie:
+                    raise CatalogError(f"Duplicate movie title or slug: {key}")
+                self._by_key[key] = movie
+
+            plan = []
+            for show in raw.get('shows', []):
+                if show.get('screen') not in self.screens.get(show.get('theater'), {}):
+                    raise CatalogError(f"{movie['title']}: unknown screen {show.get('theater')} / {show.get('screen')}")
+                for t in show['times']:
+                    datetime.datetime.strptime(t, '%I:%M %p')
+                days = [d[:3].lower() for d in show.get('days', WEEKDAYS)]
+                if not set(days) <= set(WEEKDAYS):
+                    raise CatalogError(f"{movie['title']}: bad days {show['days']}")
+                plan.append({'theater': show['theater'], 'screen': show['screen'], 'times': list(show['times']),
+                             'weekdays': {WEEKDAYS.index(d) for d in days}})
+            self.show_plan[movie['title']] = plan
+            self.movies.append(movie)
+
+    # Looks a movie up by title (any case) or slug
+    def get(self, title):
+        return self._by_key.get((title or '').casefold()) or self._by_key.get(slugify(title or ''))
+
+    def __len__(self):
+        return len(self.movies)
+
+
+# Reads the catalog from a JSON file; stamp() changes whenever the file does.
+# Anything with the same two methods (e.g. reading from a database table and
+# returning its last-modified time) can stand in for it.
+class FileCatalogSource:
+    def __init__(self, path):
+        self.path = path
+
+    def stamp(self):
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def load(self):
+        with open(self.path, encoding='utf-8') as f:
+            return json.load(f)
+
+
+class Catalog:
+    def __init__(self, source, check_interval=2.0):
+        self.source = source
+        self.check_interval = check_interval
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._stamp = source.stamp()
+        self._snapshot = CatalogSnapshot(source.load(), 1)
+        self._checked_at = time.monotonic()
+
+    @property
+    def version(self):
+        return self._snapshot.version
+
+    def on_reload(self, fn):
+        self._listeners.append(fn)
+
+    # The current snapshot. Checks the source for changes at most once per
+    # check_interval; callers never wait on a reload another thread is doing.
+    def snapshot(self):
+        if time.monotonic() - self._checked_at >= self.check_interval and self._lock.acquire(blocking=False):
+            try:
+                self._checked_at = time.monotonic()
+                self._reload_if_changed()
+            finally:
+                self._lock.release()
+        return self._snapshot
+
+    def reload(self):
+        with self._lock:
+            self._stamp = None
+            self._reload_if_changed()
+        return self._snapshot
+
+    def _reload_if_changed(self):
+        try:
+            stamp = self.source.stamp()
+            if stamp == self._stamp:
+                return
+            snapshot = CatalogSnapshot(self.source.load(), self._snapshot.version + 1)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Catalog reload failed, keeping version {self._snapshot.version}: {e}")
+            return
+        self._stamp = stamp
+        if snapshot.digest == self._snapshot.digest:
+            return
+        self._snapshot = snapshot
+        print(f"Catalog reloaded: version {snapshot.version}, {len(snapshot)} movies")
+        for fn in self._listeners:
+            try:
+                fn(snapshot)
+            except Exception as e:
+                print(f"Catalog reload listener failed: {e}")
+
+    # Shortcuts for the current snapshot
+    def get(self, title):
+        return self.snapshot().get(title)
+
+    def movies(self):
+        return self.snapshot().movies
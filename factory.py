@@ -0,0 +1,165 @@
+from flask import Flask
+import os
+import routes
+import assets
+from holds import HoldManager
+from jobs import JobRunner
+from catalog import Catalog, FileCatalogSource
+from fragments import FragmentCache
+from schedule import Scheduler
+from seat_inventory import SeatInventory
+from seat_events import SeatEvents
+from storage import make_store
+from aws_clients import make_aws_clients
+from notifications import make_notifier
+from passwords import PasswordHasher
+from aio import AsyncIO
+from analytics import SalesReport
+from metrics import Metrics
+import profiling
+import waiting_room
+from tickets import TicketCache, TicketExporter
+
+# ---------- App Factory ----------
+# app.py (SQLite) and aws_app.py (DynamoDB) both build their app here and only
+# differ in config. STORAGE_BACKEND picks the backend: 'sqlite', 'dynamodb' or
+# 'memory'; the MOVIE_MAGIC_STORAGE environment variable overrides it, e.g. to
+# run either entry point against the in-memory store for load tests.
+# MOVIE_MAGIC_AWS=local runs the DynamoDB backend against local_aws.py.
+DEFAULT_CONFIG = {
+    'CATALOG_PATH': None,  # defaults to data/catalog.json next to this file
+    'CATALOG_CHECK_INTERVAL': 2.0,  # seconds between checks for an edited catalog
+    'STORAGE_BACKEND': 'sqlite',
+    'SQLALCHEMY_DATABASE_URI': 'sqlite:///movie_magic.db',
+    'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+    'SQLITE_PROFILE': 'default',  # 'production': WAL, tuned pragmas and a connection pool; see sqlite_tuning.py
+    'SQLITE_GROUP_COMMIT': False,  # one writer thread commits concurrent bookings together
+    'SQLITE_POOL_SIZE': 16,
+    'SQLITE_BUSY_TIMEOUT': 5.0,  # seconds a writer waits for the database lock
+    'SQLITE_CACHE_KB': 64 * 1024,
+    'SQLITE_MMAP_BYTES': 256 * 1024 * 1024,
+    'AWS_REGION': 'us-east-1',
+    'USER_TABLE': 'MovieMagicUsers',
+    'BOOKING_TABLE': 'MovieMagicBookings',
+    'SALES_TABLE': 'MovieMagicShowSales',  # per-show sales totals behind the analytics reports
+    'AWS_LOCAL': False,
+    'AWS_LOCAL_LATENCY': 0.0,  # seconds added per local AWS call
+    'AWS_WORKER_THREADS': 8,  # request threads per process: sync views under asgi.py (or gunicorn --threads); with ASYNC_IO_THREADS and JOB_WORKERS sizes the DynamoDB pool
+    'AWS_MAX_POOL_CONNECTIONS': None,  # overrides the pool size worked out per client
+    'AWS_CONNECT_TIMEOUT': 2.0,
+    'AWS_READ_TIMEOUT': 5.0,
+    'AWS_RETRY_MODE': 'adaptive',  # or 'standard' / 'legacy'
+    'AWS_MAX_ATTEMPTS': 5,
+    'STORE_CACHE_TTL': 30,  # seconds users and bookings are served from the process-local cache; 0 turns it off
+    'STORE_CACHE_MAX_ENTRIES': 10000,
+    'ASYNC_IO_THREADS': 16,  # threads the async views' storage and PDF calls run on, shared by all requests
+    'DASHBOARD_PAGE_SIZE': 10,
+    'JOB_WORKERS': 2,  # background job threads (history clearing, sales backfill)
+    'CLEAR_HISTORY_BATCH_SIZE': 25,  # bookings per delete batch (DynamoDB allows at most 25)
+    'SEAT_HOLD_TTL': 600,  # seconds a user has to pay before held seats are released
+    # Holds are kept per process, so the app must run as a single worker
+    # process (threads are fine); see README.md
+    'WAITING_ROOM_RATES': {},  # title (or '*') -> users let into booking per second per process; see waiting_room.py
+    'WAITING_ROOM_BURST': 20,  # users let straight in when a line is quiet
+    'WAITING_ROOM_MAX_QUEUE': 5000,  # people waiting per title before newcomers get a 503
+    'WAITING_ROOM_ADMIT_TTL': 900,  # seconds an admitted user may keep booking that title
+    'BEST_SEATS_MAX': 10,  # largest party "best available" will seat together (never more than a row)
+    'SEAT_EVENTS_BACKLOG': 256,  # seat changes kept per show for subscribers catching up
+    'SEAT_EVENTS_MAX_WAITING': 1000,  # seat-map polls per process waiting for a change on the event loop (asgi.py only)
+    'SEAT_EVENTS_WAIT_SECONDS': 25,  # a waiting poll answers after this even with no change
+    'SEAT_EVENTS_POLL_MS': 3000,  # reconnect delay for polls that answer at once (WSGI, or beyond SEAT_EVENTS_MAX_WAITING)
+    'TICKET_CACHE_DIR': None,  # defaults to <instance path>/ticket_cache
+    'TICKET_CACHE_MAX_BYTES': 64 * 1024 * 1024,
+    'EXPORT_WORKERS': 2,  # ticket render processes for bulk export; 0 renders in the request thread
+    'EXPORT_CHUNK_SIZE': 25,  # tickets per render task
+    'EXPORT_WINDOW': 4,  # render tasks in flight per export, bounds its memory
+    'PASSWORD_HASH_METHOD': 'scrypt',  # any werkzeug method, e.g. 'pbkdf2:sha256:600000'; old hashes upgrade on login
+    'PASSWORD_HASH_WORKERS': 2,  # hashing processes; 0 hashes on the request thread
+    'PASSWORD_HASH_MAX_PENDING': 64,  # hashes queued or running before requests wait for a slot
+    'PASSWORD_HASH_WAIT': 2.0,  # seconds a request waits for a slot before getting a 503
+    'STAFF_EMAILS': (),  # may export every ticket of a show
+    'ANALYTICS_CACHE_TTL': 10,  # seconds a process reuses the sales totals it read; see analytics.py
+    'ANALYTICS_BACKFILL_PAGE_SIZE': 500,  # bookings read per page when rebuilding the totals
+    'SNS_TOPIC_ARN': None,
+    'NOTIFY_SINK': None,  # 'sns', 'file', 'memory' or 'off'; see notifications.make_notifier
+    'NOTIFY_FILE': None,  # for the file sink; defaults to <instance path>/notifications.jsonl
+    'NOTIFY_WORKERS': 2,
+    'NOTIFY_MAX_QUEUE': 10000,  # messages beyond this are dropped, never waited for
+    'NOTIFY_MAX_ATTEMPTS': 5,
+    'FRAGMENT_CACHE_MAX_ENTRIES': 2000,  # rendered page fragments kept, least recently used go first
+    'FRAGMENT_CACHE_TTL': 300,  # seconds; 0 turns the fragment cache off
+    'ASSET_MANIFEST': None,  # defaults to static/dist/manifest.json, written by python assets.py
+    'METRICS_ENABLED': True,  # request, storage, template and cache metrics on /metrics; see metrics.py
+    'METRICS_TOKEN': None,  # scrapers send "Authorization: Bearer <token>"; otherwise /metrics is staff only
+    'METRICS_SERVER_TIMING': False,  # adds a Server-Timing header with each request's sections
+    'PROFILE_SLOW_REQUESTS': None,  # seconds; slower requests dump a sampled profile (see profiling.py)
+    'PROFILE_SAMPLE_INTERVAL': 0.005,  # seconds between stack samples
+    'PROFILE_SAMPLE_RATE': 1.0,  # share of requests sampled
+    'PROFILE_DIR': None,  # defaults to <instance path>/profiles
+    'PROFILE_MAX_FILES': 100,
+    'PROFILE_EXCLUDE': ('seat_updates',),  # endpoints never profiled, e.g. long-lived streams
+}
+
+def create_app(config=None):
+    app = Flask(__name__)
+    app.config.update(DEFAULT_CONFIG)
+    app.config.update(config or {})
+    if os.environ.get('MOVIE_MAGIC_STORAGE'):
+        app.config['STORAGE_BACKEND'] = os.environ['MOVIE_MAGIC_STORAGE']
+    if os.environ.get('MOVIE_MAGIC_AWS') == 'local':
+        app.config['AWS_LOCAL'] = True
+
+    catalog = Catalog(FileCatalogSource(app.config['CATALOG_PATH'] or os.path.join(app.root_path, 'data', 'catalog.json')),
+                      check_interval=app.config['CATALOG_CHECK_INTERVAL'])
+    app.extensions['aws'] = make_aws_clients(app)
+    if app.config['METRICS_ENABLED']:
+        app.extensions['metrics'] = Metrics()
+    store = make_store(app)
+    scheduler = Scheduler(catalog)
+    scheduler.current()  # fail at startup, not on the first request, if the show plan conflicts
+    inventory = SeatInventory(loader=store.sold_seats, layout_for=scheduler.layout_for)
+    # A screen whose seat layout changed invalidates its shows' seat bitmaps
+    scheduler.on_rebuild(lambda old, new: inventory.forget_where(
+        lambda key: old.layout_for(key).labels != new.layout_for(key).labels))
+    fragments = FragmentCache(app.config['FRAGMENT_CACHE_MAX_ENTRIES'], app.config['FRAGMENT_CACHE_TTL'])
+    catalog.on_reload(lambda snapshot: fragments.invalidate_tag('catalog'))
+    scheduler.on_rebuild(lambda old, new: fragments.invalidate_tag('schedule'))
+    seat_events = SeatEvents(inventory, app.config['SEAT_EVENTS_BACKLOG'], app.config['SEAT_EVENTS_MAX_WAITING'],
+                             app.config['SEAT_EVENTS_WAIT_SECONDS'], app.config['SEAT_EVENTS_POLL_MS'])
+    holds = HoldManager(inventory, ttl=app.config['SEAT_HOLD_TTL'])
+    holds.start_reaper()
+
+    app.extensions['catalog'] = catalog
+    app.extensions['schedule'] = scheduler
+    app.extensions['store'] = store
+    app.extensions['aio'] = AsyncIO(store, app.config['ASYNC_IO_THREADS'])
+    app.extensions['inventory'] = inventory
+    app.extensions['holds'] = holds
+    app.extensions['seat_events'] = seat_events
+    app.extensions['fragments'] = fragments
+    app.extensions['jobs'] = JobRunner(app, app.config['JOB_WORKERS'])
+    app.extensions['analytics'] = SalesReport(store, scheduler, app.config['ANALYTICS_CACHE_TTL'])
+    app.extensions['tickets'] = TicketCache(app.config['TICKET_CACHE_DIR'] or os.path.join(app.instance_path, 'ticket_cache'),
+                                            max_bytes=app.config['TICKET_CACHE_MAX_BYTES'])
+    app.extensions['exports'] = TicketExporter(app.config['EXPORT_WORKERS'], app.config['EXPORT_CHUNK_SIZE'],
+                                               app.config['EXPORT_WINDOW'])
+    app.extensions['notifier'] = make_notifier(app)
+    app.extensions['passwords'] = PasswordHasher(app.config['PASSWORD_HASH_METHOD'], app.config['PASSWORD_HASH_WORKERS'],
+                                                 app.config['PASSWORD_HASH_MAX_PENDING'], app.config['PASSWORD_HASH_WAIT'])
+
+    if app.config['PROFILE_SLOW_REQUESTS'] is not None:
+        app.extensions['profiler'] = profiling.SamplingProfiler(
+            app.config['PROFILE_DIR'] or os.path.join(app.instance_path, 'profiles'), app.config['PROFILE_SLOW_REQUESTS'],
+            app.config['PROFILE_SAMPLE_INTERVAL'], app.config['PROFILE_SAMPLE_RATE'], app.config['PROFILE_MAX_FILES'])
+        profiling.init_app(app, app.extensions['profiler'])
+    if app.config['METRICS_ENABLED']:
+        app.extensions['metrics'].init_app(app)
+    if app.config['WAITING_ROOM_RATES']:
+        app.extensions['waiting_room'] = waiting_room.WaitingRoom(
+            app.config['WAITING_ROOM_RATES'], app.config['WAITING_ROOM_BURST'], app.config['WAITING_ROOM_MAX_QUEUE'],
+            app.config['WAITING_ROOM_ADMIT_TTL'])
+        waiting_room.init_app(app, app.extensions['waiting_room'])
+
+    assets.init_app(app)
+    routes.init_app(app)
+    return app
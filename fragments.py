@@ -0,0 +1,62 @@
+import threading, time
+from collections import OrderedDict
+from markupsafe import Markup
+
+# ---------- Fragment Cache ----------
+# Rendered HTML for the parts of a page that are the same for every user (the
+# movie grid, a movie's show times for a day, a screen's seat map) is kept
+# here and pasted into the per-request page, which only renders the small
+# per-user bits around it.
+#
+# Each entry has its own TTL and a set of tags. Anything built from the
+# catalog is tagged 'catalog', anything built from the schedule 'schedule';
+# create_app() drops those tags when the catalog reloads or the schedule is
+# rebuilt. The least recently used entries go once max_entries is reached.
+class FragmentCache:
+    def __init__(self, max_entries=2000, default_ttl=300):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (html, expires_at, tags)
+        self._lock = threading.Lock()
+
+    # Returns the cached HTML for `key`, or render()s and caches it.
+    # Rendering happens outside the lock; two requests missing the same key
+    # at once both render and the last one wins.
+    def get_or_render(self, key, render, ttl=None, tags=()):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        self.misses += 1
+        html = Markup(render())
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl > 0:
+            with self._lock:
+                self._entries[key] = (html, now + ttl, frozenset(tags))
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return html
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_tag(self, tag):
+        with self._lock:
+            for key in [k for k, entry in self._entries.items() if tag in entry[2]]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
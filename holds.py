@@ -0,0 +1,161 @@
+import heapq, threading, time, uuid
+
+# ---------- Seat Holds ----------
+# Selecting seats creates a short-lived hold instead of a booking. The held
+# seats are reserved in the SeatInventory straight away, so nobody else can pick
+# them, and are released again if payment does not confirm the hold in time.
+#
+# Expiry uses a min-heap of (expires_at, hold_id): the reaper only pops holds
+# that are actually due, instead of scanning every hold or booking row.
+#
+# Holds live only in the inventory's bitmaps, which storage knows nothing
+# about, so the manager is also a source for the inventory: a show that is
+# forgotten and reloaded gets its held seats back. Holds still waiting for the
+# reaper count too, since the reaper will release their seats by label.
+#
+# Holds are not shared between processes: the app runs as a single worker
+# process (see README.md), or a payment on another worker would not find
+# its hold.
+class Hold:
+    def __init__(self, key, seats, user_email, price, ttl):
+        self.hold_id = str(uuid.uuid4())
+        self.key = key
+        self.seats_list = list(seats)
+        self.user_email = user_email
+        self.price = price
+        self.expires_at = time.time() + ttl
+
+    # Same attributes as a booking, so payment.html can render either.
+    @property
+    def booking_id(self):
+        return self.hold_id
+
+    @property
+    def movie(self):
+        return self.key[0]
+
+    @property
+    def theater(self):
+        return self.key[1]
+
+    @property
+    def day(self):
+        return self.key[2]
+
+    @property
+    def time(self):
+        return self.key[3]
+
+    @property
+    def seats(self):
+        return ','.join(self.seats_list)
+
+    @property
+    def seconds_left(self):
+        return max(0, int(self.expires_at - time.time()))
+
+    def expired(self, now=None):
+        return (now or time.time()) >= self.expires_at
+
+
+class HoldExpired(Exception):
+    pass
+
+
+class HoldManager:
+    def __init__(self, inventory, ttl=600, reap_interval=5):
+        self.inventory = inventory
+        self.ttl = ttl
+        self.reap_interval = reap_interval
+        self._holds = {}
+        self._heap = []
+        self._lock = threading.Lock()
+        self._reaper = None
+        inventory.add_source(self.held_seats)
+
+    # Seat labels held for a show; only runs when the inventory loads it
+    def held_seats(self, key):
+        with self._lock:
+            return [seat for hold in self._holds.values() if hold.key == key for seat in hold.seats_list]
+
+    # Raises SeatUnavailable / UnknownSeat from the inventory
+    def hold(self, key, seats, user_email, price):
+        self.inventory.reserve(key, seats)
+        return self._add(Hold(key, seats, user_email, price, self.ttl))
+
+    # Holds the best `count` adjacent seats; raises NoSeatsTogether / ValueError
+    def hold_best(self, key, count, user_email, price_per_seat):
+        seats = self.inventory.reserve_best(key, count)
+        return self._add(Hold(key, seats, user_email, price_per_seat * count, self.ttl))
+
+    def _add(self, hold):
+        with self._lock:
+            self._holds[hold.hold_id] = hold
+            heapq.heappush(self._heap, (hold.expires_at, hold.hold_id))
+        return hold
+
+    def get(self, hold_id, user_email=None):
+        hold = self._holds.get(hold_id)
+        if not hold or hold.expired():
+            return None
+        if user_email is not None and hold.user_email != user_email:
+            return None
+        return hold
+
+    # Removes the hold but leaves its seats reserved: they now belong to the
+    # confirmed booking. The caller persists the booking and must call
+    # inventory.release() itself if that fails.
+    def confirm(self, hold_id, user_email=None):
+        with self._lock:
+            hold = self._holds.get(hold_id)
+            if not hold or hold.expired() or (user_email is not None and hold.user_email != user_email):
+                raise HoldExpired(hold_id)
+            del self._holds[hold_id]
+        return hold
+
+    def release(self, hold_id):
+        with self._lock:
+            hold = self._holds.pop(hold_id, None)
+        if hold:
+            self.inventory.release(hold.key, hold.seats_list)
+
+    # Releases every hold that is due; returns how many were released.
+    def reap(self, now=None):
+        now = now or time.time()
+        expired = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                expires_at, hold_id = heapq.heappop(self._heap)
+                hold = self._holds.get(hold_id)
+                # Confirmed or released holds are already gone from _holds
+                if hold and hold.expires_at == expires_at:
+                    del self._holds[hold_id]
+                    expired.append(hold)
+
+        # One inventory update per show, not per hold. A show whose release
+        # fails does not keep the other shows' seats locked.
+        by_show = {}
+        for hold in expired:
+            by_show.setdefault(hold.key, []).extend(hold.seats_list)
+        for key, seats in by_show.items():
+            try:
+                self.inventory.release(key, seats)
+            except Exception as e:
+                print(f"Error releasing expired holds on {key} ({', '.join(seats)}): {e}")
+        return len(expired)
+
+    def start_reaper(self):
+        if self._reaper:
+            return
+        def run():
+            while True:
+                time.sleep(self.reap_interval)
+                try:
+                    self.reap()
+                except Exception as e:
+                    print(f"Error releasing expired seat holds: {e}")
+        self._reaper = threading.Thread(target=run, name='seat-hold-reaper', daemon=True)
+        self._reaper.start()
+
+    def __len__(self):
+        return len(self._holds)
@@ -0,0 +1,70 @@
+import threading, time, uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# ---------- Background Jobs ----------
+# Runs slow work (e.g. clearing a long booking history) off the request
+# thread. The request gets a job id back immediately and can poll
+# JobRunner.get(job_id) for progress. Jobs run inside an app context, so they
+# can use the storage backend like a route would.
+class Job:
+    def __init__(self, kind, owner):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.owner = owner
+        self.status = 'queued'
+        self.progress = {}
+        self.error = None
+        self.finished_at = None
+
+    @property
+    def active(self):
+        return self.status in ('queued', 'running')
+
+    def to_dict(self):
+        return {'id': self.id, 'kind': self.kind, 'status': self.status,
+                'progress': dict(self.progress), 'error': self.error}
+
+
+class JobRunner:
+    def __init__(self, app, max_workers=2, keep_finished=300):
+        self.app = app
+        self.keep_finished = keep_finished
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='movie-magic-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    # fn(job, *args) runs on a worker thread and may update job.progress
+    def submit(self, kind, owner, fn, *args):
+        with self._lock:
+            self._prune()
+            running = self.active(kind, owner)
+            if running:
+                return running
+            job = Job(kind, owner)
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job, fn, args)
+        return job
+
+    def _run(self, job, fn, args):
+        job.status = 'running'
+        try:
+            with self.app.app_context():
+                fn(job, *args)
+            job.status = 'done'
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            print(f"Background job {job.kind} {job.id} failed: {e}")
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def active(self, kind, owner):
+        return next((j for j in self._jobs.values() if j.kind == kind and j.owner == owner and j.active), None)
+
+    def _prune(self):
+        cutoff = time.time() - self.keep_finished
+        for job_id in [j.id for j in self._jobs.values() if j.finished_at and j.finished_at < cutoff]:
+            del self._jobs[job_id]
@@ -0,0 +1,413 @@
+import copy, json, random, re, threading, time, uuid
+from decimal import Decimal
+from botocore.exceptions import ClientError
+from boto3.dynamodb import conditions
+
+# ---------- Local AWS Stand-in ----------
+# Just enough of boto3's DynamoDB resource and SNS client to run aws_app.py
+# offline (tests, benchmarks, laptops without credentials). Tables live in
+# process memory and follow DynamoDB's observable behaviour where the app
+# relies on it: numbers come back as Decimal, query/scan pages stop at 1 MB
+# (or Limit) and return LastEvaluatedKey, batch calls enforce the 100/25 item
+# limits, and ConditionExpression failures raise ConditionalCheckFailedException.
+#
+# Optional knobs:
+#   latency      seconds added to every call, to mimic a network round trip
+#   throttle     fraction of batch items handed back as Unprocessed*
+#
+# Enable it for the app with AWS_LOCAL = True in the config, or by setting
+# MOVIE_MAGIC_AWS=local in the environment.
+
+PAGE_BYTES = 1024 * 1024
+
+# Key schemas of the tables aws_app.py expects to exist
+TABLES = {
+    'MovieMagicUsers': {'hash': 'email', 'indexes': {}},
+    'MovieMagicBookings': {
+        'hash': 'booking_id',
+        # created_at as the sort key serves newest-first pages straight from the index
+        'indexes': {'UserEmailIndex': {'hash': 'user_email', 'range': 'created_at'}},
+    },
+    # Sales totals per show, keyed "movie|theater|day|time"
+    'MovieMagicShowSales': {'hash': 'show', 'indexes': {}},
+}
+
+
+def _error(code, message, operation):
+    return ClientError({'Error': {'Code': code, 'Message': message}}, operation)
+
+
+# DynamoDB hands numbers back as Decimal, whatever went in
+def _to_dynamo(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {k: _to_dynamo(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_to_dynamo(v) for v in value]
+    return value
+
+
+def _item_size(item):
+    return len(json.dumps(item, default=str))
+
+
+def _project(item, projection, names=None):
+    if not projection:
+        return copy.deepcopy(item)
+    names = names or {}
+    fields = [names.get(f.strip(), f.strip()) for f in projection.split(',')]
+    return {f: copy.deepcopy(item[f]) for f in fields if f in item}
+
+
+# ---------- Condition evaluation ----------
+def _operand(value, item):
+    if isinstance(value, conditions.Size):
+        return len(item.get(value.name, ()))
+    if isinstance(value, conditions.AttributeBase):
+        return item.get(value.name)
+    return _to_dynamo(value)
+
+
+def evaluate(condition, item):
+    if isinstance(condition, str):
+        return _evaluate_string(condition, item)
+    op = condition.expression_operator
+    values = condition._values
+    if op == 'AND':
+        return evaluate(values[0], item) and evaluate(values[1], item)
+    if op == 'OR':
+        return evaluate(values[0], item) or evaluate(values[1], item)
+    if op == 'NOT':
+        return not evaluate(values[0], item)
+    if op == 'attribute_exists':
+        return values[0].name in item
+    if op == 'attribute_not_exists':
+        return values[0].name not in item
+
+    left = _operand(values[0], item)
+    if op == 'IN':
+        return left in [_to_dynamo(v) for v in values[1]]
+    if left is None:
+        return False
+    right = _operand(values[1], item)
+    if op == 'BETWEEN':
+        return right <= left <= _operand(values[2], item)
+    if op == 'begins_with':
+        return isinstance(left, str) and left.startswith(right)
+    if op == 'contains':
+        return right in left
+    try:
+        return {
+            '=': lambda: left == right,
+            '<>': lambda: left != right,
+            '<': lambda: left < right,
+            '<=': lambda: left <= right,
+            '>': lambda: left > right,
+            '>=': lambda: left >= right,
+        }[op]()
+    except KeyError:
+        raise NotImplementedError(f"Condition operator {op!r} is not supported locally")
+    except TypeError:
+        return False
+
+
+# Only the string forms the app uses: attribute_exists(x) / attribute_not_exists(x)
+def _evaluate_string(expression, item):
+    expression = expression.strip()
+    for fn, expected in (('attribute_not_exists', False), ('attribute_exists', True)):
+        if expression.startswith(fn + '(') and expression.endswith(')'):
+            return (expression[len(fn) + 1:-1].strip() in item) == expected
+    raise NotImplementedError(f"ConditionExpression {expression!r} is not supported locally")
+
+
+def _update_clauses(expression):
+    # "SET a = :x, b = :y ADD c :z" -> [('SET', ['a = :x', 'b = :y']), ('ADD', ['c :z'])]
+    parts, depth = [], 0
+    for token in re.findall(r'[(),]|[^\s(),]+', expression):
+        if depth == 0 and token.upper() in ('SET', 'ADD', 'REMOVE', 'DELETE'):
+            parts.append((token.upper(), [[]]))
+            continue
+        if token == ',' and depth == 0:
+            parts[-1][1].append([])
+            continue
+        depth += {'(': 1, ')': -1}.get(token, 0)
+        parts[-1][1][-1].append(token)
+    clauses = []
+    for action, tokens in parts:
+        text = [' '.join(t).replace(' (', '(').replace('( ', '(').replace(' )', ')').replace(' ,', ',') for t in tokens if t]
+        clauses.append((action, text))
+    return clauses
+
+
+def _key_values(condition):
+    # KeyConditionExpression: hash = value [AND range condition]
+    if condition.expression_operator == 'AND':
+        return _key_values(condition._values[0])
+    return condition._values[0].name, _to_dynamo(condition._values[1])
+
+
+# ---------- Tables ----------
+class LocalTable:
+    def __init__(self, service, name, hash_key, indexes):
+        self.service = service
+        self.name = name
+        self.hash_key = hash_key
+        self.indexes = indexes
+        self.items = {}
+
+    def _key(self, key):
+        return key[self.hash_key]
+
+    def get_item(self, Key, ProjectionExpression=None, ExpressionAttributeNames=None, **kwargs):
+        self.service.call()
+        with self.service.lock:
+            item = self.items.get(self._key(Key))
+            return {'Item': _project(item, ProjectionExpression, ExpressionAttributeNames)} if item else {}
+
+    def put_item(self, Item, ConditionExpression=None, **kwargs):
+        self.service.call()
+        with self.service.lock:
+            key = self._key(Item)
+            if ConditionExpression is not None and not evaluate(ConditionExpression, self.items.get(key, {})):
+                raise _error('ConditionalCheckFailedException', 'The conditional request failed', 'PutItem')
+            self.items[key] = _to_dynamo(copy.deepcopy(Item))
+        return {}
+
+    # Supports the UpdateExpression forms the app uses:
+    #   ADD counter :n                       (creates the attribute at 0 first)
+    #   SET a = :v, b = if_not_exists(b, :v)
+    # with #name placeholders from ExpressionAttributeNames.
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues=None, ExpressionAttributeNames=None,
+                    ConditionExpression=None, ReturnValues='NONE', **kwargs):
+        self.service.call()
+        values = _to_dynamo(ExpressionAttributeValues or {})
+        names = ExpressionAttributeNames or {}
+        with self.service.lock:
+            key = self._key(Key)
+            item = self.items.get(key)
+            if ConditionExpression is not None and not evaluate(ConditionExpression, item or {}):
+                raise _error('ConditionalCheckFailedException', 'The conditional request failed', 'UpdateItem')
+            item = copy.deepcopy(item) if item else _to_dynamo(copy.deepcopy(Key))
+            for action, clauses in _update_clauses(UpdateExpression):
+                for clause in clauses:
+                    if action == 'ADD':
+                        name, placeholder = clause.split()
+                        name = names.get(name, name)
+                        item[name] = item.get(name, Decimal(0)) + values[placeholder]
+                    elif action == 'SET':
+                        name, expr = (part.strip() for part in clause.split('=', 1))
+                        name = names.get(name, name)
+                        if expr.startswith('if_not_exists('):
+                            attr, placeholder = (p.strip() for p in expr[len('if_not_exists('):-1].split(','))
+                            item[name] = item[attr] if attr in item else values[placeholder]
+                        else:
+                            item[name] = values[expr]
+                    else:
+                        raise NotImplementedError(f"UpdateExpression action {action!r} is not supported locally")
+            self.items[key] = item
+            return {'Attributes': copy.deepcopy(item)} if ReturnValues == 'ALL_NEW' else {}
+
+    def delete_item(self, Key, ConditionExpression=None, **kwargs):
+        self.service.call()
+        with self.service.lock:
+            key = self._key(Key)
+            if ConditionExpression is not None and not evaluate(ConditionExpression, self.items.get(key, {})):
+                raise _error('ConditionalCheckFailedException', 'The conditional request failed', 'DeleteItem')
+            self.items.pop(key, None)
+        return {}
+
+    # `items` must already be sorted by `order`. Paging resumes after the
+    # position of ExclusiveStartKey, so it works even if that item was deleted
+    # in the meantime, as in DynamoDB.
+    def _page(self, items, order, descending, key_fields, Limit, ExclusiveStartKey,
+              ProjectionExpression, names, FilterExpression):
+        start = 0
+        if ExclusiveStartKey:
+            resume = order(ExclusiveStartKey)
+            start = next((i for i, it in enumerate(items)
+                          if (order(it) < resume if descending else order(it) > resume)), len(items))
+
+        page, size, scanned = [], 0, 0
+        for item in items[start:]:
+            if Limit and scanned >= Limit or size >= PAGE_BYTES:
+                break
+            scanned += 1
+            size += _item_size(item)
+            if FilterExpression is None or evaluate(FilterExpression, item):
+                page.append(_project(item, ProjectionExpression, names))
+
+        response = {'Items': page, 'Count': len(page), 'ScannedCount': scanned}
+        if start + scanned < len(items):
+            last = items[start + scanned - 1]
+            response['LastEvaluatedKey'] = {f: last[f] for f in key_fields if f in last}
+        return response
+
+    def query(self, KeyConditionExpression, IndexName=None, ScanIndexForward=True, Limit=None,
+              ExclusiveStartKey=None, ProjectionExpression=None, ExpressionAttributeNames=None,
+              FilterExpression=None, Select=None, **kwargs):
+        self.service.call()
+        if IndexName:
+            if IndexName not in self.indexes:
+                raise _error('ValidationException', f'The table does not have the specified index: {IndexName}', 'Query')
+            index = self.indexes[IndexName]
+        else:
+            index = {'hash': self.hash_key, 'range': None}
+        hash_name, hash_value = _key_values(KeyConditionExpression)
+        if hash_name != index['hash']:
+            raise _error('ValidationException', 'Query condition missed key schema element', 'Query')
+
+        # Like a real GSI, items without the index's key attributes are not in it
+        index_keys = [index['hash']] + ([index['range']] if index['range'] else [])
+        with self.service.lock:
+            items = [it for it in self.items.values()
+                     if all(k in it for k in index_keys) and evaluate(KeyConditionExpression, it)]
+        sort_key = index['range'] or self.hash_key
+        order = lambda it: (it.get(sort_key, ''), it[self.hash_key])
+        items.sort(key=order, reverse=not ScanIndexForward)
+        key_fields = [self.hash_key] + index_keys
+        response = self._page(items, order, not ScanIndexForward, key_fields, Limit, ExclusiveStartKey,
+                              ProjectionExpression, ExpressionAttributeNames, FilterExpression)
+        if Select == 'COUNT':
+            response.pop('Items')
+        return response
+
+    def scan(self, FilterExpression=None, Limit=None, ExclusiveStartKey=None, ProjectionExpression=None,
+             ExpressionAttributeNames=None, **kwargs):
+        self.service.call()
+        with self.service.lock:
+            items = sorted(self.items.values(), key=lambda it: it[self.hash_key])
+        return self._page(items, lambda it: it[self.hash_key], False, [self.hash_key], Limit, ExclusiveStartKey,
+                          ProjectionExpression, ExpressionAttributeNames, FilterExpression)
+
+    def batch_writer(self, overwrite_by_pkeys=None):
+        return LocalBatchWriter(self)
+
+
+# Buffers puts/deletes into 25-item batch_write_item calls and resends
+# whatever comes back unprocessed, like boto3's BatchWriter.
+class LocalBatchWriter:
+    def __init__(self, table):
+        self.table = table
+        self.pending = []
+
+    def put_item(self, Item):
+        self.pending.append({'PutRequest': {'Item': Item}})
+        self._flush_if_full()
+
+    def delete_item(self, Key):
+        self.pending.append({'DeleteRequest': {'Key': Key}})
+        self._flush_if_full()
+
+    def _flush_if_full(self):
+        if len(self.pending) >= 25:
+            self._flush()
+
+    def _flush(self):
+        batch, self.pending = self.pending[:25], self.pending[25:]
+        resp = self.table.service.batch_write_item(RequestItems={self.table.name: batch})
+        self.pending.extend(resp.get('UnprocessedItems', {}).get(self.table.name, []))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        while self.pending:
+            self._flush()
+
+
+class LocalDynamoDB:
+    def __init__(self, tables=TABLES, latency=0.0, throttle=0.0):
+        self.latency = latency
+        self.throttle = throttle
+        self.lock = threading.RLock()
+        self.calls = 0
+        self.tables = {
+            name: LocalTable(self, name, spec['hash'], spec['indexes']) for name, spec in tables.items()
+        }
+
+    def call(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def Table(self, name):
+        try:
+            return self.tables[name]
+        except KeyError:
+            raise _error('ResourceNotFoundException', f'Requested resource not found: Table: {name} not found', 'DescribeTable')
+
+    def _throttled(self):
+        return self.throttle and random.random() < self.throttle
+
+    def batch_get_item(self, RequestItems):
+        self.call()
+        if sum(len(r['Keys']) for r in RequestItems.values()) > 100:
+            raise _error('ValidationException', 'Too many items requested for the BatchGetItem call', 'BatchGetItem')
+        responses, unprocessed = {}, {}
+        with self.lock:
+            for name, request in RequestItems.items():
+                table = self.Table(name)
+                for key in request['Keys']:
+                    if self._throttled():
+                        unprocessed.setdefault(name, dict(request, Keys=[]))['Keys'].append(key)
+                        continue
+                    item = table.items.get(table._key(key))
+                    if item:
+                        responses.setdefault(name, []).append(
+                            _project(item, request.get('ProjectionExpression'), request.get('ExpressionAttributeNames')))
+        return {'Responses': responses, 'UnprocessedKeys': unprocessed}
+
+    def batch_write_item(self, RequestItems):
+        self.call()
+        if sum(len(r) for r in RequestItems.values()) > 25:
+            raise _error('ValidationException', 'Too many items requested for the BatchWriteItem call', 'BatchWriteItem')
+        unprocessed = {}
+        with self.lock:
+            for name, requests in RequestItems.items():
+                table = self.Table(name)
+                for request in requests:
+                    if self._throttled():
+                        unprocessed.setdefault(name, []).append(request)
+                    elif 'PutRequest' in request:
+                        item = request['PutRequest']['Item']
+                        table.items[table._key(item)] = _to_dynamo(copy.deepcopy(item))
+                    else:
+                        table.items.pop(table._key(request['DeleteRequest']['Key']), None)
+        return {'UnprocessedItems': unprocessed}
+
+
+# ---------- SNS ----------
+# Keeps published messages in memory (and appends them to `path` as JSON
+# lines when given) instead of sending them.
+class LocalSNS:
+    def __init__(self, path=None, latency=0.0):
+        self.path = path
+        self.latency = latency
+        self.messages = []
+        self.lock = threading.Lock()
+
+    def _record(self, topic_arn, entry):
+        message = dict(entry, TopicArn=topic_arn, MessageId=str(uuid.uuid4()))
+        with self.lock:
+            self.messages.append(message)
+            if self.path:
+                with open(self.path, 'a') as f:
+                    f.write(json.dumps(message) + '\n')
+        return message['MessageId']
+
+    def publish(self, TopicArn, Message, Subject=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        return {'MessageId': self._record(TopicArn, {'Message': Message, 'Subject': Subject})}
+
+    def publish_batch(self, TopicArn, PublishBatchRequestEntries):
+        if self.latency:
+            time.sleep(self.latency)
+        if len(PublishBatchRequestEntries) > 10:
+            raise _error('TooManyEntriesInBatchRequest', 'The batch request contains more entries than permissible', 'PublishBatch')
+        successful = [{'Id': entry['Id'], 'MessageId': self._record(TopicArn, entry)}
+                      for entry in PublishBatchRequestEntries]
+        return {'Successful': successful, 'Failed': []}
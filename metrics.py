@@ -0,0 +1,389 @@
+import contextlib, contextvars, inspect, threading, time
+from bisect import bisect_left
+from flask import request, session, current_app, template_rendered, before_render_template
+
+# ---------- Metrics ----------
+# Per-process instrumentation of the hot path, served in Prometheus' text
+# format on /metrics:
+#
+#   movie_magic_request_seconds            latency per endpoint and method
+#   movie_magic_requests_total             requests per endpoint, method, status
+#   movie_magic_request_section_seconds    per request, time spent in storage,
+#                                          template, pdf and hash work
+#   movie_magic_request_storage_calls      storage calls per request
+#   movie_magic_storage_call_seconds       backend calls per method
+#   movie_magic_template_render_seconds    per template
+#   movie_magic_cache_*                    hits, misses and entries of the
+#                                          fragment, store and ticket caches
+#   movie_magic_password_*, movie_magic_aws_*, movie_magic_seat_event*,
+#   movie_magic_waiting_room_*             from the hasher, AWS clients, seat
+#                                          event streams and waiting room
+#
+# A request's sections are collected through a context variable, so storage
+# calls made on the async I/O threads count for the request that made them.
+# timed('pdf') and friends mark a section anywhere below a view; outside a
+# request they do nothing.
+#
+# /metrics is for staff (STAFF_EMAILS) and for a scraper sending
+# METRICS_TOKEN as "Authorization: Bearer <token>"; anyone else gets a 401.
+# METRICS_SERVER_TIMING adds a Server-Timing header with the sections, so a
+# browser's network panel shows where a slow request went.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        return [(self.name, dict(zip(self.labels, key)), value) for key, value in values]
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels -> [count per bucket (+Inf last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][i] += 1
+            entry[1] += value
+
+    def samples(self):
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        samples = []
+        for key, counts, total in values:
+            labels = dict(zip(self.labels, key))
+            running = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                running += count
+                samples.append((f'{self.name}_bucket', dict(labels, le=bound), running))
+            samples.append((f'{self.name}_sum', labels, total))
+            samples.append((f'{self.name}_count', labels, running))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    # fn() returns [(name, kind, help, [(labels, value), ...]), ...], read at
+    # scrape time from the stats() the other components already keep
+    def collector(self, fn):
+        self._collectors.append(fn)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(f'{name}{_labels(labels)} {value}' for name, labels, value in metric.samples())
+        for fn in self._collectors:
+            try:
+                families = fn()
+            except Exception as e:
+                print(f"Metrics collector {getattr(fn, '__name__', fn)} failed: {e}")
+                continue
+            for name, kind, help, samples in families:
+                lines.append(f'# HELP {name} {help}')
+                lines.append(f'# TYPE {name} {kind}')
+                lines.extend(f'{name}{_labels(labels)} {value}' for labels, value in samples if value is not None)
+        return '\n'.join(lines) + '\n'
+
+
+# ---------- Per-Request Sections ----------
+class RequestTimings:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.sections = {}  # name -> [seconds, count]
+        self.finished = False
+        self.token = None
+        self._lock = threading.Lock()
+
+    def add(self, section, seconds):
+        with self._lock:
+            entry = self.sections.setdefault(section, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+    def server_timing(self, total):
+        parts = [f'{name};dur={seconds * 1000:.1f};desc="{count}x"'
+                 for name, (seconds, count) in sorted(self.sections.items())]
+        parts.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(parts)
+
+
+_current = contextvars.ContextVar('movie_magic_request_timings', default=None)
+
+
+def record(section, seconds):
+    timings = _current.get()
+    if timings is not None:
+        timings.add(section, seconds)
+
+
+@contextlib.contextmanager
+def timed(section):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(section, time.perf_counter() - start)
+
+
+# ---------- Storage Calls ----------
+# Wraps the storage backend (below CachedStore, so cache hits are not
+# counted) and times every public method. Generators are timed step by step,
+# since their work happens while they are iterated.
+class InstrumentedStore:
+    def __init__(self, inner, registry):
+        self.inner = inner
+        self.calls = registry.histogram('movie_magic_storage_call_seconds', 'Storage backend calls',
+                                        ('backend', 'method'))
+        self.errors = registry.counter('movie_magic_storage_errors_total', 'Storage backend calls that raised',
+                                       ('backend', 'method'))
+
+    def _done(self, name, start, failed):
+        elapsed = time.perf_counter() - start
+        self.calls.observe(elapsed, self.inner.name, name)
+        if failed:
+            self.errors.inc(self.inner.name, name)
+        record('storage', elapsed)
+
+    def _timed_iter(self, name, items):
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                self._done(name, start, False)
+                return
+            except Exception:
+                self._done(name, start, True)
+                raise
+            self._done(name, start, False)
+            yield item
+
+    def __getattr__(self, name):
+        attr = getattr(self.inner, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = attr(*args, **kwargs)
+            except Exception:
+                self._done(name, start, True)
+                raise
+            if inspect.isgenerator(result):
+                return self._timed_iter(name, result)
+            self._done(name, start, False)
+            return result
+        # Cached on the instance, so __getattr__ only runs once per method
+        setattr(self, name, call)
+        return call
+
+
+# ---------- Request Hooks ----------
+class Metrics:
+    def __init__(self):
+        self.registry = Registry()
+        self.latency = self.registry.histogram('movie_magic_request_seconds', 'Request latency',
+                                               ('endpoint', 'method'))
+        self.requests = self.registry.counter('movie_magic_requests_total', 'Requests served',
+                                              ('endpoint', 'method', 'status'))
+        self.sections = self.registry.histogram('movie_magic_request_section_seconds',
+                                                'Time per request spent in storage, template, pdf and hash work',
+                                                ('endpoint', 'section'))
+        self.storage_calls = self.registry.histogram('movie_magic_request_storage_calls', 'Storage calls per request',
+                                                     ('endpoint',), buckets=COUNT_BUCKETS)
+        self.templates = self.registry.histogram('movie_magic_template_render_seconds', 'Template render time',
+                                                 ('template',))
+        self._rendering = threading.local()
+
+    def instrument_store(self, store):
+        return InstrumentedStore(store, self.registry)
+
+    def _before_render(self, sender, template, context, **extra):
+        stack = getattr(self._rendering, 'stack', None)
+        if stack is None:
+            stack = self._rendering.stack = []
+        stack.append(time.perf_counter())
+
+    def _rendered(self, sender, template, context, **extra):
+        stack = getattr(self._rendering, 'stack', None)
+        if not stack:
+            return
+        elapsed = time.perf_counter() - stack.pop()
+        self.templates.observe(elapsed, template.name or '<string>')
+        if not stack:
+            # Only the outermost render counts, so an included render is not added twice
+            record('template', elapsed)
+
+    def _finish(self, timings, status):
+        timings.finished = True
+        elapsed = time.perf_counter() - timings.start
+        endpoint = request.endpoint or 'unmatched'
+        self.latency.observe(elapsed, endpoint, request.method)
+        self.requests.inc(endpoint, request.method, str(status))
+        for section, (seconds, count) in list(timings.sections.items()):
+            self.sections.observe(seconds, endpoint, section)
+        self.storage_calls.observe(timings.sections.get('storage', (0, 0))[1], endpoint)
+        return elapsed
+
+    def init_app(self, app):
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._rendered, app)
+
+        @app.before_request
+        def start_timings():
+            timings = RequestTimings()
+            timings.token = _current.set(timings)
+
+        @app.after_request
+        def finish_timings(response):
+            timings = _current.get()
+            if timings is not None and not timings.finished:
+                elapsed = self._finish(timings, response.status_code)
+                if app.config['METRICS_SERVER_TIMING']:
+                    response.headers['Server-Timing'] = timings.server_timing(elapsed)
+            return response
+
+        # after_request is skipped when a view raises; count those as 500s
+        @app.teardown_request
+        def reset_timings(exc):
+            timings = _current.get()
+            if timings is None:
+                return
+            if not timings.finished:
+                self._finish(timings, 500)
+            _current.reset(timings.token)
+
+        self.registry.collector(lambda: cache_families(app))
+        self.registry.collector(lambda: component_families(app))
+        app.add_url_rule('/metrics', view_func=metrics_view)
+
+
+def cache_families(app):
+    caches = {'fragments': app.extensions.get('fragments'), 'tickets': app.extensions.get('tickets'),
+              'store': app.extensions.get('store')}
+    hits, misses, entries, ratio = [], [], [], []
+    for name, cache in caches.items():
+        if cache is None or not hasattr(cache, 'hits'):
+            continue
+        labels = {'cache': name}
+        hits.append((labels, cache.hits))
+        misses.append((labels, cache.misses))
+        entries.append((labels, cache.stats()['entries'] if hasattr(cache, 'stats') else len(cache)))
+        total = cache.hits + cache.misses
+        ratio.append((labels, round(cache.hits / total, 4) if total else None))
+    return [('movie_magic_cache_hits_total', 'counter', 'Cache hits', hits),
+            ('movie_magic_cache_misses_total', 'counter', 'Cache misses', misses),
+            ('movie_magic_cache_entries', 'gauge', 'Entries held', entries),
+            ('movie_magic_cache_hit_ratio', 'gauge', 'Hits over lookups since start', ratio)]
+
+
+def component_families(app):
+    families = []
+    hasher = app.extensions.get('passwords')
+    if hasher:
+        stats = hasher.stats()
+        families += [
+            ('movie_magic_password_checks_total', 'counter', 'Password hashes and verifications',
+             [({'op': 'hash'}, stats['hashed']), ({'op': 'verify'}, stats['verified'])]),
+            ('movie_magic_password_rejected_total', 'counter', 'Checks turned away with HasherBusy',
+             [({}, stats['rejected'])]),
+            ('movie_magic_password_pending', 'gauge', 'Hashes queued or running', [({}, stats['pending'])]),
+        ]
+    aws = app.extensions.get('aws')
+    if aws and not aws.local:
+        services = aws.stats()['services']
+        families += [
+            ('movie_magic_aws_calls_total', 'counter', 'AWS API calls',
+             [({'service': s}, v['calls']) for s, v in services.items()]),
+            ('movie_magic_aws_retries_total', 'counter', 'AWS API retries',
+             [({'service': s}, v['retries']) for s, v in services.items()]),
+            ('movie_magic_aws_errors_total', 'counter', 'AWS API calls that failed',
+             [({'service': s}, v['errors']) for s, v in services.items()]),
+        ]
+    seat_events = app.extensions.get('seat_events')
+    if seat_events:
+        stats = seat_events.stats()
+        families += [
+            ('movie_magic_seat_events_published_total', 'counter', 'Seat changes published', [({}, stats['published'])]),
+            ('movie_magic_seat_event_waiting', 'gauge', 'Seat event polls waiting for a change', [({}, stats['waiting'])]),
+            ('movie_magic_seat_event_polls_total', 'counter', 'Seat event polls served',
+             [({}, stats['polls'])]),
+        ]
+    room = app.extensions.get('waiting_room')
+    if room:
+        lines = room.stats()
+        families += [
+            ('movie_magic_waiting_room_waiting', 'gauge', 'People in line per title',
+             [({'title': t}, v['waiting']) for t, v in lines.items()]),
+            ('movie_magic_waiting_room_admitted_total', 'counter', 'Users let through per title',
+             [({'title': t}, v['admitted']) for t, v in lines.items()]),
+            ('movie_magic_waiting_room_shed_total', 'counter', 'Users turned away with a full line per title',
+             [({'title': t}, v['shed']) for t, v in lines.items()]),
+        ]
+    profiler = app.extensions.get('profiler')
+    if profiler:
+        families.append(('movie_magic_profiles_written_total', 'counter', 'Slow request profiles written',
+                         [({}, profiler.written)]))
+    return families
+
+
+def metrics_view():
+    token = current_app.config['METRICS_TOKEN']
+    if not (token and request.headers.get('Authorization') == f'Bearer {token}'
+            or session.get('email') in current_app.config['STAFF_EMAILS']):
+        return "Unauthorized", 401
+    body = current_app.extensions['metrics'].registry.render()
+    return current_app.response_class(body, mimetype='text/plain; version=0.0.4')
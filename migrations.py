@@ -0,0 +1,99 @@
+# ---------- Schema Migrations ----------
+# Brings an existing movie_magic.db up to the current models. Every step checks
+# the live schema first, so running it on an up-to-date database is a no-op.
+# The SQLite storage backend runs upgrade() on startup; it can also be run by hand:
+#
+#     python migrations.py
+#
+from seat_inventory import parse_seats
+
+
+def columns(conn, table):
+    return {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+
+
+# Booking.movie/theater/time/seats (free text) -> Show + BookedSeat rows.
+# Bookings made before the day was recorded get day 'N/A'. A seat sold twice
+# for the same show stays with the earlier booking; each later booking that
+# listed it gets a row in migration_seat_conflict (booking, show, seat) to be
+# refunded or reseated by hand, and the migration prints how many there are.
+def split_booking_seats(conn):
+    if 'seats' not in columns(conn, 'booking'):
+        return
+
+    if 'show_id' not in columns(conn, 'booking'):
+        conn.exec_driver_sql("ALTER TABLE booking ADD COLUMN show_id INTEGER REFERENCES show (id)")
+
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS migration_seat_conflict "
+        "(booking_id INTEGER NOT NULL, show_id INTEGER NOT NULL, seat_label VARCHAR(5) NOT NULL)")
+
+    shows = {}
+    conflicts = 0
+    rows = conn.exec_driver_sql("SELECT id, movie, theater, time, seats FROM booking ORDER BY id").fetchall()
+    for booking_pk, movie, theater, show_time, seats in rows:
+        slot = (movie, theater, 'N/A', show_time)
+        if slot not in shows:
+            conn.exec_driver_sql(
+                "INSERT OR IGNORE INTO show (movie, theater, day, time) VALUES (?, ?, ?, ?)", slot)
+            shows[slot] = conn.exec_driver_sql(
+                "SELECT id FROM show WHERE movie = ? AND theater = ? AND day = ? AND time = ?", slot).scalar()
+        show_id = shows[slot]
+
+        conn.exec_driver_sql("UPDATE booking SET show_id = ? WHERE id = ?", (show_id, booking_pk))
+        for seat in parse_seats(seats):
+            inserted = conn.exec_driver_sql(
+                "INSERT OR IGNORE INTO booked_seat (show_id, booking_id, seat_label) VALUES (?, ?, ?)",
+                (show_id, booking_pk, seat)).rowcount
+            if not inserted:
+                conn.exec_driver_sql(
+                    "INSERT INTO migration_seat_conflict (booking_id, show_id, seat_label) VALUES (?, ?, ?)",
+                    (booking_pk, show_id, seat))
+                conflicts += 1
+    if conflicts:
+        print(f"Migration: {conflicts} seat(s) sold twice were kept by the earlier booking; "
+              f"the later bookings are listed in migration_seat_conflict")
+
+    for column in ('movie', 'theater', 'time', 'seats'):
+        conn.exec_driver_sql(f"ALTER TABLE booking DROP COLUMN {column}")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_booking_show_id ON booking (show_id)")
+
+
+# User.booking_count + the (user_id, created_at) index behind dashboard pages
+def add_booking_counter(conn):
+    if 'booking_count' not in columns(conn, '"user"'):
+        conn.exec_driver_sql('ALTER TABLE "user" ADD COLUMN booking_count INTEGER NOT NULL DEFAULT 0')
+        conn.exec_driver_sql(
+            'UPDATE "user" SET booking_count = (SELECT COUNT(*) FROM booking WHERE booking.user_id = "user".id)')
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_booking_user_created ON booking (user_id, created_at)")
+
+
+# ShowSales rollups. create_all() makes the table empty on an existing
+# database, so an empty table next to existing bookings is filled from them.
+def add_show_sales(conn):
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS show_sales (show_id INTEGER NOT NULL PRIMARY KEY REFERENCES show (id), "
+        "bookings INTEGER NOT NULL, tickets INTEGER NOT NULL, revenue INTEGER NOT NULL)")
+    if conn.exec_driver_sql("SELECT 1 FROM show_sales LIMIT 1").first():
+        return
+    conn.exec_driver_sql(
+        "INSERT INTO show_sales (show_id, bookings, tickets, revenue) "
+        "SELECT show_id, COUNT(*), SUM((SELECT COUNT(*) FROM booked_seat WHERE booked_seat.booking_id = booking.id)), "
+        "SUM(price) FROM booking WHERE show_id IS NOT NULL GROUP BY show_id")
+
+
+STEPS = [split_booking_seats, add_booking_counter, add_show_sales]
+
+
+def upgrade(engine):
+    with engine.begin() as conn:
+        for step in STEPS:
+            step(conn)
+
+
+if __name__ == '__main__':
+    from app import app
+    from models import db
+    with app.app_context():
+        upgrade(db.engine)
+    print("Database is up to date.")
@@ -0,0 +1,71 @@
+from flask_sqlalchemy import SQLAlchemy
+from datetime import datetime
+
+db = SQLAlchemy()
+
+class User(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    email = db.Column(db.String(100), unique=True, nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    password = db.Column(db.String(200), nullable=False)
+    # Kept up to date on every booking insert/delete so the dashboard total
+    # does not have to count rows
+    booking_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    bookings = db.relationship('Booking', backref='user', lazy=True)
+
+# One row per screening. The unique (movie, theater, day, time) index is also
+# the lookup path for "which seats are sold for this show".
+class Show(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    movie = db.Column(db.String(100), nullable=False)
+    theater = db.Column(db.String(100), nullable=False)
+    day = db.Column(db.String(20), nullable=False)
+    time = db.Column(db.String(20), nullable=False)
+    __table_args__ = (db.UniqueConstraint('movie', 'theater', 'day', 'time', name='uq_show_slot'),)
+
+class Booking(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    booking_id = db.Column(db.String(100), unique=True, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    show_id = db.Column(db.Integer, db.ForeignKey('show.id'), index=True)
+    price = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    show = db.relationship('Show', lazy='joined')
+    booked_seats = db.relationship('BookedSeat', backref='booking', lazy='selectin', order_by='BookedSeat.id')
+    # Serves "a user's bookings, newest first" page by page
+    __table_args__ = (db.Index('ix_booking_user_created', 'user_id', 'created_at'),)
+
+    # Templates and the PDF ticket read these as plain attributes.
+    @property
+    def movie(self):
+        return self.show.movie
+
+    @property
+    def theater(self):
+        return self.show.theater
+
+    @property
+    def time(self):
+        return self.show.time
+
+    @property
+    def seats(self):
+        return ','.join(s.seat_label for s in self.booked_seats)
+
+# A seat can be sold once per show: the unique (show_id, seat_label) index makes
+# the database reject a double sale even if two processes race.
+class BookedSeat(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    show_id = db.Column(db.Integer, db.ForeignKey('show.id'), nullable=False)
+    booking_id = db.Column(db.Integer, db.ForeignKey('booking.id'), nullable=False, index=True)
+    seat_label = db.Column(db.String(5), nullable=False)
+    __table_args__ = (db.UniqueConstraint('show_id', 'seat_label', name='uq_booked_seat'),)
+
+# Running totals per show, updated in the same transaction as the bookings
+# they count, so sales reports never read the booking tables (analytics.py)
+class ShowSales(db.Model):
+    show_id = db.Column(db.Integer, db.ForeignKey('show.id'), primary_key=True)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+    tickets = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Integer, nullable=False, default=0)
+    show = db.relationship('Show', lazy='joined')
@@ -0,0 +1,203 @@
+import json, os, queue, random, threading, time, uuid
+from collections import deque
+from botocore.exceptions import BotoCoreError, ClientError
+
+# ---------- Outbound Notifications ----------
+# Routes never talk to SNS themselves. Notifier.notify() puts the message on
+# an in-process queue and returns at once; a small pool of worker threads
+# drains the queue in batches of up to 10 (the PublishBatch limit), retries
+# entries that failed with exponential backoff, and gives up after
+# max_attempts. When the queue is full, new messages are dropped and counted
+# rather than blocking checkout.
+#
+# A sink does the actual sending. send_batch(entries) returns the Ids of the
+# entries that failed and should be retried.
+
+class SNSSink:
+    name = 'sns'
+
+    def __init__(self, clients, topic_arn):
+        self.clients = clients
+        self.topic_arn = topic_arn
+
+    def send_batch(self, entries):
+        try:
+            response = self.clients.client('sns').publish_batch(TopicArn=self.topic_arn, PublishBatchRequestEntries=entries)
+        except (BotoCoreError, ClientError) as e:
+            print(f"SNS publish_batch failed: {e}")
+            return [entry['Id'] for entry in entries]
+        failed = response.get('Failed', [])
+        for f in failed:
+            print(f"SNS rejected notification {f['Id']}: {f.get('Code')} {f.get('Message', '')}")
+        # SenderFault entries are malformed and would fail again
+        return [f['Id'] for f in failed if not f.get('SenderFault')]
+
+
+# Appends every message to a JSON lines file, for offline runs
+class FileSink:
+    name = 'file'
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send_batch(self, entries):
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(dict(entry, sent_at=time.time())) + '\n')
+        return []
+
+
+# Keeps the most recent messages in memory, for tests and local runs
+class MemorySink:
+    name = 'memory'
+
+    def __init__(self, keep=1000):
+        self.messages = deque(maxlen=keep)
+
+    def send_batch(self, entries):
+        self.messages.extend(entries)
+        return []
+
+
+class Notifier:
+    def __init__(self, sink, workers=2, batch_size=10, max_queue=10000, max_attempts=5, backoff=0.5, linger=0.05):
+        self.sink = sink
+        self.workers = workers
+        self.batch_size = min(batch_size, 10)
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.linger = linger
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._threads = []
+        self._lock = threading.Lock()
+        self.counters = {'queued': 0, 'sent': 0, 'failed': 0, 'dropped': 0, 'retries': 0, 'batches': 0}
+        # Seconds per send_batch call, and from notify() until sent
+        self.send_latency = deque(maxlen=1000)
+        self.delivery_latency = deque(maxlen=1000)
+
+    def start(self):
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'movie-magic-notify-{n}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def notify(self, subject, message, attributes=None):
+        entry = {'Id': uuid.uuid4().hex, 'Subject': subject[:100], 'Message': message}
+        if attributes:
+            entry['MessageAttributes'] = {k: {'DataType': 'String', 'StringValue': str(v)} for k, v in attributes.items()}
+        try:
+            self._queue.put_nowait((time.time(), entry))
+        except queue.Full:
+            self._count('dropped')
+            print(f"Notification queue full, dropped: {subject}")
+            return False
+        self._count('queued')
+        return True
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    # Blocks for the first message, then takes whatever else arrives within
+    # `linger` seconds, up to batch_size
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.time() + self.linger
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get(timeout=max(0.0, deadline - time.time())))
+            except queue.Empty:
+                break
+        return batch
+
+    def _work(self):
+        while True:
+            batch = self._next_batch()
+            pending = {entry['Id']: (queued_at, entry) for queued_at, entry in batch}
+            try:
+                self._send(pending)
+            except Exception as e:
+                # Only what was not delivered before the error
+                self._count('failed', len(pending))
+                print(f"Notification worker error: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    # pending maps entry Id -> (queued_at, entry). Entries are removed from it
+    # as they are sent, so if this raises, what is left was not delivered.
+    def _send(self, pending):
+        for attempt in range(self.max_attempts):
+            if attempt:
+                self._count('retries', len(pending))
+                # Exponential backoff with full jitter
+                time.sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+            start = time.time()
+            failed = set(self.sink.send_batch([entry for queued_at, entry in pending.values()]))
+            now = time.time()
+            self._count('batches')
+            with self._lock:
+                self.send_latency.append(now - start)
+                for entry_id in [entry_id for entry_id in pending if entry_id not in failed]:
+                    queued_at, entry = pending.pop(entry_id)
+                    self.counters['sent'] += 1
+                    self.delivery_latency.append(now - queued_at)
+            if not pending:
+                return
+        self._count('failed', len(pending))
+        print(f"Giving up on {len(pending)} notification(s) after {self.max_attempts} attempts")
+        pending.clear()
+
+    # Waits until everything queued so far has been sent or given up on
+    def flush(self, timeout=5.0):
+        deadline = time.time() + timeout
+        while self._queue.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.01)
+        return not self._queue.unfinished_tasks
+
+    def stats(self):
+        with self._lock:
+            send, delivery = sorted(self.send_latency), sorted(self.delivery_latency)
+            counters = dict(self.counters)
+
+        def pct(values, p):
+            return round(values[min(len(values) - 1, int(p / 100 * len(values)))] * 1000, 2) if values else None
+
+        return dict(counters, sink=self.sink.name, queue_depth=self._queue.qsize(),
+                    send_ms_p50=pct(send, 50), send_ms_p95=pct(send, 95),
+                    delivery_ms_p50=pct(delivery, 50), delivery_ms_p95=pct(delivery, 95))
+
+
+def booking_confirmation(notifier, booking):
+    message = (f"Your Movie Magic booking is confirmed.\n\n"
+               f"Booking ID: {booking['booking_id']}\n"
+               f"Movie: {booking['movie']}\n"
+               f"Theater: {booking['theater']}\n"
+               f"Show: {booking.get('day', 'N/A')} {booking['time']}\n"
+               f"Seats: {booking['seats']}\n"
+               f"Total Price: ₹{booking['price']}\n")
+    return notifier.notify(f"Booking confirmed: {booking['movie']}", message,
+                           {'email': booking['user_email'], 'booking_id': booking['booking_id']})
+
+
+# NOTIFY_SINK picks the sink: 'sns', 'file', 'memory' or 'off'. Left unset it
+# is 'sns' when SNS_TOPIC_ARN is configured and 'memory' otherwise.
+def make_notifier(app):
+    kind = app.config['NOTIFY_SINK'] or ('sns' if app.config.get('SNS_TOPIC_ARN') else 'memory')
+    if kind == 'off':
+        return None
+    if kind == 'sns':
+        sink = SNSSink(app.extensions['aws'], app.config['SNS_TOPIC_ARN'])
+    elif kind == 'file':
+        path = app.config['NOTIFY_FILE'] or os.path.join(app.instance_path, 'notifications.jsonl')
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        sink = FileSink(path)
+    elif kind == 'memory':
+        sink = MemorySink()
+    else:
+        raise ValueError(f"Unknown NOTIFY_SINK {kind!r}")
+    notifier = Notifier(sink, workers=app.config['NOTIFY_WORKERS'], max_queue=app.config['NOTIFY_MAX_QUEUE'],
+                        max_attempts=app.config['NOTIFY_MAX_ATTEMPTS'])
+    notifier.start()
+    return notifier
@@ -0,0 +1,112 @@
+import multiprocessing, threading, time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import check_password_hash, generate_password_hash
+import metrics
+
+# ---------- Password Hashing ----------
+# Hashing a password is meant to be slow, so register and login hand it to a
+# small process pool instead of doing it on the request thread. At most
+# `max_pending` hashes may be queued or running; a request that cannot get a
+# slot within `wait` seconds gets HasherBusy and is told to try again, rather
+# than every request thread piling up behind a login storm.
+#
+# `method` is any Werkzeug method string ('scrypt', 'scrypt:16384:8:1',
+# 'pbkdf2:sha256:600000', ...). A stored hash made with other parameters
+# still verifies; login then re-hashes the password with the current ones
+# (needs_rehash()). workers=0 hashes on the request thread.
+#
+# stats() reports counts, average queue wait and average hash time.
+
+class HasherBusy(Exception):
+    pass
+
+
+# Runs in the worker process
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+class PasswordHasher:
+    def __init__(self, method='scrypt', workers=2, max_pending=64, wait=2.0):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self.wait = wait
+        # Hash of an empty password, only to learn the full parameter string
+        # (and to fail at startup on a bad method)
+        self.params = generate_password_hash('', method).split('$', 1)[0]
+        self.hashed = 0
+        self.verified = 0
+        self.rejected = 0
+        self.pending = 0
+        self.queue_seconds = 0.0
+        self.hash_seconds = 0.0
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    # Started on first use, with spawn like the ticket exporter's pool
+    def pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.wait):
+            with self._lock:
+                self.rejected += 1
+            raise HasherBusy("Too many password checks in progress")
+        try:
+            with self._lock:
+                self.pending += 1
+            start = time.perf_counter()
+            if not self.workers:
+                result, took = _timed(fn, *args)
+            else:
+                try:
+                    result, took = self.pool().submit(_timed, fn, *args).result()
+                except BrokenProcessPool:
+                    # A worker died; this hash runs here, the next call starts a fresh pool
+                    print("Password hashing pool broke, hashing on the request thread")
+                    with self._lock:
+                        self._pool = None
+                    result, took = _timed(fn, *args)
+            elapsed = time.perf_counter() - start
+            metrics.record('hash', elapsed)
+            with self._lock:
+                self.queue_seconds += elapsed - took
+                self.hash_seconds += took
+            return result
+        finally:
+            with self._lock:
+                self.pending -= 1
+            self._slots.release()
+
+    def hash(self, password):
+        result = self._run(generate_password_hash, password, self.method)
+        with self._lock:
+            self.hashed += 1
+        return result
+
+    def verify(self, password_hash, password):
+        result = self._run(check_password_hash, password_hash, password)
+        with self._lock:
+            self.verified += 1
+        return result
+
+    def needs_rehash(self, password_hash):
+        return password_hash.split('$', 1)[0] != self.params
+
+    def stats(self):
+        with self._lock:
+            done = self.hashed + self.verified
+            return {'method': self.params, 'workers': self.workers, 'max_pending': self.max_pending,
+                    'pending': self.pending, 'hashed': self.hashed, 'verified': self.verified,
+                    'rejected': self.rejected,
+                    'avg_queue_ms': round(1000 * self.queue_seconds / done, 2) if done else None,
+                    'avg_hash_ms': round(1000 * self.hash_seconds / done, 2) if done else None}
@@ -0,0 +1,195 @@
+import contextlib, contextvars, os, random, sys, threading, time
+from collections import Counter, deque
+from flask import request
+from werkzeug.utils import secure_filename
+
+# ---------- Slow Request Profiles ----------
+# Opt-in (PROFILE_SLOW_REQUESTS = seconds). While a sampled request runs, a
+# background thread reads the stacks of the threads working for it every
+# PROFILE_SAMPLE_INTERVAL seconds; a request that took longer than the
+# threshold has its stacks written to PROFILE_DIR as
+# <time>-<endpoint>-<ms>ms.folded, one "frame;frame;... count" line per stack,
+# which flamegraph.pl and speedscope read as is. Faster requests are dropped.
+#
+# The request thread is sampled from before_request on. Async views run on
+# their own event loop thread and their blocking calls on the I/O pool
+# (aio.py); both attach to the request's profile through a context variable.
+# Served by asgi.py, async views share the server's event loop thread, so
+# their profiles also hold samples of other requests on that loop.
+#
+# PROFILE_SAMPLE_RATE samples only a share of requests, PROFILE_MAX_FILES
+# keeps the newest profiles and deletes older ones. PROFILE_EXCLUDE lists
+# endpoints never sampled, such as event streams that are slow by design.
+
+class Profile:
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.start = time.perf_counter()
+        self.stacks = Counter()
+        self.samples = 0
+        self.token = None
+        self._threads = Counter()  # thread id -> times attached
+        self._lock = threading.Lock()
+
+    def threads(self):
+        with self._lock:
+            return list(self._threads)
+
+    def attach(self, ident):
+        with self._lock:
+            self._threads[ident] += 1
+
+    def detach(self, ident):
+        with self._lock:
+            self._threads[ident] -= 1
+            if not self._threads[ident]:
+                del self._threads[ident]
+
+    @contextlib.contextmanager
+    def attached(self):
+        ident = threading.get_ident()
+        self.attach(ident)
+        try:
+            yield
+        finally:
+            self.detach(ident)
+
+
+_current = contextvars.ContextVar('movie_magic_profile', default=None)
+
+
+# Runs fn with the calling thread sampled for the current request, if any
+def run_attached(fn, *args, **kwargs):
+    profile = _current.get()
+    if profile is None:
+        return fn(*args, **kwargs)
+    with profile.attached():
+        return fn(*args, **kwargs)
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _stack(frame):
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class SamplingProfiler:
+    def __init__(self, directory, slow, interval=0.005, rate=1.0, max_files=100):
+        self.directory = directory
+        self.slow = slow
+        self.interval = interval
+        self.rate = rate
+        self.max_files = max_files
+        self.written = 0
+        self._active = set()
+        self._files = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._sample, name='movie-magic-profiler', daemon=True)
+            self._thread.start()
+
+    def _sample(self):
+        own = threading.get_ident()
+        while True:
+            self._wake.wait()
+            time.sleep(self.interval)
+            with self._lock:
+                profiles = list(self._active)
+                if not profiles:
+                    self._wake.clear()
+                    continue
+            frames = sys._current_frames()
+            for profile in profiles:
+                for ident in profile.threads():
+                    frame = frames.get(ident)
+                    if frame is not None and ident != own:
+                        profile.stacks[_stack(frame)] += 1
+                        profile.samples += 1
+            del frames
+
+    # Starts sampling the calling thread. Returns the request's Profile, or
+    # None when it is not sampled.
+    def start(self, endpoint):
+        if self.rate < 1.0 and random.random() >= self.rate:
+            return None
+        profile = Profile(endpoint)
+        profile.attach(threading.get_ident())
+        with self._lock:
+            self._active.add(profile)
+            self._ensure_thread()
+        self._wake.set()
+        return profile
+
+    # Stops sampling; writes the profile if the request was slow. Returns its path.
+    def stop(self, profile):
+        elapsed = time.perf_counter() - profile.start
+        with self._lock:
+            self._active.discard(profile)
+        if elapsed < self.slow or not profile.samples:
+            return None
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{secure_filename(profile.endpoint) or 'request'}-{int(elapsed * 1000)}ms"
+        path = os.path.join(self.directory, f"{name}.folded")
+        try:
+            with open(path, 'w') as f:
+                for stack, count in profile.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        except OSError as e:
+            print(f"Could not write profile {path}: {e}")
+            return None
+        print(f"Slow request {profile.endpoint} took {elapsed * 1000:.0f} ms, profile in {path}")
+        with self._lock:
+            self.written += 1
+            self._files.append(path)
+            while len(self._files) > self.max_files:
+                old = self._files.popleft()
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+        return path
+
+
+def init_app(app, profiler):
+    exclude = frozenset(app.config['PROFILE_EXCLUDE'])
+
+    @app.before_request
+    def start_profile():
+        if request.endpoint in exclude:
+            return
+        profile = profiler.start(request.endpoint or 'unmatched')
+        if profile is not None:
+            profile.token = _current.set(profile)
+
+    @app.teardown_request
+    def stop_profile(exc):
+        profile = _current.get()
+        if profile is None:
+            return
+        profiler.stop(profile)
+        _current.reset(profile.token)
+
+    # Async views run on an event loop in another thread (Flask.async_to_sync);
+    # that thread is sampled for the request while the view runs
+    async_to_sync = app.async_to_sync
+
+    def attached_async_to_sync(func):
+        async def view(*args, **kwargs):
+            profile = _current.get()
+            if profile is None:
+                return await func(*args, **kwargs)
+            with profile.attached():
+                return await func(*args, **kwargs)
+        return async_to_sync(view)
+    app.async_to_sync = attached_async_to_sync
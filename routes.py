@@ -0,0 +1,616 @@
+from flask import render_template, request, redirect, url_for, session, flash, send_file, current_app, jsonify, stream_with_context, g
+from werkzeug.utils import secure_filename
+from itertools import chain
+import asyncio, io
+from datetime import datetime
+from seat_inventory import NoSeatsTogether, SeatUnavailable, UnknownSeat, parse_seats, show_key
+from holds import HoldExpired
+from storage import StorageError, SeatsTaken
+from tickets import content_hash
+from analytics import GROUPS
+from notifications import booking_confirmation
+from passwords import HasherBusy
+
+# ---------- App State ----------
+# create_app() puts the storage backend, movie catalog, show schedule, seat
+# inventory and hold manager in app.extensions; these helpers fetch them for the current app.
+def store():
+    return current_app.extensions['store']
+
+# Async views await storage and blocking work through this (see aio.py)
+def aio():
+    return current_app.extensions['aio']
+
+def catalog():
+    return current_app.extensions['catalog']
+
+def schedule():
+    return current_app.extensions['schedule'].current()
+
+def inventory():
+    return current_app.extensions['inventory']
+
+def holds():
+    return current_app.extensions['holds']
+
+def jobs():
+    return current_app.extensions['jobs']
+
+def ticket_cache():
+    return current_app.extensions['tickets']
+
+def passwords():
+    return current_app.extensions['passwords']
+
+def fragments():
+    return current_app.extensions['fragments']
+
+def seat_events():
+    return current_app.extensions['seat_events']
+
+def sales_report():
+    return current_app.extensions['analytics']
+
+# The logged-in user, looked up at most once per request
+def current_user():
+    if 'user' not in g:
+        g.user = store().get_user(session['email']) if 'email' in session else None
+    return g.user
+
+def current_show_key(movie):
+    return show_key(movie['title'], session.get('theater', 'N/A'), session.get('day'), session.get('show_time', 'N/A'))
+
+# ---------- Routes ----------
+def index():
+    return render_template('index.html')
+
+def about():
+    return render_template('about.html')
+
+def services():
+    return render_template('services.html')
+
+def register():
+    if request.method == 'POST':
+        name = request.form['name']
+        email = request.form['email']
+        password = request.form['password']
+
+        if store().get_user(email):
+            flash('Email already registered.')
+        else:
+            try:
+                hashed_password = passwords().hash(password)
+                store().put_user({'email': email, 'name': name, 'password_hash': hashed_password})
+                flash('Registration successful! Please log in.')
+                return redirect(url_for('login'))
+            except HasherBusy:
+                flash('We are very busy right now. Please try again in a moment.')
+                return render_template('register.html'), 503
+            except StorageError as e:
+                flash(f'Registration failed: {e}')
+                print(f"Storage error during registration: {e}")
+
+    return render_template('register.html')
+
+def login():
+    if request.method == 'POST':
+        email = request.form['email']
+        password_input = request.form['password']
+
+        user = store().get_user(email)
+
+        try:
+            valid = user and passwords().verify(user.get('password_hash', ''), password_input)
+        except HasherBusy:
+            flash('We are very busy right now. Please try again in a moment.')
+            return render_template('login.html'), 503
+
+        if valid:
+            # Hashed with older cost settings: store a hash with the current ones
+            if passwords().needs_rehash(user.get('password_hash', '')):
+                try:
+                    store().update_password_hash(email, passwords().hash(password_input))
+                except (HasherBusy, StorageError) as e:
+                    print(f"Could not rehash password for {email}: {e}")
+            session['email'] = user['email']
+            return redirect(url_for('home'))
+        else:
+            flash('Invalid credentials.')
+    return render_template('login.html')
+
+def logout():
+    session.clear()
+    flash('Logged out successfully.')
+    return redirect(url_for('index'))
+
+def home():
+    if 'email' not in session:
+        return redirect(url_for('login'))
+    snapshot = catalog().snapshot()
+    movie_grid = fragments().get_or_render(('movie_grid', snapshot.version),
+                                           lambda: render_template('fragments/movie_grid.html', movies=snapshot.movies),
+                                           tags=('catalog',))
+    return render_template('home.html', movie_grid=movie_grid)
+
+def booking(title):
+    if 'email' not in session:
+        return redirect(url_for('login'))
+
+    movie = catalog().get(title)
+    if not movie:
+        flash("Movie not found")
+        return redirect(url_for('home'))
+
+    now = datetime.now()
+    if request.method == 'POST':
+        selected_theater, _, show_time = request.form.get('show_time', '').partition('|')
+        day = request.form.get('date', '')
+        show = schedule().show(show_key(movie['title'], selected_theater.strip(), day, show_time.strip()))
+        if not show or show.start <= now:
+            flash("Please choose one of the listed show times.")
+            return redirect(url_for('booking', title=movie['title'], date=day))
+        session['theater'] = show.theater
+        session['show_time'] = show.time
+        session['day'] = show.day
+        return redirect(url_for('seating', title=movie['title']))
+
+    # ?date=YYYY-MM-DD picks the day; shows that already started are hidden.
+    # A catalog listing no days (days_ahead 0) shows no days and no shows.
+    dates = [(d.isoformat(), d.strftime('%a %d %b')) for d in schedule().listed_dates]
+    day = request.args.get('date') if request.args.get('date') in dict(dates) else (dates[0][0] if dates else None)
+    next_show = schedule().next_show(movie['title'], now, lambda s: inventory().occupancy(s.key).bit_count() < s.screen.capacity)
+    # Which of the day's shows are still listed only changes when one starts,
+    # so the first remaining start time is part of the key
+    shows = schedule().by_theater(movie['title'], day, after=now)
+    first_start = min((s.start for _, theater_shows in shows for s in theater_shows), default=None)
+    showtimes = fragments().get_or_render(('showtimes', schedule().version, movie['title'], day, first_start),
+                                          lambda: render_template('fragments/showtimes.html', showtimes=shows),
+                                          tags=('catalog', 'schedule'))
+    return render_template('booking.html', movie=movie, dates=dates, selected_date=day, next_show=next_show,
+                           showtimes=showtimes)
+
+async def seating(title):
+    if 'email' not in session:
+        return redirect(url_for('login'))
+
+    movie = catalog().get(title)
+    if not movie:
+        flash("Movie not found")
+        return redirect(url_for('home'))
+
+    key = current_show_key(movie)
+    show = schedule().show(key)
+    if not show:
+        flash("Please choose a show time first.")
+        return redirect(url_for('booking', title=movie['title']))
+    layout = show.screen.layout
+
+    if request.method == 'POST':
+        selected_seats = parse_seats(request.form.get('seats'))
+
+        if not selected_seats:
+            flash("Please select at least one seat.")
+            return redirect(url_for('seating', title=title))
+
+        price_per_seat = movie['price']
+        seat_count = len(selected_seats)
+        total_price = price_per_seat * seat_count
+
+        # Seats are only held here; the booking is written when payment confirms
+        try:
+            hold = await aio().run(holds().hold, key, selected_seats, session['email'], total_price)
+        except UnknownSeat as e:
+            flash(f"Invalid seat: {e}")
+            return redirect(url_for('seating', title=title))
+        except SeatUnavailable as e:
+            flash(f"Sorry, these seats were just booked: {e}")
+            return redirect(url_for('seating', title=title))
+
+        return redirect(url_for('payment', booking_id=hold.hold_id))
+
+    # The seat map only depends on the screen's shape; sold seats are overlaid
+    # client-side from the inventory's bitmap
+    seat_map = fragments().get_or_render(('seat_map', layout.rows, layout.seats_per_row),
+                                         lambda: render_template('fragments/seat_map.html', layout=layout))
+    # The event stream picks up from the cursor taken before the bitmap is
+    # read, so no change in between is missed. The first view of a show loads
+    # its sold seats from storage.
+    cursor = seat_events().cursor(key)
+    occupied = await aio().run(inventory().occupancy, key)
+    events_url = url_for('seat_updates', title=movie['title'], theater=key[1], day=key[2], time=key[3], since=cursor)
+    return render_template('seating.html', movie=movie, show=show, seat_map=seat_map, occupied=occupied,
+                           events_url=events_url, best_max=best_seats_limit(layout))
+
+def best_seats_limit(layout):
+    return min(current_app.config['BEST_SEATS_MAX'], layout.seats_per_row)
+
+# "Best available": holds the best `count` adjacent seats of the chosen show
+# (see seat_inventory.BlockTable). A form post goes on to payment; a JSON post
+# ({"count": 4}) gets the hold back instead.
+def best_seats(title):
+    wants_json = request.is_json
+
+    def fail(message, status):
+        if wants_json:
+            return jsonify({'error': message}), status
+        flash(message)
+        return redirect(url_for('seating', title=title))
+
+    if 'email' not in session:
+        return (jsonify({'error': 'Login required'}), 401) if wants_json else redirect(url_for('login'))
+    movie = catalog().get(title)
+    if not movie:
+        return fail("Movie not found", 404)
+    key = current_show_key(movie)
+    show = schedule().show(key)
+    if not show:
+        return fail("Please choose a show time first.", 400)
+
+    form = (request.get_json(silent=True) or {}) if wants_json else request.form
+    try:
+        count = int(form.get('count', 0))
+    except (TypeError, ValueError):
+        count = 0
+    limit = best_seats_limit(show.screen.layout)
+    if not 1 <= count <= limit:
+        return fail(f"Please choose between 1 and {limit} seats.", 400)
+
+    try:
+        hold = holds().hold_best(key, count, session['email'], movie['price'])
+    except NoSeatsTogether:
+        return fail(f"Sorry, there are no {count} seats together left. Try fewer, or pick seats on the map.", 409)
+
+    if wants_json:
+        return jsonify({'hold_id': hold.hold_id, 'seats': hold.seats_list, 'price': hold.price,
+                        'expires_in': hold.seconds_left,
+                        'payment_url': url_for('payment', booking_id=hold.hold_id)}), 201
+    return redirect(url_for('payment', booking_id=hold.hold_id))
+
+# Server-sent seat changes for one show, as a long poll (see seat_events.py):
+# /seating/RRR/events?theater=...&day=2025-06-02&time=4:00 PM&since=<cursor>
+async def seat_updates(title):
+    if 'email' not in session:
+        return "Login required", 401
+    movie = catalog().get(title)
+    if not movie:
+        return "Movie not found", 404
+    key = show_key(movie['title'], request.args.get('theater'), request.args.get('day'), request.args.get('time'))
+    if not schedule().show(key):
+        return "Show not found", 404
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('since')
+    # Served by asgi.py a poll waits for the next change on the event loop;
+    # under a WSGI server waiting would hold a thread, so it answers at once
+    body = await seat_events().poll(key, last_id, aio().run, can_wait='asgi.scope' in request.environ)
+    return current_app.response_class(body, mimetype='text/event-stream',
+                                      headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+async def payment(booking_id):
+    if 'email' not in session:
+        return redirect(url_for('login'))
+
+    hold = holds().get(booking_id, session['email'])
+    if not hold:
+        # Already paid (e.g. the form was submitted twice)
+        if await aio().store.get_booking(booking_id):
+            return redirect(url_for('ticket_confirmation', booking_id=booking_id))
+        flash("Your seat hold has expired. Please choose your seats again.")
+        return redirect(url_for('home'))
+
+    movie = catalog().get(hold.movie)
+
+    if request.method == 'POST':
+        # In a real app, you'd process payment here (e.g., with Stripe, PayPal).
+        # For now, we simulate success and turn the hold into a booking.
+        try:
+            hold = holds().confirm(booking_id, session['email'])
+        except HoldExpired:
+            flash("Your seat hold has expired. Please choose your seats again.")
+            return redirect(url_for('seating', title=hold.movie))
+
+        try:
+            await aio().store.put_booking({
+                'booking_id': hold.hold_id,
+                'user_email': hold.user_email,
+                'movie': hold.movie,
+                'theater': hold.theater,
+                'day': hold.day,
+                'time': hold.time,
+                'seats': hold.seats,
+                'price': hold.price,
+            })
+        except SeatsTaken:
+            # Sold by another process since this one loaded the show
+            await aio().run(inventory().release, hold.key, hold.seats_list)
+            inventory().forget(hold.key)
+            flash("Sorry, some of these seats were just booked. Please choose again.")
+            return redirect(url_for('seating', title=hold.movie))
+        except StorageError as e:
+            await aio().run(inventory().release, hold.key, hold.seats_list)
+            flash(f'Booking failed: {e}')
+            print(f"Storage error during booking: {e}")
+            return redirect(url_for('home'))
+
+        # Queued only; the notifier's workers send it after the response
+        if current_app.extensions['notifier']:
+            booking_confirmation(current_app.extensions['notifier'], {
+                'booking_id': hold.hold_id, 'user_email': hold.user_email, 'movie': hold.movie,
+                'theater': hold.theater, 'day': hold.day, 'time': hold.time, 'seats': hold.seats, 'price': hold.price})
+
+        flash("Payment successful!")
+        return redirect(url_for('ticket_confirmation', booking_id=hold.hold_id))
+
+    return render_template('payment.html', booking=hold, movie=movie)
+
+async def ticket_confirmation():
+    if 'email' not in session:
+        return redirect(url_for('login'))
+
+    booking_id = request.args.get('booking_id')
+    if not booking_id:
+        flash("No booking ID provided.")
+        return redirect(url_for('home'))
+
+    booking = await aio().store.get_booking(booking_id)
+    if not booking:
+        flash("Invalid booking.")
+        return redirect(url_for('home'))
+
+    movie = catalog().get(booking.get('movie'))
+    return render_template('tickets.html', movie=movie, booking=booking)
+
+# (bookings, next_cursor, cursor actually used) for one dashboard page
+async def dashboard_page(user_email, cursor):
+    page_size = current_app.config['DASHBOARD_PAGE_SIZE']
+    try:
+        return (*await aio().store.list_user_bookings(user_email, page_size, cursor), cursor)
+    except ValueError:
+        # Malformed cursor: start from the newest again
+        return (*await aio().store.list_user_bookings(user_email, page_size), None)
+
+# One page per request, newest first; ?cursor= continues with older ones.
+# Where storage calls can overlap (DynamoDB) the user and the page are
+# fetched at the same time.
+async def dashboard():
+    if 'email' not in session:
+        return redirect(url_for('login'))
+
+    user_email = session['email']
+    cursor = request.args.get('cursor')
+    if aio().store.concurrent:
+        user, page = await asyncio.gather(aio().run(current_user), dashboard_page(user_email, cursor),
+                                          return_exceptions=True)
+        if isinstance(user, Exception):
+            raise user
+    else:
+        user = await aio().run(current_user)
+        try:
+            page = await dashboard_page(user_email, cursor)
+        except StorageError as e:
+            page = e
+
+    if not user:
+        flash("User not found or session invalid. Please log in again.")
+        return redirect(url_for('login'))
+
+    bookings, next_cursor, cursor, total_bookings = [], None, None, 0
+    try:
+        if isinstance(page, Exception):
+            raise page
+        bookings, next_cursor, cursor = page
+        # The DynamoDB user item already carries the count; saves a round trip
+        total_bookings = int(user['booking_count']) if user.get('booking_count') is not None \
+            else await aio().store.count_user_bookings(user_email)
+    except StorageError as e:
+        flash(f"Error fetching bookings: {e}")
+        print(f"Storage error fetching bookings for dashboard: {e}")
+
+    return render_template('dashboard.html', bookings=bookings, user=user, total_bookings=total_bookings,
+                           next_cursor=next_cursor, is_first_page=not cursor,
+                           clear_job=jobs().active('clear_history', user_email))
+
+def clear_history():
+    if 'email' not in session:
+        return redirect(url_for('login'))
+    if not current_user():
+        flash("User not found or session invalid. Please log in again.")
+        return redirect(url_for('login'))
+
+    try:
+        total = store().count_user_bookings(session['email'])
+    except StorageError as e:
+        flash(f'Error clearing history: {e}')
+        print(f"Storage error clearing history: {e}")
+        return redirect(url_for('dashboard'))
+
+    if not total:
+        flash('No booking history to clear.')
+        return redirect(url_for('dashboard'))
+
+    # Deletion runs in the background; the dashboard polls its progress
+    jobs().submit('clear_history', session['email'], clear_history_job, session['email'], total)
+    flash('Clearing booking history...')
+    return redirect(url_for('dashboard'))
+
+def clear_history_job(job, email, total):
+    job.progress.update(deleted=0, total=total)
+    for batch in store().iter_delete_user_bookings(email, current_app.config['CLEAR_HISTORY_BATCH_SIZE']):
+        # The shows reload their sold seats from storage when next opened
+        for key in {show_key(b['movie'], b['theater'], b.get('day'), b['time']) for b in batch}:
+            inventory().forget(key)
+        job.progress['deleted'] += len(batch)
+
+def clear_history_status(job_id):
+    job = jobs().get(job_id)
+    if 'email' not in session or not job or job.owner != session['email']:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+async def download_ticket(booking_id):
+    booking = await aio().store.get_booking(booking_id)
+    if not booking:
+        return "Booking not found", 404
+
+    # A ticket's PDF only changes when its printed fields do, so the content
+    # hash is the ETag and a browser that already has this version gets a 304
+    etag = content_hash(booking)
+    if etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+
+    # Reading the cached PDF or rendering it stays off the event loop
+    data, rendered_at = await aio().run(ticket_cache().get_or_render, booking, etag)
+    response = send_file(io.BytesIO(data), as_attachment=True, download_name=f'ticket_{booking_id}.pdf',
+                         mimetype='application/pdf', etag=etag, last_modified=rendered_at, conditional=True)
+    response.cache_control.private = True
+    return response
+
+# ---------- Bulk Ticket Export ----------
+# One PDF with a page per ticket (?format=pdf, the default) or a ZIP with one
+# PDF per ticket (?format=zip), streamed while storage is still being read.
+def export_response(bookings, name):
+    fmt = request.args.get('format', 'pdf')
+    if fmt not in ('pdf', 'zip'):
+        return "format must be pdf or zip", 400
+    # Look at the first booking up front, so an empty export is a plain 404
+    # rather than an empty download
+    bookings = iter(bookings)
+    try:
+        first = next(bookings, None)
+    except StorageError as e:
+        print(f"Storage error exporting tickets: {e}")
+        return "Could not load bookings", 503
+    if first is None:
+        return "No bookings to export", 404
+
+    exporter = current_app.extensions['exports']
+    body = exporter.pdf(chain([first], bookings)) if fmt == 'pdf' else exporter.zip(chain([first], bookings))
+    return current_app.response_class(stream_with_context(body), mimetype=f'application/{fmt}',
+                                      headers={'Content-Disposition': f'attachment; filename={name}.{fmt}'})
+
+def export_tickets():
+    if 'email' not in session:
+        return redirect(url_for('login'))
+    return export_response(store().iter_user_bookings(session['email']), 'tickets')
+
+# Every ticket for one show, for theater staff (STAFF_EMAILS):
+# /export_tickets/show/RRR?theater=...&day=Monday&time=4:00 PM
+def export_show_tickets(title):
+    if 'email' not in session:
+        return redirect(url_for('login'))
+    if session['email'] not in current_app.config['STAFF_EMAILS']:
+        return "Staff only", 403
+    theater, show_time = request.args.get('theater'), request.args.get('time')
+    if not theater or not show_time:
+        return "theater and time are required", 400
+    key = show_key(title, theater, request.args.get('day'), show_time)
+    return export_response(store().iter_show_bookings(key), f"tickets_{secure_filename('_'.join(key))}")
+
+# Queue depth, counts and send latency of the notification pipeline
+def notification_status():
+    if session.get('email') not in current_app.config['STAFF_EMAILS']:
+        return jsonify({'error': 'Staff only'}), 403
+    notifier = current_app.extensions['notifier']
+    return jsonify(notifier.stats() if notifier else {'sink': 'off'})
+
+# Calls, retries, in-flight requests and connection pool use per AWS client
+def aws_status():
+    if session.get('email') not in current_app.config['STAFF_EMAILS']:
+        return jsonify({'error': 'Staff only'}), 403
+    return jsonify(current_app.extensions['aws'].stats())
+
+# Queue, wait and hash times of the password hasher
+def password_status():
+    if session.get('email') not in current_app.config['STAFF_EMAILS']:
+        return jsonify({'error': 'Staff only'}), 403
+    return jsonify(passwords().stats())
+
+# Rate, queue length, admissions and turned-away users per waiting room line
+def waiting_room_status():
+    if session.get('email') not in current_app.config['STAFF_EMAILS']:
+        return jsonify({'error': 'Staff only'}), 403
+    room = current_app.extensions.get('waiting_room')
+    return jsonify(room.stats() if room else {})
+
+# ---------- Sales Analytics ----------
+# For theater staff, served from the per-show sales totals (analytics.py):
+# /analytics/sales?by=movie&theater=... groups by show (default), movie,
+# theater or day and filters on movie, theater, day and time;
+# /analytics/sales.csv is the same report as a CSV download.
+def sales_query():
+    by = request.args.get('by', 'show')
+    if by not in GROUPS:
+        return None
+    filters = {f: request.args[f] for f in GROUPS['show'] if request.args.get(f)}
+    return sales_report().report(by, filters)
+
+def sales_analytics():
+    if session.get('email') not in current_app.config['STAFF_EMAILS']:
+        return jsonify({'error': 'Staff only'}), 403
+    try:
+        report = sales_query()
+    except StorageError as e:
+        print(f"Storage error reading sales totals: {e}")
+        return jsonify({'error': 'Could not load sales'}), 503
+    if report is None:
+        return jsonify({'error': f"by must be one of {', '.join(GROUPS)}"}), 400
+    return jsonify(report)
+
+def sales_analytics_csv():
+    if session.get('email') not in current_app.config['STAFF_EMAILS']:
+        return "Staff only", 403
+    try:
+        report = sales_query()
+    except StorageError as e:
+        print(f"Storage error reading sales totals: {e}")
+        return "Could not load sales", 503
+    if report is None:
+        return f"by must be one of {', '.join(GROUPS)}", 400
+    return current_app.response_class(sales_report().csv(report), mimetype='text/csv',
+                                      headers={'Content-Disposition': f"attachment; filename=sales_by_{report['by']}.csv"})
+
+# Rebuilds the totals from every booking in the background; one at a time
+def sales_backfill():
+    if session.get('email') not in current_app.config['STAFF_EMAILS']:
+        return jsonify({'error': 'Staff only'}), 403
+    job = jobs().submit('sales_backfill', 'staff', sales_backfill_job)
+    return jsonify(job.to_dict()), 202
+
+def sales_backfill_job(job):
+    sales_report().rebuild(current_app.config['ANALYTICS_BACKFILL_PAGE_SIZE'], job.progress)
+
+def sales_backfill_status(job_id):
+    job = jobs().get(job_id)
+    if session.get('email') not in current_app.config['STAFF_EMAILS'] or not job or job.kind != 'sales_backfill':
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+def init_app(app):
+    app.add_url_rule('/', view_func=index)
+    app.add_url_rule('/about', view_func=about)
+    app.add_url_rule('/services', view_func=services)
+    app.add_url_rule('/register', view_func=register, methods=['GET', 'POST'])
+    app.add_url_rule('/login', view_func=login, methods=['GET', 'POST'])
+    app.add_url_rule('/logout', view_func=logout)
+    app.add_url_rule('/home', view_func=home)
+    app.add_url_rule('/booking/<title>', view_func=booking, methods=['GET', 'POST'])
+    app.add_url_rule('/seating/<title>', view_func=seating, methods=['GET', 'POST'])
+    app.add_url_rule('/seating/<title>/events', view_func=seat_updates)
+    app.add_url_rule('/seating/<title>/best', view_func=best_seats, methods=['POST'])
+    app.add_url_rule('/payment/<booking_id>', view_func=payment, methods=['GET', 'POST'])
+    app.add_url_rule('/tickets', view_func=ticket_confirmation)
+    app.add_url_rule('/dashboard', view_func=dashboard)
+    app.add_url_rule('/clear_history', view_func=clear_history, methods=['POST'])
+    app.add_url_rule('/clear_history/<job_id>', view_func=clear_history_status)
+    app.add_url_rule('/download_ticket/<booking_id>', view_func=download_ticket)
+    app.add_url_rule('/export_tickets', view_func=export_tickets)
+    app.add_url_rule('/export_tickets/show/<title>', view_func=export_show_tickets)
+    app.add_url_rule('/notifications/status', view_func=notification_status)
+    app.add_url_rule('/aws/status', view_func=aws_status)
+    app.add_url_rule('/passwords/status', view_func=password_status)
+    app.add_url_rule('/waiting_room/status', view_func=waiting_room_status)
+    app.add_url_rule('/analytics/sales', view_func=sales_analytics)
+    app.add_url_rule('/analytics/sales.csv', view_func=sales_analytics_csv)
+    app.add_url_rule('/analytics/backfill', view_func=sales_backfill, methods=['POST'])
+    app.add_url_rule('/analytics/backfill/<job_id>', view_func=sales_backfill_status)
@@ -0,0 +1,187 @@
+import bisect, datetime, threading
+from seat_inventory import DEFAULT_LAYOUT, SeatLayout, show_key
+
+# ---------- Show Schedule ----------
+# Turns the catalog's weekly show plan into dated shows for the next
+# `days_ahead` days. Everything a request asks is answered from indexes built
+# once per catalog version and calendar day:
+#
+#   show(key)                  dict lookup by (movie, theater, date, time)
+#   by_theater(movie, date)    dict lookup, shows already sorted by start
+#   next_show(movie, after)    bisect into the movie's start times
+#   on_screen(theater, screen, at)
+#                              bisect into the screen's start times
+#
+# Shows are keyed by ISO date ("2026-10-19"), which is also the `day` stored
+# on bookings. Bookings made before dates existed (weekday names or 'N/A') are
+# not in any schedule and keep the default seat layout.
+
+TIME_FORMAT = '%I:%M %p'
+
+
+class Screen:
+    def __init__(self, theater, name, layout):
+        self.theater = theater
+        self.name = name
+        self.layout = layout
+
+    @property
+    def capacity(self):
+        return self.layout.capacity
+
+
+class ScheduledShow:
+    def __init__(self, movie, screen, date, time_label, runtime):
+        self.movie = movie
+        self.screen = screen
+        self.date = date
+        self.time = time_label
+        self.start = datetime.datetime.combine(date, datetime.datetime.strptime(time_label, TIME_FORMAT).time())
+        self.end = self.start + datetime.timedelta(minutes=runtime)
+
+    @property
+    def theater(self):
+        return self.screen.theater
+
+    @property
+    def day(self):
+        return self.date.isoformat()
+
+    @property
+    def key(self):
+        return show_key(self.movie, self.theater, self.day, self.time)
+
+
+class ScheduleConflict(ValueError):
+    pass
+
+
+class Schedule:
+    def __init__(self, snapshot, today):
+        self.version = snapshot.version
+        self.today = today
+        # One day back, so a show running past midnight (or a hold paid just
+        # after it) still resolves to its screen
+        self.dates = [today + datetime.timedelta(days=n) for n in range(-1, snapshot.days_ahead)]
+        self.listed_dates = self.dates[1:]
+
+        layouts = {}
+        self.screens = {}
+        for theater, screens in snapshot.screens.items():
+            for name, shape in screens.items():
+                layout_key = (shape['rows'], shape['seats_per_row'])
+                if layout_key not in layouts:
+                    layouts[layout_key] = SeatLayout(*layout_key)
+                self.screens[(theater, name)] = Screen(theater, name, layouts[layout_key])
+        self._theater_order = {theater: i for i, theater in enumerate(snapshot.theaters)}
+
+        self._by_key = {}
+        self._by_movie_date = {}
+        by_movie, by_screen = {}, {}
+        for movie in snapshot.movies:
+            for rule in snapshot.show_plan.get(movie['title'], []):
+                screen = self.screens[(rule['theater'], rule['screen'])]
+                for date in self.dates:
+                    if date.weekday() not in rule['weekdays']:
+                        continue
+                    for time_label in rule['times']:
+                        show = ScheduledShow(movie['title'], screen, date, time_label, movie['runtime'])
+                        self._by_key[show.key] = show
+                        self._by_movie_date.setdefault((movie['title'], show.day), []).append(show)
+                        by_movie.setdefault(movie['title'], []).append(show)
+                        by_screen.setdefault((screen.theater, screen.name), []).append(show)
+
+        for shows in self._by_movie_date.values():
+            shows.sort(key=lambda s: (self._theater_order.get(s.theater, 0), s.start))
+        # Interval indexes: parallel (start times, shows) lists sorted by start
+        self._by_movie = self._index(by_movie)
+        self._by_screen = self._index(by_screen)
+        for (theater, name), (starts, shows) in self._by_screen.items():
+            for before, after in zip(shows, shows[1:]):
+                if before.end > after.start:
+                    raise ScheduleConflict(f"{theater} {name}: {before.movie} at {before.start} overlaps "
+                                           f"{after.movie} at {after.start}")
+
+    @staticmethod
+    def _index(groups):
+        index = {}
+        for key, shows in groups.items():
+            shows.sort(key=lambda s: s.start)
+            index[key] = ([s.start for s in shows], shows)
+        return index
+
+    def show(self, key):
+        return self._by_key.get(key)
+
+    # [(theater, [show, ...]), ...] for one movie and ISO date, optionally
+    # only shows starting after `after`
+    def by_theater(self, movie, day, after=None):
+        grouped = {}
+        for show in self._by_movie_date.get((movie, day), []):
+            if after is None or show.start > after:
+                grouped.setdefault(show.theater, []).append(show)
+        return list(grouped.items())
+
+    # First show of `movie` starting after `after` for which available(show)
+    # is true (every show when available is None)
+    def next_show(self, movie, after, available=None):
+        starts, shows = self._by_movie.get(movie, ([], []))
+        for show in shows[bisect.bisect_right(starts, after):]:
+            if available is None or available(show):
+                return show
+        return None
+
+    def on_screen(self, theater, screen, at):
+        starts, shows = self._by_screen.get((theater, screen), ([], []))
+        i = bisect.bisect_right(starts, at) - 1
+        return shows[i] if i >= 0 and shows[i].end > at else None
+
+    def layout_for(self, key):
+        show = self._by_key.get(key)
+        return show.screen.layout if show else DEFAULT_LAYOUT
+
+
+# Keeps one Schedule for the current catalog version and date and rebuilds it
+# when either changes. on_rebuild(fn) callbacks get (old, new).
+class Scheduler:
+    def __init__(self, catalog, today=datetime.date.today):
+        self.catalog = catalog
+        self._today = today
+        self._schedule = None
+        self._failed = None  # (version, date) that did not build, not retried
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def on_rebuild(self, fn):
+        self._listeners.append(fn)
+
+    def current(self):
+        snapshot, today = self.catalog.snapshot(), self._today()
+        schedule = self._schedule
+        if schedule and ((schedule.version, schedule.today) == (snapshot.version, today)
+                         or self._failed == (snapshot.version, today)):
+            return schedule
+        with self._lock:
+            old = self._schedule
+            if old and ((old.version, old.today) == (snapshot.version, today)
+                        or self._failed == (snapshot.version, today)):
+                return old
+            try:
+                new = Schedule(snapshot, today)
+            except ScheduleConflict as e:
+                if not old:
+                    raise
+                self._failed = (snapshot.version, today)
+                print(f"Schedule rebuild failed, keeping catalog version {old.version}: {e}")
+                return old
+            self._schedule = new
+        if old:
+            for fn in self._listeners:
+                try:
+                    fn(old, new)
+                except Exception as e:
+                    print(f"Schedule rebuild listener failed: {e}")
+        return new
+
+    def layout_for(self, key):
+        return self.current().layout_for(key)
@@ -0,0 +1,176 @@
+import asyncio, itertools, json, os, threading
+from collections import deque
+
+# ---------- Live Seat Updates ----------
+# The seating page subscribes to /seating/<title>/events, a server-sent event
+# stream per show. Every reserve() and release() of the SeatInventory (seats
+# held, holds released or expired, failed payments) becomes one compact event
+# with the seat indexes (data-i) that were taken or freed:
+#
+#   id: 1f2e3d4c-42
+#   event: seats
+#   data: {"taken":[14,15],"freed":[]}
+#
+# Fan-out: a show keeps one ring buffer of its last `backlog` events, each
+# encoded once when published. Subscribers only remember the last version
+# they got and read the shared buffer from there, so an event is encoded
+# once however many viewers there are, and nothing is queued per client. A client too far behind, coming from another process (the event
+# ids carry a per-process epoch) or watching a show that was reloaded from
+# storage gets one "snapshot" event with the whole occupancy bitmap instead.
+#
+# Delivery is a long poll: each connection gets what changed since its
+# Last-Event-ID and closes, and the browser's EventSource reconnects after
+# the "retry" the response names. When nothing has changed yet, poll() waits
+# up to `wait_seconds` for the next change. It waits as a future on the
+# request's event loop, which _publish() resolves, so served by asgi.py
+# a waiting viewer holds no thread; at most `max_waiting` wait at once.
+# Under a WSGI server an async view holds a thread while it waits, so there
+# polls answer at once (can_wait=False) and the browser comes back every
+# `poll_ms`.
+RETRY_MS = 250  # reconnect delay after a long poll
+
+
+def _indexes(bits):
+    return [i for i in range(bits.bit_length()) if bits >> i & 1]
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class ShowChannel:
+    def __init__(self, backlog):
+        self.version = 0
+        self.events = deque(maxlen=backlog)  # (version, encoded frame); None asks for a snapshot
+        self.waiters = []  # (loop, future) of polls waiting for the next change
+        self.lock = threading.Lock()
+
+
+class SeatEvents:
+    def __init__(self, inventory, backlog=256, max_waiting=1000, wait_seconds=25, poll_ms=3000):
+        self.inventory = inventory
+        self.backlog = backlog
+        self.max_waiting = max_waiting
+        self.wait_seconds = wait_seconds
+        self.poll_ms = poll_ms
+        self.epoch = os.urandom(4).hex()
+        self.published = 0
+        self.waiting = 0
+        self.polls = 0
+        self._channels = {}
+        self._lock = threading.Lock()
+        inventory.on_change(self._changed)
+        inventory.on_forget(self._forgotten)
+
+    def _channel(self, key):
+        channel = self._channels.get(key)
+        if channel is None:
+            with self._lock:
+                channel = self._channels.setdefault(key, ShowChannel(self.backlog))
+        return channel
+
+    def _publish(self, key, payload):
+        channel = self._channel(key)
+        with channel.lock:
+            channel.version += 1
+            frame = None
+            if payload is not None:
+                frame = f"id: {self.epoch}-{channel.version}\nevent: seats\ndata: {payload}\n\n".encode()
+            channel.events.append((channel.version, frame))
+            waiters, channel.waiters = channel.waiters, []
+            self.published += 1
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                pass  # the poll's loop has closed
+
+    # Inventory listeners; they run under the inventory's lock
+    def _changed(self, key, taken, freed):
+        self._publish(key, json.dumps({'taken': _indexes(taken), 'freed': _indexes(freed)}, separators=(',', ':')))
+
+    def _forgotten(self, key):
+        self._publish(key, None)
+
+    # Where a page rendered now starts its stream; read it before the occupancy
+    def cursor(self, key):
+        return f"{self.epoch}-{self._channel(key).version}"
+
+    def _parse(self, last_id):
+        epoch, _, version = (last_id or '').partition('-')
+        if epoch != self.epoch or not version.isdigit():
+            return None
+        return int(version)
+
+    # Frames after `version`, or None when the client needs a snapshot.
+    # Caller holds channel.lock.
+    @staticmethod
+    def _pending(channel, version):
+        if version is None or version > channel.version:
+            return None
+        if version == channel.version:
+            return []
+        if not channel.events or channel.events[0][0] > version + 1:
+            return None  # fell out of the backlog
+        frames = [frame for _, frame in itertools.islice(channel.events, version + 1 - channel.events[0][0], None)]
+        return None if None in frames else frames
+
+    def _snapshot(self, key, version):
+        # Loads the show from storage if it was forgotten; the version was read
+        # first, so anything that changes meanwhile follows as an event
+        occupied = self.inventory.occupancy(key)
+        data = json.dumps({'occupied': format(occupied, 'x')}, separators=(',', ':'))
+        return f"id: {self.epoch}-{version}\nevent: snapshot\ndata: {data}\n\n".encode()
+
+    # Frames after `version` and the version they reach; when there are none
+    # and `future` is given, it is resolved by the next change
+    def _take(self, channel, version, future=None):
+        with channel.lock:
+            frames = self._pending(channel, version)
+            if frames == [] and future is not None:
+                channel.waiters.append((future.get_loop(), future))
+            return frames, channel.version
+
+    # The event stream body for one poll. run(fn, *args) runs blocking work
+    # (a snapshot may load the show from storage) off the event loop.
+    async def poll(self, key, last_id, run, can_wait=True):
+        version = self._parse(last_id)
+        channel = self._channel(key)
+        with self._lock:
+            self.polls += 1
+            waits = can_wait and self.waiting < self.max_waiting
+            if waits:
+                self.waiting += 1
+        try:
+            future = asyncio.get_running_loop().create_future() if waits else None
+            frames, current = self._take(channel, version, future)
+            if frames == [] and waits:
+                try:
+                    await asyncio.wait_for(future, self.wait_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                finally:
+                    with channel.lock:
+                        if (future.get_loop(), future) in channel.waiters:
+                            channel.waiters.remove((future.get_loop(), future))
+                frames, current = self._take(channel, version)
+        finally:
+            if waits:
+                with self._lock:
+                    self.waiting -= 1
+
+        body = [f"retry: {RETRY_MS if waits else self.poll_ms}\n\n".encode()]
+        if frames is None:
+            body.append(await run(self._snapshot, key, current))
+        elif frames:
+            body.extend(frames)
+        else:
+            # Moves the browser's Last-Event-ID along, so the next poll
+            # replays nothing
+            body.append(f"id: {self.epoch}-{current}\n\n".encode())
+        return b''.join(body)
+
+    def stats(self):
+        return {'shows': len(self._channels), 'published': self.published, 'waiting': self.waiting,
+                'polls': self.polls}
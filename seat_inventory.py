@@ -0,0 +1,255 @@
+import contextlib, math, threading
+
+# ---------- Seat Layout ----------
+# A layout maps seat labels ("A1", "J12", ...) to bit positions. Labels and the
+# label -> index map are computed once per layout, not once per request.
+class SeatLayout:
+    def __init__(self, rows="ABCDEFGHIJ", seats_per_row=12):
+        self.rows = rows
+        self.seats_per_row = seats_per_row
+        self.labels = [f"{r}{n}" for r in rows for n in range(1, seats_per_row + 1)]
+        self.index = {label: i for i, label in enumerate(self.labels)}
+        self.capacity = len(self.labels)
+        self._blocks = {}  # party size -> BlockTable
+
+    # Best-available table for parties of n, built once per layout and size
+    def blocks(self, n):
+        table = self._blocks.get(n)
+        if table is None:
+            table = self._blocks[n] = BlockTable(self, n)
+        return table
+
+    def mask(self, seats):
+        bits = 0
+        for seat in seats:
+            try:
+                bits |= 1 << self.index[seat]
+            except KeyError:
+                raise UnknownSeat(seat)
+        return bits
+
+    def seats_in(self, bits):
+        return [self.labels[i] for i in range(self.capacity) if bits >> i & 1]
+
+
+# ---------- Best Available ----------
+# The best block for a party of n is the run of n seats in one row whose
+# middle is closest to the sweet spot: the centre column, SWEET_SPOT of the
+# way back from the screen (row A is nearest the screen).
+#
+# Per layout and party size the table precomputes every block's start bit,
+# the blocks in order of preference and each block's rank. At allocation
+# time the free-run starts of the whole hall come out of the occupancy
+# bitmap in O(log n) big-integer operations: with `free` the free seats,
+# runs &= runs >> k, doubling k, leaves bit i set exactly where n free seats
+# start at i, and the precomputed start mask drops runs that would wrap into
+# the next row. A nearly empty hall takes the first preferred block that is
+# free; a nearly full one only looks at the few runs that are left.
+SWEET_SPOT = 2 / 3
+FEW_RUNS = 16  # at most this many free runs: compare their ranks instead of walking the order
+
+
+class BlockTable:
+    def __init__(self, layout, n):
+        width = layout.seats_per_row
+        if not 1 <= n <= width:
+            raise ValueError(f"Party size must be between 1 and {width}")
+        self.n = n
+        self.full = (1 << layout.capacity) - 1
+        middle_col, middle_row = (width - 1) / 2, (len(layout.rows) - 1) * SWEET_SPOT
+        scored = []
+        self.starts = 0
+        for r in range(len(layout.rows)):
+            for c in range(width - n + 1):
+                start = r * width + c
+                self.starts |= 1 << start
+                scored.append((math.hypot(c + (n - 1) / 2 - middle_col, r - middle_row), start))
+        self.order = [start for _, start in sorted(scored)]
+        self.rank = {start: i for i, start in enumerate(self.order)}
+
+    # Bit i set where n free seats in one row start at seat i
+    def runs(self, occupied):
+        runs, length = ~occupied & self.full, 1
+        while length * 2 <= self.n:
+            runs &= runs >> length
+            length *= 2
+        if length < self.n:
+            runs &= runs >> (self.n - length)
+        return runs & self.starts
+
+    # Start index of the best free block, or None if no n seats are together
+    def best(self, occupied):
+        runs = self.runs(occupied)
+        if not runs:
+            return None
+        if runs.bit_count() > FEW_RUNS:
+            return next(start for start in self.order if runs >> start & 1)
+        best = None
+        while runs:
+            low = runs & -runs
+            start = low.bit_length() - 1
+            if best is None or self.rank[start] < self.rank[best]:
+                best = start
+            runs ^= low
+        return best
+
+    def mask(self, start):
+        return ((1 << self.n) - 1) << start
+
+
+DEFAULT_LAYOUT = SeatLayout()
+
+
+class UnknownSeat(ValueError):
+    pass
+
+
+class SeatUnavailable(Exception):
+    def __init__(self, seats):
+        super().__init__(', '.join(seats))
+        self.seats = seats
+
+
+class NoSeatsTogether(Exception):
+    def __init__(self, count):
+        super().__init__(f"No {count} seats together are left")
+        self.count = count
+
+
+def show_key(movie, theater, day, show_time):
+    return (movie, theater, day or 'N/A', show_time)
+
+
+def parse_seats(seats_str):
+    # "A1, A2,A1" -> ['A1', 'A2'] (order kept, duplicates dropped)
+    seats = [s.strip().upper() for s in (seats_str or '').split(',')]
+    return list(dict.fromkeys(s for s in seats if s))
+
+
+# ---------- Seat Inventory ----------
+# One integer bitmap per show: bit i is set when seat layout.labels[i] is taken.
+# reserve()/release() only touch the bits of the requested seats, so they cost
+# O(seats) regardless of how many bookings exist for the show.
+#
+# `loader(key)` is called once, the first time a show is touched, and must
+# return the seat labels already sold for that show in persistent storage.
+# Seats taken only in memory (unpaid holds) come from the functions given to
+# add_source(); they are asked again whenever a forgotten show is reloaded,
+# so forgetting a show never frees a held seat.
+#
+# on_change(fn) callbacks get (key, taken, freed), the bits a reserve() or
+# release() actually flipped; on_forget(fn) callbacks get the key of a show
+# dropped from memory. Both run under the lock, so listeners see the changes
+# of a show in order; they must be quick and must not call the inventory.
+class SeatInventory:
+    def __init__(self, loader=None, layout_for=None):
+        self._loader = loader
+        self._layout_for = layout_for or (lambda key: DEFAULT_LAYOUT)
+        self._shows = {}
+        self._lock = threading.Lock()
+        self._change_listeners = []
+        self._forget_listeners = []
+        self._sources = []
+
+    def layout(self, key):
+        return self._layout_for(key)
+
+    def on_change(self, fn):
+        self._change_listeners.append(fn)
+
+    def on_forget(self, fn):
+        self._forget_listeners.append(fn)
+
+    # fn(key) -> labels of seats taken for the show outside storage
+    def add_source(self, fn):
+        self._sources.append(fn)
+
+    # Called with the lock held
+    def _notify(self, listeners, *args):
+        for fn in listeners:
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"Seat inventory listener failed: {e}")
+
+    def _read(self, key):
+        # Caller must not hold the lock: the loader may hit the database.
+        layout = self.layout(key)
+        taken = 0
+        for seats in ([self._loader] if self._loader else []) + self._sources:
+            for seat in seats(key):
+                if seat in layout.index:
+                    taken |= 1 << layout.index[seat]
+        return taken
+
+    # Holds the lock with the show in memory, loading it first if needed. A
+    # show forgotten again before the lock is taken is simply read again.
+    @contextlib.contextmanager
+    def _loaded(self, key):
+        while True:
+            loaded = None if key in self._shows else self._read(key)
+            self._lock.acquire()
+            if key in self._shows or loaded is not None:
+                self._shows.setdefault(key, loaded)
+                break
+            self._lock.release()
+        try:
+            yield
+        finally:
+            self._lock.release()
+
+    def occupancy(self, key):
+        with self._loaded(key):
+            return self._shows[key]
+
+    def sold_seats(self, key):
+        return self.layout(key).seats_in(self.occupancy(key))
+
+    def is_available(self, key, seats):
+        return not self.occupancy(key) & self.layout(key).mask(seats)
+
+    def reserve(self, key, seats):
+        # layout_for may rebuild a schedule, so never call it under the lock
+        layout = self.layout(key)
+        mask = layout.mask(seats)
+        with self._loaded(key):
+            taken = self._shows[key] & mask
+            if taken:
+                raise SeatUnavailable(layout.seats_in(taken))
+            self._shows[key] |= mask
+            self._notify(self._change_listeners, key, mask, 0)
+
+    # Reserves the best block of `count` adjacent seats in one row and returns
+    # its labels. Raises NoSeatsTogether, or ValueError for a party that
+    # cannot fit in a row.
+    def reserve_best(self, key, count):
+        layout = self.layout(key)
+        table = layout.blocks(count)
+        with self._loaded(key):
+            start = table.best(self._shows[key])
+            if start is None:
+                raise NoSeatsTogether(count)
+            mask = table.mask(start)
+            self._shows[key] |= mask
+            self._notify(self._change_listeners, key, mask, 0)
+        return layout.labels[start:start + count]
+
+    def release(self, key, seats):
+        mask = self.layout(key).mask(seats)
+        with self._loaded(key):
+            freed = self._shows[key] & mask
+            self._shows[key] &= ~mask
+            if freed:
+                self._notify(self._change_listeners, key, 0, freed)
+
+    def forget(self, key):
+        # Drop a show from memory; it is reloaded from storage on next use.
+        with self._lock:
+            if self._shows.pop(key, None) is not None:
+                self._notify(self._forget_listeners, key)
+
+    def forget_where(self, match):
+        with self._lock:
+            for key in [k for k in self._shows if match(k)]:
+                del self._shows[key]
+                self._notify(self._forget_listeners, key)
@@ -0,0 +1,108 @@
+import queue, threading
+from concurrent.futures import Future
+from sqlalchemy import event
+
+# ---------- SQLite Production Profile ----------
+# SQLITE_PROFILE = 'production' sets up movie_magic.db for many concurrent
+# requests instead of SQLite's defaults:
+#
+#   journal_mode=WAL      readers no longer wait for a writer (and vice versa)
+#   synchronous=NORMAL    fsync at checkpoints, not every commit; safe with WAL
+#   cache_size, mmap_size page cache and memory-mapped reads (SQLITE_CACHE_KB,
+#                         SQLITE_MMAP_BYTES)
+#   busy_timeout          a writer waits SQLITE_BUSY_TIMEOUT seconds for the
+#                         lock instead of failing with "database is locked"
+#
+# plus a connection pool of SQLITE_POOL_SIZE connections, so request threads
+# reuse connections (and their warmed page caches) instead of opening files.
+#
+# SQLITE_GROUP_COMMIT adds a GroupCommitWriter: bookings from concurrent
+# checkouts are handed to one writer thread, which inserts whatever has queued
+# up while its previous commit ran in a single transaction. There is one
+# writer per process, so requests never fight over the write lock, and a busy
+# minute costs a few fsyncs instead of one per booking. It is off by default
+# and in app.py: in bench.py runs (64 users, 16 at a time) it added a few
+# percent of requests per second but raised POST /payment p95 by about 60%,
+# since each checkout waits for the writer's whole batch.
+
+
+def engine_options(config):
+    return {
+        'pool_size': config['SQLITE_POOL_SIZE'],
+        'max_overflow': 0,
+        'pool_timeout': config['SQLITE_BUSY_TIMEOUT'],
+        'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT'], 'check_same_thread': False},
+    }
+
+
+def pragmas(config):
+    return {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -int(config['SQLITE_CACHE_KB']),  # negative: KiB rather than pages
+        'mmap_size': int(config['SQLITE_MMAP_BYTES']),
+        'temp_store': 'MEMORY',
+        'busy_timeout': int(config['SQLITE_BUSY_TIMEOUT'] * 1000),
+    }
+
+
+# Runs the PRAGMAs on every new pooled connection
+def apply_pragmas(engine, values):
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in values.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+# write(bookings) must insert all bookings in one transaction, raising if any
+# of them cannot be written (SQLStore.batch_put_bookings). submit() blocks
+# until its booking is committed and raises what a direct write would have.
+class GroupCommitWriter:
+    def __init__(self, app, write, max_batch=100):
+        self.app = app
+        self.write = write
+        self.max_batch = max_batch
+        self.commits = 0
+        self.bookings = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='sqlite-group-commit', daemon=True)
+        self._thread.start()
+
+    def submit(self, booking):
+        future = Future()
+        self._queue.put((booking, future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            with self.app.app_context():
+                self._commit(batch)
+
+    def _commit(self, batch):
+        try:
+            self.write([booking for booking, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            # One booking spoiled the transaction (e.g. its seat was sold
+            # meanwhile): write them one by one so only that one fails
+            for booking, future in batch:
+                self._commit([(booking, future)])
+            return
+        self.commits += 1
+        self.bookings += len(batch)
+        for _, future in batch:
+            future.set_result(None)
+
+    def stats(self):
+        return {'commits': self.commits, 'bookings': self.bookings, 'queued': self._queue.qsize(),
+                'avg_batch': round(self.bookings / self.commits, 2) if self.commits else None}
@@ -0,0 +1,953 @@
+import base64, json, threading, time, datetime
+from collections import OrderedDict
+from botocore.exceptions import ClientError
+from boto3.dynamodb.conditions import Attr, Key
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+import migrations, sqlite_tuning
+from models import db, User, Show, Booking, BookedSeat, ShowSales
+from seat_inventory import parse_seats
+
+# ---------- Storage Backends ----------
+# Every route talks to one of these instead of SQLAlchemy or boto3 directly.
+# Users and bookings are passed around as plain dicts shaped like the DynamoDB
+# items (Jinja reads booking.movie from a dict just as well):
+#
+#   user:    {'email', 'name', 'password_hash'}
+#   booking: {'booking_id', 'user_email', 'movie', 'theater', 'day', 'time',
+#             'seats', 'price', 'created_at'}
+#
+# Listing is paginated: list_user_bookings() returns (items, cursor) where
+# cursor is an opaque string for the next page, or None on the last page.
+#
+# Every backend also keeps sales totals per show (bookings, tickets, revenue)
+# next to the bookings and updates them on each booking write and delete;
+# show_sales() reads only those totals (see analytics.py).
+
+class StorageError(Exception):
+    pass
+
+
+# A booking tried to take a seat that is already sold for its show
+class SeatsTaken(StorageError):
+    pass
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor):
+    return json.loads(base64.urlsafe_b64decode(cursor.encode())) if cursor else None
+
+
+# Every backend stamps created_at in UTC, like Booking.created_at's default;
+# dashboard pages are ordered and paged on it
+def now_iso():
+    return datetime.datetime.utcnow().isoformat()
+
+
+# {(movie, theater, day, time): [bookings, tickets, revenue]} for some
+# bookings, added into `totals` if given; sign=-1 takes them away
+def tally_sales(bookings, totals=None, sign=1):
+    totals = {} if totals is None else totals
+    for booking in bookings:
+        row = totals.setdefault((booking['movie'], booking['theater'], booking.get('day') or 'N/A', booking['time']),
+                                [0, 0, 0])
+        row[0] += sign
+        row[1] += sign * len(parse_seats(booking.get('seats')))
+        row[2] += sign * int(booking.get('price') or 0)
+    return totals
+
+
+def sales_row(slot, bookings, tickets, revenue):
+    movie, theater, day, show_time = slot
+    return {'movie': movie, 'theater': theater, 'day': day, 'time': show_time,
+            'bookings': int(bookings), 'tickets': int(tickets), 'revenue': int(revenue)}
+
+
+class BookingStore:
+    name = None
+
+    def get_user(self, email):
+        raise NotImplementedError
+
+    def put_user(self, user):
+        raise NotImplementedError
+
+    def update_password_hash(self, email, password_hash):
+        raise NotImplementedError
+
+    def get_booking(self, booking_id):
+        raise NotImplementedError
+
+    def batch_get_bookings(self, booking_ids):
+        raise NotImplementedError
+
+    def put_booking(self, booking):
+        self.batch_put_bookings([booking])
+
+    def batch_put_bookings(self, bookings):
+        raise NotImplementedError
+
+    def list_user_bookings(self, email, limit=50, cursor=None):
+        raise NotImplementedError
+
+    # Maintained on every write, so this is one key lookup
+    def count_user_bookings(self, email):
+        raise NotImplementedError
+
+    # Yields every booking of a user, following cursors page by page
+    def iter_user_bookings(self, email, page_size=100):
+        cursor = None
+        while True:
+            items, cursor = self.list_user_bookings(email, limit=page_size, cursor=cursor)
+            yield from items
+            if not cursor:
+                break
+
+    # Deletes a user's bookings batch by batch, each batch in its own write,
+    # and yields every batch once it is gone. Yielded bookings carry at least
+    # booking_id, movie, theater, day and time; other fields may be missing.
+    def iter_delete_user_bookings(self, email, batch_size=25):
+        raise NotImplementedError
+
+    def delete_user_bookings(self, email):
+        return [b for batch in self.iter_delete_user_bookings(email) for b in batch]
+
+    # Seat labels sold for (movie, theater, day, time). Bookings stored with
+    # day 'N/A' predate day selection; they are a show of their own and do
+    # not count for any dated show.
+    def sold_seats(self, key):
+        raise NotImplementedError
+
+    # Yields every booking for a show, matched on the day like sold_seats()
+    def iter_show_bookings(self, key, page_size=100):
+        raise NotImplementedError
+
+    # Sales totals of every show that has bookings, as dicts with movie,
+    # theater, day, time, bookings, tickets and revenue. 'N/A' day bookings
+    # are their own show here.
+    def show_sales(self):
+        raise NotImplementedError
+
+    # Yields all bookings in lists of about page_size, for rebuilding the
+    # sales totals. Bookings carry booking_id, movie, theater, day, time,
+    # seats and price.
+    def iter_all_bookings(self, page_size=500):
+        raise NotImplementedError
+
+    # Replaces every show's sales totals with `totals`, shaped like
+    # tally_sales() returns them
+    def replace_show_sales(self, totals):
+        raise NotImplementedError
+
+
+# ---------- SQLite (SQLAlchemy) ----------
+class SQLStore(BookingStore):
+    name = 'sqlite'
+
+    def __init__(self, app):
+        profile = app.config['SQLITE_PROFILE']
+        if profile not in ('default', 'production'):
+            raise ValueError(f"Unknown SQLITE_PROFILE {profile!r} (expected default or production)")
+        if profile == 'production':
+            app.config['SQLALCHEMY_ENGINE_OPTIONS'] = dict(sqlite_tuning.engine_options(app.config),
+                                                           **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+        db.init_app(app)
+        with app.app_context():
+            if profile == 'production':
+                sqlite_tuning.apply_pragmas(db.engine, sqlite_tuning.pragmas(app.config))
+            db.create_all()
+            migrations.upgrade(db.engine)
+        self.writer = None
+        if app.config['SQLITE_GROUP_COMMIT']:
+            self.writer = sqlite_tuning.GroupCommitWriter(app, self.batch_put_bookings)
+
+    @staticmethod
+    def _booking_dict(b, email=None):
+        return {
+            'booking_id': b.booking_id,
+            'user_email': email or b.user.email,
+            'movie': b.movie,
+            'theater': b.theater,
+            'day': b.show.day,
+            'time': b.time,
+            'seats': b.seats,
+            'price': b.price,
+            'created_at': b.created_at.isoformat() if b.created_at else '',
+        }
+
+    def get_user(self, email):
+        user = User.query.filter_by(email=email).first()
+        if not user:
+            return None
+        return {'email': user.email, 'name': user.name, 'password_hash': user.password}
+
+    def put_user(self, user):
+        try:
+            db.session.add(User(email=user['email'], name=user['name'], password=user['password_hash']))
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise StorageError(str(e))
+
+    def update_password_hash(self, email, password_hash):
+        try:
+            User.query.filter_by(email=email).update({User.password: password_hash})
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise StorageError(str(e))
+
+    def get_booking(self, booking_id):
+        booking = Booking.query.filter_by(booking_id=booking_id).first()
+        return self._booking_dict(booking) if booking else None
+
+    def batch_get_bookings(self, booking_ids):
+        if not booking_ids:
+            return []
+        rows = Booking.query.filter(Booking.booking_id.in_(booking_ids)).all()
+        return [self._booking_dict(b) for b in rows]
+
+    def _show(self, movie, theater, day, show_time):
+        show = Show.query.filter_by(movie=movie, theater=theater, day=day, time=show_time).first()
+        if not show:
+            show = Show(movie=movie, theater=theater, day=day, time=show_time)
+            db.session.add(show)
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # Another request created it first
+                db.session.rollback()
+                show = Show.query.filter_by(movie=movie, theater=theater, day=day, time=show_time).first()
+        return show
+
+    # With SQLITE_GROUP_COMMIT, concurrent bookings share one transaction
+    def put_booking(self, booking):
+        if self.writer:
+            self.writer.submit(booking)
+        else:
+            self.batch_put_bookings([booking])
+
+    # All bookings go in one transaction. Shows are looked up (and created)
+    # first, since creating a show commits on its own.
+    def batch_put_bookings(self, bookings):
+        users = {}
+        shows = {}
+        try:
+            for item in bookings:
+                email = item['user_email']
+                if email not in users:
+                    users[email] = User.query.filter_by(email=email).first()
+                if not users[email]:
+                    raise StorageError(f"Unknown user {email}")
+                slot = (item['movie'], item['theater'], item.get('day') or 'N/A', item['time'])
+                if slot not in shows:
+                    shows[slot] = self._show(*slot)
+
+            per_user = {}
+            for item in bookings:
+                per_user[item['user_email']] = per_user.get(item['user_email'], 0) + 1
+                show = shows[(item['movie'], item['theater'], item.get('day') or 'N/A', item['time'])]
+                created_at = item.get('created_at')
+                db.session.add(Booking(
+                    booking_id=item['booking_id'],
+                    user_id=users[item['user_email']].id,
+                    show=show,
+                    price=item['price'],
+                    created_at=datetime.datetime.fromisoformat(created_at) if created_at else None,
+                    booked_seats=[BookedSeat(show_id=show.id, seat_label=seat) for seat in parse_seats(item['seats'])]
+                ))
+            for email, count in per_user.items():
+                User.query.filter_by(id=users[email].id).update({User.booking_count: User.booking_count + count})
+            for slot, totals in tally_sales(bookings).items():
+                self._add_sales(shows[slot].id, *totals)
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            raise SeatsTaken(str(e.orig))
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise StorageError(str(e))
+
+    # Upsert into show_sales, part of the caller's transaction
+    @staticmethod
+    def _add_sales(show_id, bookings, tickets, revenue):
+        insert = sqlite_insert(ShowSales).values(show_id=show_id, bookings=bookings, tickets=tickets, revenue=revenue)
+        db.session.execute(insert.on_conflict_do_update(index_elements=[ShowSales.show_id], set_={
+            'bookings': ShowSales.bookings + insert.excluded.bookings,
+            'tickets': ShowSales.tickets + insert.excluded.tickets,
+            'revenue': ShowSales.revenue + insert.excluded.revenue,
+        }))
+
+    # Newest first, served by the (user_id, created_at) index; the cursor is
+    # the (created_at, id) of the last row returned
+    def list_user_bookings(self, email, limit=50, cursor=None):
+        user_id = db.session.query(User.id).filter_by(email=email).scalar()
+        if user_id is None:
+            return [], None
+        query = Booking.query.filter(Booking.user_id == user_id)
+        after = decode_cursor(cursor)
+        if after:
+            created_at = datetime.datetime.fromisoformat(after[0])
+            query = query.filter(db.or_(Booking.created_at < created_at,
+                                        db.and_(Booking.created_at == created_at, Booking.id < after[1])))
+        rows = query.order_by(Booking.created_at.desc(), Booking.id.desc()).limit(limit + 1).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor([rows[-1].created_at.isoformat(), rows[-1].id])
+        return [self._booking_dict(b, email) for b in rows], next_cursor
+
+    # One short transaction per batch, so a long history never holds the
+    # SQLite write lock for the whole deletion
+    def iter_delete_user_bookings(self, email, batch_size=25):
+        user_id = db.session.query(User.id).filter_by(email=email).scalar()
+        if user_id is None:
+            return
+        while True:
+            rows = db.session.query(Booking.id, Booking.booking_id, Booking.show_id, Booking.price,
+                                    Show.movie, Show.theater, Show.day, Show.time) \
+                .outerjoin(Show).filter(Booking.user_id == user_id).order_by(Booking.id).limit(batch_size).all()
+            if not rows:
+                break
+            ids = [r.id for r in rows]
+            try:
+                seats = dict(db.session.query(BookedSeat.booking_id, db.func.count())
+                             .filter(BookedSeat.booking_id.in_(ids)).group_by(BookedSeat.booking_id))
+                sales = {}
+                for r in rows:
+                    if r.show_id is not None:
+                        row = sales.setdefault(r.show_id, [0, 0, 0])
+                        row[0] -= 1
+                        row[1] -= seats.get(r.id, 0)
+                        row[2] -= r.price
+                BookedSeat.query.filter(BookedSeat.booking_id.in_(ids)).delete(synchronize_session=False)
+                Booking.query.filter(Booking.id.in_(ids)).delete(synchronize_session=False)
+                User.query.filter_by(id=user_id).update(
+                    {User.booking_count: db.func.max(User.booking_count - len(ids), 0)}, synchronize_session=False)
+                for show_id, totals in sales.items():
+                    self._add_sales(show_id, *totals)
+                db.session.commit()
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                raise StorageError(str(e))
+            yield [{'booking_id': r.booking_id, 'movie': r.movie, 'theater': r.theater, 'day': r.day, 'time': r.time}
+                   for r in rows]
+
+    def count_user_bookings(self, email):
+        return db.session.query(User.booking_count).filter_by(email=email).scalar() or 0
+
+    def sold_seats(self, key):
+        movie, theater, day, show_time = key
+        rows = db.session.query(BookedSeat.seat_label).join(Show).filter(
+            Show.movie == movie, Show.theater == theater, Show.time == show_time, Show.day == day)
+        return [seat for (seat,) in rows]
+
+    # Keyset pages on Booking.id, so each page is a short indexed query
+    def iter_show_bookings(self, key, page_size=100):
+        movie, theater, day, show_time = key
+        show_ids = [i for (i,) in db.session.query(Show.id).filter(
+            Show.movie == movie, Show.theater == theater, Show.time == show_time, Show.day == day)]
+        if not show_ids:
+            return
+        last_id = 0
+        while True:
+            rows = Booking.query.filter(Booking.show_id.in_(show_ids), Booking.id > last_id) \
+                .order_by(Booking.id).limit(page_size).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            yield from [self._booking_dict(b) for b in rows]
+
+    # One small table, one row per show
+    def show_sales(self):
+        rows = db.session.query(Show.movie, Show.theater, Show.day, Show.time,
+                                ShowSales.bookings, ShowSales.tickets, ShowSales.revenue) \
+            .join(Show, ShowSales.show_id == Show.id).filter(ShowSales.bookings > 0)
+        return [sales_row(r[:4], *r[4:]) for r in rows]
+
+    # Keyset pages on Booking.id; seats come back as one string per booking
+    def iter_all_bookings(self, page_size=500):
+        last_id = 0
+        while True:
+            rows = db.session.query(Booking.id, Booking.booking_id, Booking.price, Show.movie, Show.theater, Show.day,
+                                    Show.time, db.func.group_concat(BookedSeat.seat_label)) \
+                .join(Show, Booking.show_id == Show.id).outerjoin(BookedSeat, BookedSeat.booking_id == Booking.id) \
+                .filter(Booking.id > last_id).group_by(Booking.id).order_by(Booking.id).limit(page_size).all()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            yield [{'booking_id': booking_id, 'movie': movie, 'theater': theater, 'day': day, 'time': show_time,
+                    'seats': seats or '', 'price': price}
+                   for _, booking_id, price, movie, theater, day, show_time, seats in rows]
+
+    # Shows are looked up first (creating one commits on its own), then the
+    # old totals go and the new ones come in one transaction
+    def replace_show_sales(self, totals):
+        show_ids = {slot: self._show(*slot).id for slot in totals}
+        try:
+            ShowSales.query.delete(synchronize_session=False)
+            db.session.add_all([ShowSales(show_id=show_ids[slot], bookings=bookings, tickets=tickets, revenue=revenue)
+                                for slot, (bookings, tickets, revenue) in totals.items()])
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise StorageError(str(e))
+
+
+# ---------- DynamoDB ----------
+class DynamoStore(BookingStore):
+    name = 'dynamodb'
+
+    def __init__(self, clients, user_table, booking_table, sales_table):
+        self.clients = clients
+        self.user_table_name = user_table
+        self.booking_table_name = booking_table
+        self.sales_table_name = sales_table
+
+    # Fetched from AWSClients on every use rather than kept, so each worker
+    # process ends up with its own connections
+    @property
+    def dynamodb(self):
+        return self.clients.resource('dynamodb')
+
+    @property
+    def tbl_users(self):
+        return self.clients.table(self.user_table_name)
+
+    @property
+    def tbl_bookings(self):
+        return self.clients.table(self.booking_table_name)
+
+    @property
+    def tbl_sales(self):
+        return self.clients.table(self.sales_table_name)
+
+    @staticmethod
+    def _error(e):
+        if isinstance(e, ClientError):
+            return StorageError(e.response['Error']['Message'])
+        return StorageError(str(e))
+
+    def get_user(self, email):
+        try:
+            resp = self.tbl_users.get_item(Key={'email': email})
+            return resp.get('Item')
+        except ClientError as e:
+            print(f"Error getting user from DynamoDB: {e.response['Error']['Message']}")
+            return None
+
+    def put_user(self, user):
+        try:
+            self.tbl_users.put_item(Item=dict({'booking_count': 0}, **user))
+        except ClientError as e:
+            raise self._error(e)
+
+    def update_password_hash(self, email, password_hash):
+        try:
+            self.tbl_users.update_item(Key={'email': email}, UpdateExpression='SET password_hash = :h',
+                                       ConditionExpression='attribute_exists(email)',
+                                       ExpressionAttributeValues={':h': password_hash})
+        except ClientError as e:
+            raise self._error(e)
+
+    def get_booking(self, booking_id):
+        try:
+            resp = self.tbl_bookings.get_item(Key={'booking_id': booking_id})
+            return resp.get('Item')
+        except ClientError as e:
+            print(f"Error getting booking from DynamoDB: {e.response['Error']['Message']}")
+            return None
+
+    # BatchGetItem takes at most 100 keys per call and may hand some back
+    # as UnprocessedKeys under throttling; those are retried with backoff.
+    def batch_get_bookings(self, booking_ids):
+        items = []
+        ids = list(dict.fromkeys(booking_ids))
+        try:
+            for start in range(0, len(ids), 100):
+                request = {self.booking_table_name: {'Keys': [{'booking_id': b} for b in ids[start:start + 100]]}}
+                attempt = 0
+                while request:
+                    resp = self.dynamodb.batch_get_item(RequestItems=request)
+                    items.extend(resp.get('Responses', {}).get(self.booking_table_name, []))
+                    request = resp.get('UnprocessedKeys') or None
+                    if request:
+                        attempt += 1
+                        time.sleep(min(0.05 * 2 ** attempt, 1))
+        except ClientError as e:
+            raise self._error(e)
+        return items
+
+    def put_booking(self, booking):
+        try:
+            self.tbl_bookings.put_item(Item=dict(booking, created_at=booking.get('created_at') or now_iso()),
+                                       ConditionExpression='attribute_not_exists(booking_id)')
+        except ClientError as e:
+            raise self._error(e)
+        self._add_to_count(booking['user_email'], 1)
+        self._add_sales(tally_sales([booking]))
+
+    # booking_count lives on the user item. Users registered before it existed
+    # have no counter; it is left missing here and filled in by
+    # count_user_bookings(), whose COUNT query includes this booking anyway.
+    def _add_to_count(self, email, n):
+        try:
+            self.tbl_users.update_item(
+                Key={'email': email},
+                UpdateExpression='ADD booking_count :n',
+                ConditionExpression='attribute_exists(booking_count)',
+                ExpressionAttributeValues={':n': n},
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                print(f"Error updating booking count in DynamoDB: {e.response['Error']['Message']}")
+
+    # One sales item per show, keyed "movie|theater|day|time". Like the
+    # booking count this is a separate write after the bookings; if it fails
+    # the totals are off until the sales backfill runs again.
+    @staticmethod
+    def _sales_key(slot):
+        return '|'.join(slot)
+
+    def _add_sales(self, totals):
+        for slot, (bookings, tickets, revenue) in totals.items():
+            movie, theater, day, show_time = slot
+            try:
+                self.tbl_sales.update_item(
+                    Key={'show': self._sales_key(slot)},
+                    UpdateExpression='SET movie = :m, theater = :th, #d = :d, #t = :t '
+                                     'ADD bookings :b, tickets :k, revenue :r',
+                    ExpressionAttributeNames={'#d': 'day', '#t': 'time'},
+                    ExpressionAttributeValues={':m': movie, ':th': theater, ':d': day, ':t': show_time,
+                                               ':b': bookings, ':k': tickets, ':r': revenue},
+                )
+            except ClientError as e:
+                print(f"Error updating show sales in DynamoDB: {e.response['Error']['Message']}")
+
+    def count_user_bookings(self, email):
+        try:
+            resp = self.tbl_users.get_item(Key={'email': email}, ProjectionExpression='booking_count')
+            count = resp.get('Item', {}).get('booking_count')
+            if count is not None:
+                return int(count)
+
+            count, query_kwargs = 0, {
+                'IndexName': 'UserEmailIndex',
+                'KeyConditionExpression': Key('user_email').eq(email),
+                'Select': 'COUNT',
+            }
+            while True:
+                response = self.tbl_bookings.query(**query_kwargs)
+                count += response['Count']
+                if 'LastEvaluatedKey' not in response:
+                    break
+                query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+            self.tbl_users.update_item(
+                Key={'email': email},
+                UpdateExpression='SET booking_count = if_not_exists(booking_count, :n)',
+                ExpressionAttributeValues={':n': count},
+            )
+            return count
+        except ClientError as e:
+            raise self._error(e)
+
+    # batch_writer groups puts into 25-item BatchWriteItem calls and resends
+    # unprocessed items itself
+    def batch_put_bookings(self, bookings):
+        try:
+            with self.tbl_bookings.batch_writer() as batch:
+                for booking in bookings:
+                    batch.put_item(Item=dict(booking, created_at=booking.get('created_at') or now_iso()))
+        except ClientError as e:
+            raise self._error(e)
+        per_user = {}
+        for booking in bookings:
+            per_user[booking['user_email']] = per_user.get(booking['user_email'], 0) + 1
+        for email, n in per_user.items():
+            self._add_to_count(email, n)
+        self._add_sales(tally_sales(bookings))
+
+    # UserEmailIndex has created_at as its sort key, so ScanIndexForward=False
+    # returns newest first and each page costs one Query of `limit` items.
+    def list_user_bookings(self, email, limit=50, cursor=None):
+        query_kwargs = {
+            'IndexName': 'UserEmailIndex', # IMPORTANT: This GSI must exist!
+            'KeyConditionExpression': Key('user_email').eq(email),
+            'ScanIndexForward': False,
+            'Limit': limit,
+        }
+        if cursor:
+            query_kwargs['ExclusiveStartKey'] = decode_cursor(cursor)
+        try:
+            response = self.tbl_bookings.query(**query_kwargs)
+        except ClientError as e:
+            raise self._error(e)
+        last_key = response.get('LastEvaluatedKey')
+        return response.get('Items', []), encode_cursor(last_key) if last_key else None
+
+    # Pages through UserEmailIndex and deletes each page in BatchWriteItem
+    # calls of at most 25. The projection is what the deletes need: the key,
+    # the show for the caller's inventory resync, and seats and price, which
+    # tally_sales() subtracts from the show's sales totals.
+    def iter_delete_user_bookings(self, email, batch_size=25):
+        batch_size = min(batch_size, 25)
+        query_kwargs = {
+            'IndexName': 'UserEmailIndex',
+            'KeyConditionExpression': Key('user_email').eq(email),
+            'ProjectionExpression': 'booking_id, movie, theater, #d, #t, seats, price',
+            'ExpressionAttributeNames': {'#d': 'day', '#t': 'time'},
+            'Limit': 100,
+        }
+        while True:
+            try:
+                response = self.tbl_bookings.query(**query_kwargs)
+            except ClientError as e:
+                raise self._error(e)
+            items = response.get('Items', [])
+            for start in range(0, len(items), batch_size):
+                batch = items[start:start + batch_size]
+                self._batch_delete([{'booking_id': item['booking_id']} for item in batch])
+                self._add_to_count(email, -len(batch))
+                self._add_sales(tally_sales(batch, sign=-1))
+                yield batch
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    # BatchWriteItem may return some deletes as UnprocessedItems when the
+    # table is throttled; resend those with exponential backoff.
+    def _batch_delete(self, keys, max_attempts=8):
+        request = {self.booking_table_name: [{'DeleteRequest': {'Key': key}} for key in keys]}
+        for attempt in range(max_attempts):
+            try:
+                response = self.dynamodb.batch_write_item(RequestItems=request)
+            except ClientError as e:
+                raise self._error(e)
+            request = response.get('UnprocessedItems') or None
+            if not request:
+                return
+            time.sleep(min(0.05 * 2 ** attempt, 2))
+        raise StorageError(f"{len(request[self.booking_table_name])} deletes still unprocessed after {max_attempts} attempts")
+
+    # Items written before the day was recorded have no day attribute and
+    # belong to the 'N/A' show
+    @staticmethod
+    def _show_condition(key):
+        movie, theater, day, show_time = key
+        day_condition = Attr('day').eq(day)
+        if day == 'N/A':
+            day_condition = Attr('day').not_exists() | day_condition
+        return Attr('movie').eq(movie) & Attr('theater').eq(theater) & Attr('time').eq(show_time) & day_condition
+
+    # No index covers the show, so this scans; it only runs the first time
+    # a show is opened in a process (see SeatInventory).
+    def sold_seats(self, key):
+        condition = self._show_condition(key)
+        scan_kwargs = {'FilterExpression': condition, 'ProjectionExpression': 'seats'}
+        seats = []
+        try:
+            while True:
+                response = self.tbl_bookings.scan(**scan_kwargs)
+                for item in response.get('Items', []):
+                    seats.extend(parse_seats(item.get('seats')))
+                if 'LastEvaluatedKey' not in response:
+                    break
+                scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        except ClientError as e:
+            print(f"Error loading sold seats from DynamoDB: {e.response['Error']['Message']}")
+        return seats
+
+    # Also a scan, page by page; exports are rare compared to bookings
+    def iter_show_bookings(self, key, page_size=100):
+        condition = self._show_condition(key)
+        scan_kwargs = {'FilterExpression': condition, 'Limit': page_size}
+        while True:
+            try:
+                response = self.tbl_bookings.scan(**scan_kwargs)
+            except ClientError as e:
+                raise self._error(e)
+            yield from response.get('Items', [])
+            if 'LastEvaluatedKey' not in response:
+                break
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def _scan_pages(self, table, **scan_kwargs):
+        while True:
+            try:
+                response = table.scan(**scan_kwargs)
+            except ClientError as e:
+                raise self._error(e)
+            yield response.get('Items', [])
+            if 'LastEvaluatedKey' not in response:
+                break
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    # Scans the sales table, which has one small item per show
+    def show_sales(self):
+        return [sales_row((item['movie'], item['theater'], item['day'], item['time']),
+                          item['bookings'], item['tickets'], item['revenue'])
+                for page in self._scan_pages(self.tbl_sales) for item in page if item.get('bookings', 0) > 0]
+
+    def iter_all_bookings(self, page_size=500):
+        for page in self._scan_pages(self.tbl_bookings, Limit=page_size,
+                                     ProjectionExpression='booking_id, movie, theater, #d, #t, seats, price',
+                                     ExpressionAttributeNames={'#d': 'day', '#t': 'time'}):
+            if page:
+                yield page
+
+    # Overwrites every show's item, then deletes items of shows that no
+    # longer have any bookings
+    def replace_show_sales(self, totals):
+        keys = {self._sales_key(slot) for slot in totals}
+        stale = [item['show'] for page in self._scan_pages(self.tbl_sales, ProjectionExpression='#s',
+                                                           ExpressionAttributeNames={'#s': 'show'})
+                 for item in page if item['show'] not in keys]
+        try:
+            with self.tbl_sales.batch_writer() as batch:
+                for slot, (bookings, tickets, revenue) in totals.items():
+                    batch.put_item(Item=dict(sales_row(slot, bookings, tickets, revenue), show=self._sales_key(slot)))
+                for key in stale:
+                    batch.delete_item(Key={'show': key})
+        except ClientError as e:
+            raise self._error(e)
+
+
+# ---------- In-process memory ----------
+# For load tests and local runs. Nothing survives a restart.
+class MemoryStore(BookingStore):
+    name = 'memory'
+
+    def __init__(self):
+        self._users = {}
+        self._bookings = {}
+        self._by_user = {}
+        self._sold = {}
+        self._sales = {}
+        self._lock = threading.Lock()
+
+    def get_user(self, email):
+        user = self._users.get(email)
+        return dict(user) if user else None
+
+    def put_user(self, user):
+        with self._lock:
+            self._users[user['email']] = dict(user)
+
+    def update_password_hash(self, email, password_hash):
+        with self._lock:
+            if email in self._users:
+                self._users[email]['password_hash'] = password_hash
+
+    def get_booking(self, booking_id):
+        booking = self._bookings.get(booking_id)
+        return dict(booking) if booking else None
+
+    def batch_get_bookings(self, booking_ids):
+        return [dict(self._bookings[b]) for b in dict.fromkeys(booking_ids) if b in self._bookings]
+
+    @staticmethod
+    def _slot(booking):
+        return (booking['movie'], booking['theater'], booking.get('day') or 'N/A', booking['time'])
+
+    def batch_put_bookings(self, bookings):
+        with self._lock:
+            # Check every seat first so a conflict leaves nothing half-written
+            claimed = set()
+            for booking in bookings:
+                slot = self._slot(booking)
+                for seat in parse_seats(booking['seats']):
+                    if seat in self._sold.get(slot, ()) or (slot, seat) in claimed:
+                        raise SeatsTaken(f"{seat} is already sold")
+                    claimed.add((slot, seat))
+            for booking in bookings:
+                item = dict(booking, created_at=booking.get('created_at') or now_iso())
+                self._bookings[item['booking_id']] = item
+                self._by_user.setdefault(item['user_email'], []).append(item['booking_id'])
+                self._sold.setdefault(self._slot(item), set()).update(parse_seats(item['seats']))
+            tally_sales(bookings, self._sales)
+
+    def count_user_bookings(self, email):
+        return len(self._by_user.get(email, ()))
+
+    def list_user_bookings(self, email, limit=50, cursor=None):
+        # _by_user is in insertion order, i.e. oldest first; the cursor counts
+        # how many of the newest have been returned already
+        ids = self._by_user.get(email, [])
+        start = decode_cursor(cursor) or 0
+        end = len(ids) - start
+        page = [dict(self._bookings[b]) for b in reversed(ids[max(0, end - limit):end])]
+        return page, encode_cursor(start + limit) if end - limit > 0 else None
+
+    def iter_delete_user_bookings(self, email, batch_size=25):
+        while True:
+            with self._lock:
+                ids = self._by_user.get(email, [])
+                batch, self._by_user[email] = ids[:batch_size], ids[batch_size:]
+                deleted = [self._bookings.pop(b) for b in batch]
+                for booking in deleted:
+                    self._sold.get(self._slot(booking), set()).difference_update(parse_seats(booking['seats']))
+                tally_sales(deleted, self._sales, sign=-1)
+            if not deleted:
+                break
+            yield deleted
+
+    def sold_seats(self, key):
+        return list(self._sold.get(key, ()))
+
+    def iter_show_bookings(self, key, page_size=100):
+        with self._lock:
+            matches = [dict(b) for b in self._bookings.values() if self._slot(b) == key]
+        yield from matches
+
+    def show_sales(self):
+        with self._lock:
+            return [sales_row(slot, *totals) for slot, totals in self._sales.items() if totals[0] > 0]
+
+    def iter_all_bookings(self, page_size=500):
+        with self._lock:
+            bookings = [dict(b) for b in self._bookings.values()]
+        for start in range(0, len(bookings), page_size):
+            yield bookings[start:start + page_size]
+
+    def replace_show_sales(self, totals):
+        with self._lock:
+            self._sales = {slot: list(row) for slot, row in totals.items()}
+
+
+# ---------- Read-through cache ----------
+# Wraps another store and keeps users, booking counts and bookings in a
+# small process-local LRU for `ttl` seconds. Bookings are put in the cache
+# as they are written, so the ticket page after payment (and the PDF after
+# that) needs no read at all. Every write through this store drops what it
+# makes stale: a booking write or delete drops its user's entry and count.
+# Writes made by other processes show up once the TTL runs out.
+class CachedStore(BookingStore):
+    def __init__(self, inner, ttl=30, max_entries=10000):
+        self.inner = inner
+        self.name = inner.name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # (kind, key) -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def _put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _drop(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def _cached(self, key, load):
+        value = self._get(key)
+        if value is None:
+            value = load()
+            if value is not None:
+                self._put(key, value)
+        return dict(value) if isinstance(value, dict) else value
+
+    def get_user(self, email):
+        return self._cached(('user', email), lambda: self.inner.get_user(email))
+
+    def put_user(self, user):
+        self._drop(('user', user['email']), ('count', user['email']))
+        self.inner.put_user(user)
+
+    def update_password_hash(self, email, password_hash):
+        self._drop(('user', email))
+        self.inner.update_password_hash(email, password_hash)
+
+    def get_booking(self, booking_id):
+        return self._cached(('booking', booking_id), lambda: self.inner.get_booking(booking_id))
+
+    def batch_get_bookings(self, booking_ids):
+        found = {b: self._get(('booking', b)) for b in dict.fromkeys(booking_ids)}
+        missing = [b for b, booking in found.items() if booking is None]
+        for booking in self.inner.batch_get_bookings(missing) if missing else []:
+            self._put(('booking', booking['booking_id']), booking)
+            found[booking['booking_id']] = booking
+        return [dict(booking) for booking in found.values() if booking is not None]
+
+    # created_at is filled in here so the cached copy matches the stored one
+    def put_booking(self, booking):
+        booking = dict(booking, created_at=booking.get('created_at') or now_iso())
+        self._drop(('user', booking['user_email']), ('count', booking['user_email']))
+        self.inner.put_booking(booking)
+        self._put(('booking', booking['booking_id']), booking)
+
+    def batch_put_bookings(self, bookings):
+        bookings = [dict(b, created_at=b.get('created_at') or now_iso()) for b in bookings]
+        for email in {b['user_email'] for b in bookings}:
+            self._drop(('user', email), ('count', email))
+        self.inner.batch_put_bookings(bookings)
+        for booking in bookings:
+            self._put(('booking', booking['booking_id']), booking)
+
+    def count_user_bookings(self, email):
+        return self._cached(('count', email), lambda: self.inner.count_user_bookings(email))
+
+    def list_user_bookings(self, email, limit=50, cursor=None):
+        return self.inner.list_user_bookings(email, limit, cursor)
+
+    def iter_delete_user_bookings(self, email, batch_size=25):
+        try:
+            for batch in self.inner.iter_delete_user_bookings(email, batch_size):
+                self._drop(*[('booking', b['booking_id']) for b in batch])
+                yield batch
+        finally:
+            self._drop(('user', email), ('count', email))
+
+    def sold_seats(self, key):
+        return self.inner.sold_seats(key)
+
+    def iter_show_bookings(self, key, page_size=100):
+        return self.inner.iter_show_bookings(key, page_size)
+
+    def show_sales(self):
+        return self.inner.show_sales()
+
+    def iter_all_bookings(self, page_size=500):
+        return self.inner.iter_all_bookings(page_size)
+
+    def replace_show_sales(self, totals):
+        self.inner.replace_show_sales(totals)
+
+    def stats(self):
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+def make_store(app):
+    backend = app.config['STORAGE_BACKEND']
+    if backend == 'sqlite':
+        store = SQLStore(app)
+    elif backend == 'dynamodb':
+        store = DynamoStore(app.extensions['aws'], app.config['USER_TABLE'], app.config['BOOKING_TABLE'],
+                            app.config['SALES_TABLE'])
+    elif backend == 'memory':
+        store = MemoryStore()
+    else:
+        raise ValueError(f"Unknown STORAGE_BACKEND {backend!r} (expected sqlite, dynamodb or memory)")
+    if app.extensions.get('metrics'):
+        store = app.extensions['metrics'].instrument_store(store)
+    if app.config['STORE_CACHE_TTL'] > 0:
+        store = CachedStore(store, app.config['STORE_CACHE_TTL'], app.config['STORE_CACHE_MAX_ENTRIES'])
+    return store
@@ -0,0 +1,431 @@
+import hashlib, io, os, re, threading, time, zipfile
+from collections import OrderedDict, deque
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import simpleSplit
+import metrics
+
+# ---------- Ticket PDF ----------
+# Every ticket has the same layout and only the booking fields differ. The
+# page is drawn once with ReportLab, uncompressed, with a fixed-width
+# placeholder where each field goes; a ticket is then that template with the
+# placeholders overwritten in place. Each value is space-padded to the
+# placeholder's width, so every object offset in the xref table stays valid
+# and no PDF structure needs rebuilding. A ticket with a value longer than its
+# placeholder (a large party's seats) is drawn with ReportLab instead.
+
+# (field, label, placeholder width in bytes)
+FIELDS = [
+    ('booking_id', 'Booking ID: ', 40),
+    ('movie', 'Movie: ', 60),
+    ('theater', 'Theater: ', 60),
+    ('day', 'Date: ', 20),
+    ('time', 'Show Time: ', 24),
+    ('seats', 'Seats: ', 120),
+    ('price', 'Total Price: ₹', 16),
+]
+LINE_Y = [720, 700, 680, 660, 640, 620, 600]
+
+LINE_WIDTH = letter[0] - 150
+
+# Bump when the layout changes, so cached PDFs are not reused
+TEMPLATE_VERSION = '3'
+
+
+class FieldTooLong(ValueError):
+    pass
+
+
+# With wrap, a line wider than the page continues on the next ones and the
+# lines below move down. The template is drawn without it, so each
+# placeholder stays on its own line.
+def draw_ticket(p, values, wrap=False):
+    p.setFont("Helvetica-Bold", 14)
+    p.drawString(100, 750, "\U0001F39F Booking Confirmation - Movie Ticket")
+
+    p.setFont("Helvetica", 12)
+    shift = 0
+    for (field, label, width), y in zip(FIELDS, LINE_Y):
+        text = f"{label}{values[field]}"
+        lines = simpleSplit(text, "Helvetica", 12, LINE_WIDTH) if wrap else [text]
+        for line in lines:
+            p.drawString(100, y - shift, line)
+            shift += 20
+        shift -= 20
+    p.drawString(100, 570 - shift, "Thank you for booking with MovieMagic!")
+    p.showPage()
+
+
+def ticket_values(booking):
+    return {field: str(booking.get(field, 0 if field == 'price' else 'N/A')) for field, label, width in FIELDS}
+
+
+# Same layout drawn directly with ReportLab; used when the template cannot be
+# stamped and as the reference the template is built from.
+def render_ticket_reportlab(booking, **options):
+    buffer = io.BytesIO()
+    p = canvas.Canvas(buffer, pagesize=letter, **options)
+    draw_ticket(p, ticket_values(booking), wrap=True)
+    p.save()
+    return buffer.getvalue()
+
+
+# The page's drawing operators, as TicketTemplate.page_stream() returns them.
+# ReportLab names the fonts in the order they are first used, the same as in
+# the template, so the stream fits PDFWriter's shared font resources.
+def render_page_stream_reportlab(booking):
+    pdf = render_ticket_reportlab(booking, pageCompression=0, invariant=1)
+    start, end = _content_stream(pdf)
+    return pdf[start:end]
+
+
+def _content_stream(pdf):
+    stream = re.search(rb'/Length (\d+)\s*>>\s*stream\r?\n', pdf)
+    if not stream:
+        raise ValueError("Ticket PDF has no content stream")
+    return stream.end(), stream.end() + int(stream.group(1))
+
+
+def content_hash(booking):
+    values = ticket_values(booking)
+    digest = hashlib.sha256(TEMPLATE_VERSION.encode())
+    for field, label, width in FIELDS:
+        digest.update(b'\0' + values[field].encode())
+    return digest.hexdigest()[:32]
+
+
+def _placeholder(i, width):
+    return f"~~{i}~~".ljust(width, '~').encode()
+
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+# Encodes a value as it must appear inside a PDF string literal: WinAnsi
+# bytes (unsupported characters become '?'), escaped, then space-padded to
+# `width` bytes. Raises FieldTooLong if it does not fit.
+def _stamp_value(field, text, width):
+    out = _escape(text).encode('cp1252', errors='replace')
+    if len(out) > width:
+        raise FieldTooLong(f"{field} needs {len(out)} bytes, the template has {width}")
+    return out.ljust(width, b' ')
+
+
+class TicketTemplate:
+    def __init__(self):
+        buffer = io.BytesIO()
+        p = canvas.Canvas(buffer, pagesize=letter, pageCompression=0, invariant=1)
+        draw_ticket(p, {field: _placeholder(i, width).decode() for i, (field, label, width) in enumerate(FIELDS)})
+        p.save()
+        pdf = buffer.getvalue()
+
+        # Split the template at each placeholder: parts[0] v0 parts[1] v1 ...
+        self.parts = []
+        pos = 0
+        for i, (field, label, width) in enumerate(FIELDS):
+            token = _placeholder(i, width)
+            at = pdf.find(token, pos)
+            if at < 0 or pdf.count(token) != 1:
+                raise ValueError(f"Ticket template placeholder for {field} not found")
+            self.parts.append(pdf[pos:at])
+            pos = at + len(token)
+        self.parts.append(pdf[pos:])
+
+        # What a multi-page export needs to rebuild the page around the
+        # stamped text: the page content stream (where all placeholders sit),
+        # the font objects it refers to by name, and the page size.
+        self.stream_span = _content_stream(pdf)
+        if not (self.stream_span[0] <= len(self.parts[0]) and pos <= self.stream_span[1]):
+            raise ValueError("Ticket placeholders are outside the content stream")
+        self.fonts = [(re.search(rb'/Name (/\w+)', body).group(1), body)
+                      for body in re.findall(rb'\d+ 0 obj\r?\n(<<.*?>>)\r?\nendobj', pdf, re.S)
+                      if b'/Type /Font' in body]
+        self.media_box = re.search(rb'/MediaBox \[[^\]]*\]', pdf).group(0)
+
+    def render(self, booking):
+        values = ticket_values(booking)
+        out = [self.parts[0]]
+        for i, (field, label, width) in enumerate(FIELDS):
+            out.append(_stamp_value(field, values[field], width))
+            out.append(self.parts[i + 1])
+        return b''.join(out)
+
+    # Just the page's drawing operators, for PDFWriter
+    def page_stream(self, booking):
+        start, end = self.stream_span
+        return self.render(booking)[start:end]
+
+
+_template = None
+_template_lock = threading.Lock()
+
+
+def ticket_template():
+    global _template
+    if _template is None:
+        with _template_lock:
+            if _template is None:
+                _template = TicketTemplate()
+    return _template
+
+
+def render_ticket(booking):
+    try:
+        return ticket_template().render(booking)
+    except FieldTooLong:
+        return render_ticket_reportlab(booking)
+    except ValueError as e:
+        print(f"Ticket template unavailable, drawing with ReportLab: {e}")
+        return render_ticket_reportlab(booking)
+
+
+# ---------- Rendered Ticket Cache ----------
+# A confirmed booking never changes, so its PDF is rendered once and kept on
+# disk as <booking_id>-<content hash>.pdf. The hash covers every printed field,
+# so a changed booking or layout simply misses. Least recently used files are
+# deleted once the directory grows past max_bytes.
+SAFE_ID = re.compile(r'[^A-Za-z0-9_-]')
+
+
+class TicketCache:
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # file name -> size, oldest first
+        self._size = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        # Pick up tickets rendered by an earlier run, least recently used first
+        found = []
+        for name in os.listdir(directory):
+            if name.endswith('.pdf'):
+                st = os.stat(os.path.join(directory, name))
+                found.append((st.st_atime, name, st.st_size))
+        for atime, name, size in sorted(found):
+            self._entries[name] = size
+            self._size += size
+        with self._lock:
+            self._evict()
+
+    def _name(self, booking_id, digest):
+        return f"{SAFE_ID.sub('_', booking_id)}-{digest}.pdf"
+
+    # Returns (pdf bytes, unix time the PDF was rendered)
+    def get_or_render(self, booking, digest):
+        name = self._name(booking['booking_id'], digest)
+        path = os.path.join(self.directory, name)
+        with self._lock:
+            cached = name in self._entries
+            if cached:
+                self._entries.move_to_end(name)
+        if cached:
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                # atime is the LRU clock for the next startup; mtime stays
+                # the render time and is sent as Last-Modified
+                rendered_at = os.stat(path).st_mtime
+                os.utime(path, (time.time(), rendered_at))
+                self.hits += 1
+                return data, rendered_at
+            except OSError:
+                with self._lock:
+                    self._drop(name)
+
+        self.misses += 1
+        with metrics.timed('pdf'):
+            data = render_ticket(booking)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+            rendered_at = os.stat(path).st_mtime
+        except OSError as e:
+            print(f"Could not cache ticket {booking['booking_id']}: {e}")
+            return data, time.time()
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = len(data)
+                self._size += len(data)
+            self._evict()
+        return data, rendered_at
+
+    def _drop(self, name):
+        self._size -= self._entries.pop(name, 0)
+
+    def _evict(self):
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            name, size = self._entries.popitem(last=False)
+            self._size -= size
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# ---------- Bulk Export ----------
+# Exports stream: bookings are read page by page from storage, rendered in
+# chunks on a process pool with at most `window` chunks in flight, and each
+# finished chunk is written out before more bookings are read. Memory stays
+# bounded by the window, however many tickets the export covers.
+
+# PDF written front to back: shared fonts first, then a content stream and a
+# page object per ticket, and the page tree, xref and trailer at the end once
+# every page's object number and offset are known.
+class PDFWriter:
+    CATALOG, PAGES, FONTS = 1, 2, 3
+
+    def __init__(self, template):
+        self.template = template
+        self.offsets = {}
+        self.pos = 0
+        self.kids = []
+        self.next_num = self.FONTS + 1 + len(template.fonts)
+
+    def _raw(self, data):
+        self.pos += len(data)
+        return data
+
+    def _obj(self, num, body):
+        self.offsets[num] = self.pos
+        return self._raw(b'%d 0 obj\n%s\nendobj\n' % (num, body))
+
+    def header(self):
+        out = [self._raw(b'%PDF-1.3\n%\x93\x8c\x8b\x9e\n'),
+               self._obj(self.CATALOG, b'<< /Pages %d 0 R /Type /Catalog >>' % self.PAGES)]
+        refs = []
+        for i, (name, body) in enumerate(self.template.fonts):
+            out.append(self._obj(self.FONTS + 1 + i, body))
+            refs.append(b'%s %d 0 R' % (name, self.FONTS + 1 + i))
+        out.append(self._obj(self.FONTS, b'<< ' + b' '.join(refs) + b' >>'))
+        return b''.join(out)
+
+    def page(self, stream):
+        contents, page = self.next_num, self.next_num + 1
+        self.next_num += 2
+        self.kids.append(page)
+        return (self._obj(contents, b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream))
+                + self._obj(page, b'<< /Contents %d 0 R %s /Parent %d 0 R /Resources << /Font %d 0 R '
+                            b'/ProcSet [ /PDF /Text ] >> /Type /Page >>'
+                            % (contents, self.template.media_box, self.PAGES, self.FONTS)))
+
+    def trailer(self):
+        kids = b' '.join(b'%d 0 R' % k for k in self.kids)
+        out = [self._obj(self.PAGES, b'<< /Count %d /Kids [ %s ] /Type /Pages >>' % (len(self.kids), kids))]
+        xref_at = self.pos
+        out.append(b'xref\n0 %d\n0000000000 65535 f \n' % self.next_num)
+        out.extend(b'%010d 00000 n \n' % self.offsets[n] for n in range(1, self.next_num))
+        out.append(b'trailer\n<< /Root %d 0 R /Size %d >>\nstartxref\n%d\n%%%%EOF\n'
+                   % (self.CATALOG, self.next_num, xref_at))
+        return b''.join(out)
+
+
+# zipfile writes to anything with write(); on an unseekable sink it uses
+# data descriptors, so each entry can be sent as soon as it is written.
+class _ZipSink:
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+# Run in the pool's worker processes
+def _render_page_streams(values_list):
+    template = ticket_template()
+    streams = []
+    for values in values_list:
+        try:
+            streams.append(template.page_stream(values))
+        except FieldTooLong:
+            streams.append(render_page_stream_reportlab(values))
+    return streams
+
+
+def _render_pdfs(values_list):
+    return [render_ticket(values) for values in values_list]
+
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class TicketExporter:
+    def __init__(self, workers=2, chunk_size=25, window=4):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.window = window
+        self._pool = None
+        self._lock = threading.Lock()
+
+    # Started on first export. spawn works the same on every platform and
+    # does not fork the server's threads into the workers.
+    def pool(self):
+        with self._lock:
+            if self._pool is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=ticket_template,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    # Yields (values, rendered) in booking order
+    def _rendered(self, bookings, fn):
+        chunks = _chunks((ticket_values(b) for b in bookings), self.chunk_size)
+        if not self.workers:
+            for chunk in chunks:
+                yield from zip(chunk, fn(chunk))
+            return
+        pending = deque()
+        for chunk in chunks:
+            pending.append((chunk, self.pool().submit(fn, chunk)))
+            if len(pending) >= self.window:
+                chunk, future = pending.popleft()
+                yield from zip(chunk, future.result())
+        while pending:
+            chunk, future = pending.popleft()
+            yield from zip(chunk, future.result())
+
+    def pdf(self, bookings):
+        writer = PDFWriter(ticket_template())
+        yield writer.header()
+        for values, stream in self._rendered(bookings, _render_page_streams):
+            yield writer.page(stream)
+        yield writer.trailer()
+
+    def zip(self, bookings):
+        sink = _ZipSink()
+        with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for values, pdf in self._rendered(bookings, _render_pdfs):
+                info = zipfile.ZipInfo(f"ticket_{SAFE_ID.sub('_', values['booking_id'])}.pdf",
+                                       time.localtime()[:6])
+                info.compress_type = zipfile.ZIP_DEFLATED
+                archive.writestr(info, pdf)
+                yield sink.drain()
+        yield sink.drain()
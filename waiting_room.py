@@ -0,0 +1,145 @@
+import math, os, threading, time
+from flask import request, session, render_template, current_app, url_for
+
+# ---------- Virtual Waiting Room ----------
+# When bookings open for a big title, everyone hits /booking/<title> and
+# /seating/<title> at once. For titles listed in WAITING_ROOM_RATES
+# ({'RRR': 5, ...}, '*' for every title) a before_request gate in front of
+# the booking routes lets users through at that many per second; the rest
+# get a small waiting page with their place in line and an estimate, which
+# refreshes itself until it is their turn. Admitted users keep their pass for
+# WAITING_ROOM_ADMIT_TTL seconds, so the routes behind the gate see a steady
+# flow instead of the whole crowd.
+#
+# Each line is a token bucket kept as two numbers: tickets handed out and
+# the ticket now being served, which moves forward at `rate` per second.
+# Serving may run up to `burst` tickets ahead of the last one issued, so a
+# quiet title admits a small crowd at once. Once WAITING_ROOM_MAX_QUEUE
+# people are waiting, newcomers are turned away with a bare 503 and a
+# Retry-After before anything else is looked up.
+#
+# A user's ticket and pass live in their session, which Flask signs, so they
+# cannot be forged or moved up the line. Lines are per process: with several
+# workers, give each worker its share of the rate. A ticket carries the
+# epoch of the process that issued it, so a ticket from another worker or
+# from before a restart is never compared with this line and is replaced by
+# a new one.
+GATED_ENDPOINTS = ('booking', 'seating', 'best_seats')
+
+
+class Line:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.issued = 0
+        self.serving = float(burst)
+        self.admitted = 0
+        self.shed = 0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    # Called with the lock held. Tickets up to serving may go in.
+    def _advance(self):
+        now = time.monotonic()
+        self.serving = min(self.issued + self.burst, self.serving + self.rate * (now - self._last))
+        self._last = now
+        return max(0, self.issued - math.floor(self.serving))
+
+    # A new ticket number, or None when the line is full
+    def join(self, max_queue):
+        with self._lock:
+            if self._advance() >= max_queue:
+                self.shed += 1
+                return None
+            self.issued += 1
+            return self.issued
+
+    # (place in line, seconds until it is its turn); place 0 means it may go in
+    def position(self, ticket):
+        with self._lock:
+            self._advance()
+            if ticket <= self.serving:
+                return 0, 0.0
+            return ticket - math.floor(self.serving), (ticket - self.serving) / self.rate
+
+    def admit(self):
+        with self._lock:
+            self.admitted += 1
+
+    def waiting(self):
+        with self._lock:
+            return self._advance()
+
+
+class WaitingRoom:
+    def __init__(self, rates, burst=20, max_queue=5000, admit_ttl=900):
+        self.rates = dict(rates)
+        self.burst = burst
+        self.max_queue = max_queue
+        self.admit_ttl = admit_ttl
+        self.epoch = os.urandom(4).hex()
+        self._lines = {}
+        self._lock = threading.Lock()
+
+    # The title's line, or None if the title has no waiting room
+    def line(self, title):
+        line = self._lines.get(title)
+        if line is None:
+            rate = self.rates.get(title, self.rates.get('*'))
+            if not rate:
+                return None
+            with self._lock:
+                line = self._lines.setdefault(title, Line(rate, self.burst))
+        return line
+
+    def stats(self):
+        with self._lock:
+            lines = dict(self._lines)
+        return {title: {'rate': line.rate, 'waiting': line.waiting(), 'admitted': line.admitted, 'shed': line.shed}
+                for title, line in lines.items()}
+
+    # None lets the request through; otherwise the waiting page or a 503
+    def check(self, title):
+        line = self.line(title)
+        if line is None:
+            return None
+        now = time.time()
+        passes = session.get('queue_pass', {})
+        if passes.get(title, 0) > now:
+            return None
+
+        # A ticket from another process means nothing to this line
+        tickets = session.get('queue_ticket', {})
+        ticket = tickets.get(title)
+        if not ticket or ticket[0] != self.epoch:
+            number = line.join(self.max_queue)
+            if number is None:
+                return current_app.response_class("The waiting room is full, please try again shortly.", 503,
+                                                  mimetype='text/plain', headers={'Retry-After': '30'})
+            ticket = [self.epoch, number]
+            session['queue_ticket'] = dict(tickets, **{title: ticket})
+
+        place, wait = line.position(ticket[1])
+        if not place:
+            line.admit()
+            session['queue_ticket'] = {t: v for t, v in tickets.items() if t != title}
+            session['queue_pass'] = {t: expires for t, expires in passes.items() if expires > now}
+            session['queue_pass'][title] = now + self.admit_ttl
+            return None
+
+        # The page reloads itself with a GET, so a held-up form post is not resent
+        refresh = min(30, max(2, int(wait / 2)))
+        retry_url = request.path if request.method == 'GET' else url_for('booking', title=title)
+        page = render_template('waiting_room.html', title=title, ahead=place - 1, wait_minutes=math.ceil(wait / 60),
+                               refresh=refresh, retry_url=retry_url)
+        return current_app.response_class(page, headers={'Retry-After': str(refresh), 'X-Queue-Position': str(place),
+                                                         'Cache-Control': 'no-store'})
+
+
+def init_app(app, room):
+    @app.before_request
+    def waiting_room_gate():
+        # Not logged in: the route itself redirects to the login page
+        if request.endpoint not in GATED_ENDPOINTS or 'email' not in session:
+            return None
+        return room.check((request.view_args or {}).get('title'))